@@ -167,6 +167,7 @@ class CrossCorrelateAdapter(ABCAsynchronous):
                 small_ts.data = ts_h5.read_data_slice(tuple(node_slice))
                 partial_cross_corr = self._compute_cross_correlation(small_ts, ts_h5)
                 cross_corr_h5.write_data_slice(partial_cross_corr)
+                self.report_progress((var + 1) / self.input_shape[1])
             ts_array_metadata = cross_corr_h5.array_data.get_cached_metadata()
 
         cross_corr_h5.time.store(partial_cross_corr.time)
@@ -206,12 +206,13 @@ class FunctionalConnectivityDynamicsAdapter(ABCAsynchronous):
 
     @staticmethod
     def _populate_fcd_h5(fcd_h5, fcd_data, gid, source_gid, sw, sp):
-        fcd_h5.array_data.store(fcd_data)
-        fcd_h5.gid.store(uuid.UUID(gid))
-        fcd_h5.source.store(uuid.UUID(source_gid))
-        fcd_h5.sw.store(sw)
-        fcd_h5.sp.store(sp)
-        fcd_h5.labels_ordering.store(json.dumps(Fcd.labels_ordering.default))
+        with fcd_h5.bulk_attributes():
+            fcd_h5.array_data.store(fcd_data)
+            fcd_h5.gid.store(uuid.UUID(gid))
+            fcd_h5.source.store(uuid.UUID(source_gid))
+            fcd_h5.sw.store(sw)
+            fcd_h5.sp.store(sp)
+            fcd_h5.labels_ordering.store(json.dumps(Fcd.labels_ordering.default))
         return fcd_h5.array_data.get_cached_metadata()
 
     def launch(self, time_series, sw, sp):
@@ -259,7 +260,7 @@ class FunctionalConnectivityDynamicsAdapter(ABCAsynchronous):
                                          "mode = %s." % (ep, eigval_dict[mode][var][ep][eig], var, mode)
 
                         storage_path = h5.path_for(self.storage_path, ConnectivityMeasureH5, cm_index.gid)
-                        with ConnectivityMeasureH5(storage_path) as f:
+                        with ConnectivityMeasureH5(storage_path) as f, f.bulk_attributes():
                             f.array_data.store(cm_data)
                             f.connectivity.store(connectivity_gid)
                             f.title.store(cm_index.title)
@@ -170,6 +170,7 @@ class BalloonModelAdapter(ABCAsynchronous):
             self.algorithm.time_series = small_ts
             partial_bold = self.algorithm.evaluate()
             bold_signal_h5.write_data_slice_on_grow_dimension(partial_bold.data, grow_dimension=2)
+            self.report_progress((node + 1) / self.input_shape[2])
 
         bold_signal_h5.write_time_slice(time_line)
         bold_signal_shape = bold_signal_h5.data.shape
@@ -200,13 +201,14 @@ class BalloonModelAdapter(ABCAsynchronous):
         result_index.title = self.input_time_series_index.title
 
     def _fill_result_h5(self, result_h5, input_h5):
-        result_h5.sample_period.store(self.input_time_series_index.sample_period)
-        result_h5.sample_period_unit.store(self.input_time_series_index.sample_period_unit)
-        result_h5.sample_rate.store(input_h5.sample_rate.load())
-        result_h5.start_time.store(input_h5.start_time.load())
-        result_h5.labels_ordering.store(input_h5.labels_ordering.load())
-        result_h5.labels_dimensions.store(input_h5.labels_dimensions.load())
-        result_h5.connectivity.store(input_h5.connectivity.load())
-        result_h5.region_mapping_volume.store(input_h5.region_mapping_volume.load())
-        result_h5.region_mapping.store(input_h5.region_mapping.load())
-        result_h5.title.store(input_h5.title.load())
+        with result_h5.bulk_attributes():
+            result_h5.sample_period.store(self.input_time_series_index.sample_period)
+            result_h5.sample_period_unit.store(self.input_time_series_index.sample_period_unit)
+            result_h5.sample_rate.store(input_h5.sample_rate.load())
+            result_h5.start_time.store(input_h5.start_time.load())
+            result_h5.labels_ordering.store(input_h5.labels_ordering.load())
+            result_h5.labels_dimensions.store(input_h5.labels_dimensions.load())
+            result_h5.connectivity.store(input_h5.connectivity.load())
+            result_h5.region_mapping_volume.store(input_h5.region_mapping_volume.load())
+            result_h5.region_mapping.store(input_h5.region_mapping.load())
+            result_h5.title.store(input_h5.title.load())
@@ -148,7 +148,7 @@ class FourierAdapter(abcadapter.ABCAsynchronous):
         """
         output_size = self.algorithm.result_size(self.input_shape, self.algorithm.segment_length,
                                                  self.input_time_series_index.sample_period)
-        return self.array_size2kb(output_size)
+        return self.results_size2kb(output_size)
 
 
     def launch(self, time_series, segment_length=None, window_function=None, detrend=None):
@@ -194,7 +194,8 @@ class FourierAdapter(abcadapter.ABCAsynchronous):
                 self.add_operation_additional_info(
                     "Fourier produced empty result (most probably due to a very short input TimeSeries).")
                 return None
-            spectra_file.write_data_slice(partial_result)
+            spectra_file.write_data_slice(partial_result, self.results_dtype)
+            self.report_progress((block + 1) / blocks)
         fft_index.ndim = len(spectra_file.array_data.shape)
         input_time_series_h5.close()
 
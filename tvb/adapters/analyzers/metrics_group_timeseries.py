@@ -150,7 +150,8 @@ class TimeseriesMetricsAdapter(ABCAsynchronous):
             algorithms = list(ALGORITHMS)
 
         LOG.debug("time_series shape is %s" % str(self.input_shape))
-        dt_timeseries = h5.load_from_index(time_series)
+        # the metrics read only slices of the data, after start_point
+        dt_timeseries = h5.load_from_index(time_series, lazy=True)
 
         metrics_results = {}
         for algorithm_name in algorithms:
@@ -43,6 +43,7 @@ from tvb.core.adapters.abcadapter import ABCAsynchronous, ABCAdapterForm
 from tvb.datatypes.time_series import TimeSeries
 from tvb.datatypes.graph import Covariance
 from tvb.core.entities.filters.chain import FilterChain
+from tvb.core.entities.file.hdf5_storage_policy import cast_to_precision
 from tvb.basic.logger.builder import get_logger
 from tvb.adapters.datatypes.h5.graph_h5 import CovarianceH5
 from tvb.adapters.datatypes.db.graph import CovarianceIndex
@@ -121,7 +122,7 @@ class NodeCovarianceAdapter(ABCAsynchronous):
         Returns the required disk size to be able to run the adapter ( in kB).
         """
         used_shape = (self.input_shape[0], 1, self.input_shape[2], 1)
-        return self.array_size2kb(self._result_size(used_shape))
+        return self.results_size2kb(self._result_size(used_shape))
 
     def launch(self, time_series):
         """ 
@@ -145,7 +146,7 @@ class NodeCovarianceAdapter(ABCAsynchronous):
                     node_slice[3] = slice(mode, mode + 1)
                     small_ts.data = ts_h5.read_data_slice(tuple(node_slice))
                     partial_cov = self._compute_node_covariance(small_ts, ts_h5)
-                    covariance_h5.write_data_slice(partial_cov.array_data)
+                    covariance_h5.write_data_slice(cast_to_precision(partial_cov.array_data, self.results_dtype))
             ts_array_metadata = covariance_h5.array_data.get_cached_metadata()
 
         covariance_index.source_gid = time_series.gid
@@ -171,7 +171,8 @@ class ContinuousWaveletTransformAdapter(ABCAsynchronous):
                       self.input_shape[1],
                       1,
                       self.input_shape[3])
-        return self.array_size2kb(self.algorithm.result_size(used_shape, self.input_time_series_index.sample_period))
+        return self.results_size2kb(self.algorithm.result_size(used_shape,
+                                                               self.input_time_series_index.sample_period))
 
     def launch(self, time_series, mother=None, sample_period=None, normalisation=None, q_ratio=None,
                frequencies='Range', frequencies_parameters=None):
@@ -208,7 +209,7 @@ class ContinuousWaveletTransformAdapter(ABCAsynchronous):
             small_ts.data = time_series_h5.read_data_slice(tuple(node_slice))
             self.algorithm.time_series = small_ts
             partial_wavelet = self.algorithm.evaluate()
-            wavelet_h5.write_data_slice(partial_wavelet)
+            wavelet_h5.write_data_slice(partial_wavelet, self.results_dtype)
 
         wavelet_h5.close()
         time_series_h5.close()
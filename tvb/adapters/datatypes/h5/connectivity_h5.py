@@ -29,6 +29,7 @@
 #
 
 from tvb.basic.neotraits.api import NArray
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_DENSE_MATRIX
 from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Json, STORE_STRING, MEMORY_STRING
 from tvb.datatypes.connectivity import Connectivity
 
@@ -37,9 +38,9 @@ class ConnectivityH5(H5File):
     def __init__(self, path):
         super(ConnectivityH5, self).__init__(path)
         self.region_labels = DataSet(NArray(dtype=STORE_STRING), self, "region_labels")
-        self.weights = DataSet(Connectivity.weights, self)
+        self.weights = DataSet(Connectivity.weights, self, storage_role=ROLE_DENSE_MATRIX)
         self.undirected = Scalar(Connectivity.undirected, self)
-        self.tract_lengths = DataSet(Connectivity.tract_lengths, self)
+        self.tract_lengths = DataSet(Connectivity.tract_lengths, self, storage_role=ROLE_DENSE_MATRIX)
         self.centres = DataSet(Connectivity.centres, self)
         self.cortical = DataSet(Connectivity.cortical, self)
         self.hemispheres = DataSet(Connectivity.hemispheres, self)
@@ -55,7 +55,8 @@ class LocalConnectivityH5(H5File):
 
     def store(self, datatype, scalars_only=False):
         self.surface.store(datatype.surface)
-        self.matrix.store(datatype.matrix)
+        # stored by rows, so that the row of a single vertex can be read without loading the full matrix
+        self.matrix.store(datatype.matrix.tocsr())
         self.cutoff.store(datatype.cutoff)
         self.equation.store(datatype.equation.to_json(datatype.equation))
 
@@ -67,6 +68,12 @@ class LocalConnectivityH5(H5File):
         eq = datatype.equation.from_json(eq)
         datatype.equation = eq
 
+    def get_vertex_row(self, vertex_index):
+        """
+        :returns: dense 1D array with the connectivity of `vertex_index` to every vertex of the surface
+        """
+        return self.matrix.load_rows(vertex_index, vertex_index + 1).toarray().squeeze(axis=0)
+
     def get_min_max_values(self):
         metadata = self.matrix.get_metadata()
         return metadata.min, metadata.max
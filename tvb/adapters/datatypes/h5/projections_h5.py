@@ -27,6 +27,7 @@
 #   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
 #
 #
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_DENSE_MATRIX
 from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Reference, Json
 from tvb.datatypes.projections import ProjectionMatrix
 
@@ -42,4 +43,4 @@ class ProjectionMatrixH5(H5File):
         self.conductances = Json(ProjectionMatrix.conductances, self)
         self.sources = Reference(ProjectionMatrix.sources, self)
         self.sensors = Reference(ProjectionMatrix.sensors, self)
-        self.projection_data = DataSet(ProjectionMatrix.projection_data, self)
\ No newline at end of file
+        self.projection_data = DataSet(ProjectionMatrix.projection_data, self, storage_role=ROLE_DENSE_MATRIX)
\ No newline at end of file
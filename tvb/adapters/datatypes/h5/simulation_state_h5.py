@@ -28,7 +28,7 @@
 #
 #
 from tvb.basic.neotraits.api import Attr, Int, NArray, Float
-from tvb.core.neotraits.h5 import H5File, DataSet, Scalar
+from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Json
 from tvb.simulator.integrators import IntegratorStochastic
 from tvb.simulator.simulator import Simulator
 
@@ -81,7 +81,7 @@ class SimulationStateH5(H5File):
         for i, monitor in enumerate(simulator.monitors):
             monitor._stock = getattr(self, "monitor_stock_" + str(i + 1)).load()
 
-        if self.integrator_noise_rng_state_algo is not None:
+        if isinstance(simulator.integrator, IntegratorStochastic):
             rng_state = (
                 self.integrator_noise_rng_state_algo.load(),
                 self.integrator_noise_rng_state_keys.load(),
@@ -90,3 +90,24 @@ class SimulationStateH5(H5File):
                 self.integrator_noise_rng_state_cached_gauss.load()
             )
             simulator.integrator.noise.random_stream.set_state(rng_state)
+
+
+class SimulationCheckpointH5(SimulationStateH5):
+    """
+    State of a simulation still running, written periodically so that an interrupted simulation can be continued.
+    Beside the simulator state (whose current step is the step to continue from), it keeps the steps at which
+    the whole run started and ends, and the TimeSeries written so far, with their number of samples and the
+    statistics of their data when the checkpoint was taken.
+    """
+
+    def __init__(self, path):
+        super(SimulationCheckpointH5, self).__init__(path)
+        self.start_step = Scalar(Int(), self, name='start_step')
+        self.end_step = Scalar(Int(), self, name='end_step')
+        # {monitor class name: [TimeSeries gid hex, number of samples written, DataSetMetaData dict of the data]}
+        self.monitor_time_series = Json(Attr(dict), self, name='monitor_time_series')
+
+    def store_progress(self, start_step, end_step, monitor_time_series):
+        self.start_step.store(start_step)
+        self.end_step.store(end_step)
+        self.monitor_time_series.store(monitor_time_series)
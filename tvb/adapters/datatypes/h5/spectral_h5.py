@@ -29,6 +29,7 @@
 #
 import numpy
 import json
+from tvb.core.entities.file.hdf5_storage_policy import cast_to_precision
 from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Reference
 from tvb.datatypes.spectral import FourierSpectrum, WaveletCoefficients, CoherenceSpectrum, ComplexCoherenceSpectrum
 
@@ -57,30 +58,32 @@ class FourierSpectrumH5(DataTypeMatrixH5):
         self.average_power = DataSet(FourierSpectrum.average_power, self, expand_dimension=2)
         self.normalised_average_power = DataSet(FourierSpectrum.normalised_average_power, self, expand_dimension=2)
 
-    def write_data_slice(self, partial_result):
+    def write_data_slice(self, partial_result, dtype=None):
         """
         Append chunk.
+        :param dtype: floating point type to store the chunk with, None to keep the one of `partial_result`
         """
         # self.store_data_chunk('array_data', partial_result, grow_dimension=2, close_file=False)
 
         # mhtodo: these computations on the partial_result belong in the caller not here
 
-        self.array_data.append(partial_result.array_data)
+        self.array_data.append(cast_to_precision(partial_result.array_data, dtype), close_file=False)
 
         partial_result.compute_amplitude()
-        self.amplitude.append(partial_result.amplitude)
+        self.amplitude.append(cast_to_precision(partial_result.amplitude, dtype), close_file=False)
 
         partial_result.compute_phase()
-        self.phase.append(partial_result.phase)
+        self.phase.append(cast_to_precision(partial_result.phase, dtype), close_file=False)
 
         partial_result.compute_power()
-        self.power.append(partial_result.power)
+        self.power.append(cast_to_precision(partial_result.power, dtype), close_file=False)
 
         partial_result.compute_average_power()
-        self.average_power.append(partial_result.average_power)
+        self.average_power.append(cast_to_precision(partial_result.average_power, dtype), close_file=False)
 
         partial_result.compute_normalised_average_power()
-        self.normalised_average_power.append(partial_result.normalised_average_power)
+        self.normalised_average_power.append(cast_to_precision(partial_result.normalised_average_power, dtype),
+                                             close_file=False)
 
     def get_fourier_data(self, selected_state, selected_mode, normalized):
         shape = self.array_data.shape
@@ -96,8 +99,9 @@ class FourierSpectrumH5(DataTypeMatrixH5):
             data_matrix = self.average_power[slices]
 
         data_matrix = data_matrix.reshape((shape[0], shape[2]))
-        ymin = numpy.amin(data_matrix)
-        ymax = numpy.amax(data_matrix)
+        # plain floats, also for data stored as float32
+        ymin = float(numpy.amin(data_matrix))
+        ymax = float(numpy.amax(data_matrix))
         data_matrix = data_matrix.transpose()
         # mhtodo: this form with string inputs and json outputs belongs in some viewer not here
         return dict(data_matrix=json.dumps(data_matrix.tolist()),
@@ -120,22 +124,23 @@ class WaveletCoefficientsH5(DataTypeMatrixH5):
         self.phase = DataSet(WaveletCoefficients.phase, self, expand_dimension=2)
         self.power = DataSet(WaveletCoefficients.power, self, expand_dimension=2)
 
-    def write_data_slice(self, partial_result):
+    def write_data_slice(self, partial_result, dtype=None):
         """
         Append chunk.
+        :param dtype: floating point type to store the chunk with, None to keep the one of `partial_result`
         """
         # mhtodo: these computations on the partial_result belong in the caller not here
 
-        self.array_data.append(partial_result.array_data)
+        self.array_data.append(cast_to_precision(partial_result.array_data, dtype), close_file=False)
 
         partial_result.compute_amplitude()
-        self.amplitude.append(partial_result.amplitude)
+        self.amplitude.append(cast_to_precision(partial_result.amplitude, dtype), close_file=False)
 
         partial_result.compute_phase()
-        self.phase.append(partial_result.phase)
+        self.phase.append(cast_to_precision(partial_result.phase, dtype), close_file=False)
 
         partial_result.compute_power()
-        self.power.append(partial_result.power)
+        self.power.append(cast_to_precision(partial_result.power, dtype), close_file=False)
 
 
 class CoherenceSpectrumH5(DataTypeMatrixH5):
@@ -151,7 +156,7 @@ class CoherenceSpectrumH5(DataTypeMatrixH5):
         """
         Append chunk.
         """
-        self.array_data.append(partial_result.array_data)
+        self.array_data.append(partial_result.array_data, close_file=False)
 
 
 class ComplexCoherenceSpectrumH5(DataTypeMatrixH5):
@@ -170,9 +175,9 @@ class ComplexCoherenceSpectrumH5(DataTypeMatrixH5):
         """
         Append chunk.
         """
-        self.cross_spectrum.append(partial_result.cross_spectrum)
+        self.cross_spectrum.append(partial_result.cross_spectrum, close_file=False)
 
-        self.array_data.append(partial_result.array_data)
+        self.array_data.append(partial_result.array_data, close_file=False)
 
     def get_spectrum_data(self, selected_spectrum):
         shape = self.array_data.shape
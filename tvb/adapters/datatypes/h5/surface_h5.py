@@ -31,6 +31,7 @@
 import numpy
 from tvb.basic.logger.builder import get_logger
 from tvb.basic.neotraits.api import NArray, Int, Attr
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_SURFACE_GEOMETRY
 from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Json
 from tvb.datatypes.surfaces import Surface
 
@@ -60,10 +61,10 @@ class SurfaceH5(H5File):
 
     def __init__(self, path):
         super(SurfaceH5, self).__init__(path)
-        self.vertices = DataSet(Surface.vertices, self)
-        self.triangles = DataSet(Surface.triangles, self)
-        self.vertex_normals = DataSet(Surface.vertex_normals, self)
-        self.triangle_normals = DataSet(Surface.triangle_normals, self)
+        self.vertices = DataSet(Surface.vertices, self, storage_role=ROLE_SURFACE_GEOMETRY)
+        self.triangles = DataSet(Surface.triangles, self, storage_role=ROLE_SURFACE_GEOMETRY)
+        self.vertex_normals = DataSet(Surface.vertex_normals, self, storage_role=ROLE_SURFACE_GEOMETRY)
+        self.triangle_normals = DataSet(Surface.triangle_normals, self, storage_role=ROLE_SURFACE_GEOMETRY)
         self.number_of_vertices = Scalar(Surface.number_of_vertices, self)
         self.number_of_triangles = Scalar(Surface.number_of_triangles, self)
         self.edge_mean_length = Scalar(Surface.edge_mean_length, self)
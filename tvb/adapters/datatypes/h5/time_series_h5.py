@@ -31,28 +31,194 @@ import json
 from tvb.basic.neotraits.api import Int
 from tvb.core.adapters.arguments_serialisation import *
 from tvb.core.utils import prepare_time_slice
-from tvb.core.neotraits.h5 import H5File, Scalar, DataSet, Reference, Json
+from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file.exceptions import MissingDataSetException
+from tvb.core.entities.file.hdf5_node_major import NodeMajorCopy
+from tvb.core.entities.file.hdf5_pyramid import DataPyramid
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_TIME_SERIES
+from tvb.core.neotraits.h5 import H5File, Scalar, DataSet, Reference, Json, LazyDataSetArray
 from tvb.datatypes.time_series import *
 
 NO_OF_DEFAULT_SELECTED_CHANNELS = 20
 
 
+class RegularTimeDataSet(DataSet):
+    """
+    The `time` of a TimeSeries. Times following the sample period are not stored: only the time of the first
+    sample is kept, as an attribute, and the values are generated from it, the sample period and the length of
+    the data. Irregular times are stored as a dataset, like for any DataSet.
+    """
+    # relative to the sample period, for times computed by a simulator
+    TOLERANCE = 1e-6
+
+    def __init__(self, trait_attribute, h5file, data, sample_period, time_origin):
+        # type: (NArray, H5File, DataSet, Scalar, Scalar) -> None
+        super(RegularTimeDataSet, self).__init__(trait_attribute, h5file, expand_dimension=0)
+        self.data = data
+        self.sample_period = sample_period
+        self.time_origin = time_origin
+        # state of the appends: None before the first one, False when the times are stored, else the
+        # regular axis they follow
+        self._appending = None
+
+    def _stored_explicitly(self):
+        try:
+            self.owner.storage_manager.get_data_shape(self.field_name)
+            return True
+        except MissingDataSetException:
+            return False
+
+    def _regular_axis(self):
+        """
+        :returns: (time of the first sample, sample period) for generated times, None when they are stored
+        """
+        if self._stored_explicitly():
+            return None
+        try:
+            return self.time_origin.load(), self.sample_period.load()
+        except KeyError:
+            return None
+
+    def _data_length(self):
+        try:
+            return self.data.shape[0]
+        except MissingDataSetException:
+            return 0
+
+    def _is_regular(self, times, origin, period, first_index):
+        expected = origin + numpy.arange(first_index, first_index + len(times)) * period
+        return numpy.allclose(times, expected, rtol=0, atol=abs(period) * self.TOLERANCE)
+
+    def _appended_axis(self, times):
+        """
+        :returns: [time of the first sample, sample period, number of time points] of the file, which the
+            appended `times` should follow to be generated; None when they are to be stored
+        """
+        if times.ndim != 1 or not len(times) or self._stored_explicitly():
+            return None
+        try:
+            period = self.sample_period.load()
+        except KeyError:
+            return None
+        if not period > 0:
+            return None
+        try:
+            origin = self.time_origin.load()
+        except KeyError:
+            return [float(times[0]), period, 0]
+        # the times written before are as many as the data, or fewer when the data was appended first
+        data_length = self._data_length()
+        index = int(round((times[0] - origin) / period))
+        return [origin, period, index if 0 <= index <= data_length else data_length]
+
+    def append(self, data, close_file=True, grow_dimension=None):
+        data = numpy.asarray(data)
+        if self._appending is None:
+            self._appending = self._appended_axis(data) or False
+        if self._appending:
+            origin, period, nr_regular = self._appending
+            if data.ndim == 1 and self._is_regular(data, origin, period, nr_regular):
+                if nr_regular == 0:
+                    self.time_origin.store(origin)
+                self._appending[2] += len(data)
+                return
+            if nr_regular > 0:
+                # irregular from now on: store the times generated so far
+                super(RegularTimeDataSet, self).append(self._generate(origin, period, 0, nr_regular),
+                                                       close_file, grow_dimension)
+            self._appending = False
+        super(RegularTimeDataSet, self).append(data, close_file, grow_dimension)
+
+    def store(self, data):
+        if isinstance(data, LazyDataSetArray):
+            data = data.load()
+        data = self.trait_attribute._validate_set(None, data)
+        if data is not None and data.ndim == 1 and len(data):
+            try:
+                period = self.sample_period.load()
+            except KeyError:
+                period = 0
+            if period > 0 and self._is_regular(data, data[0], period, 0):
+                if self._stored_explicitly():
+                    self.owner.storage_manager.remove_data(self.field_name)
+                self.time_origin.store(float(data[0]))
+                self._appending = None
+                return
+        self._appending = None
+        super(RegularTimeDataSet, self).store(data)
+
+    def truncate(self, nr_time_points):
+        """
+        Drop the time points after the first `nr_time_points`. Generated times follow the length of the data.
+        """
+        self._appending = None
+        if self._stored_explicitly():
+            self.owner.storage_manager.truncate_data(self.field_name, nr_time_points)
+
+    @staticmethod
+    def _generate(origin, period, start, stop, step=1):
+        return origin + numpy.arange(start, stop, step) * period
+
+    def load(self, memory_map=False):
+        axis = self._regular_axis()
+        if axis is None:
+            return super(RegularTimeDataSet, self).load(memory_map)
+        return self._generate(axis[0], axis[1], 0, self._data_length())
+
+    def __getitem__(self, data_slice):
+        axis = self._regular_axis()
+        if axis is None:
+            return super(RegularTimeDataSet, self).__getitem__(data_slice)
+        if isinstance(data_slice, tuple) and len(data_slice) == 1:
+            data_slice = data_slice[0]
+        if isinstance(data_slice, slice):
+            indices = range(self._data_length())[data_slice]
+            return self._generate(axis[0], axis[1], indices.start, indices.stop, indices.step)
+        return self._generate(axis[0], axis[1], 0, self._data_length())[data_slice]
+
+    @property
+    def shape(self):
+        if self._regular_axis() is None:
+            return super(RegularTimeDataSet, self).shape
+        return self._data_length(),
+
+    @property
+    def dtype(self):
+        if self._regular_axis() is None:
+            return super(RegularTimeDataSet, self).dtype
+        return numpy.dtype(numpy.float64)
+
+
 class TimeSeriesH5(H5File):
+    # simulation results can be viewed while the simulator is still writing them
+    swmr_read = True
+    # downsampled min/max/mean levels of `data`, each one `PYRAMID_FACTOR` times coarser; 0 levels disables them
+    PYRAMID_FACTOR = 8
+    PYRAMID_LEVELS = 5
+    # shorter time series get no pyramid, reading them with a step is cheap enough
+    PYRAMID_MIN_LENGTH = 512
+
     def __init__(self, path):
         super(TimeSeriesH5, self).__init__(path)
         self.title = Scalar(TimeSeries.title, self)
-        self.data = DataSet(TimeSeries.data, self, expand_dimension=0)
+        self.data = DataSet(TimeSeries.data, self, expand_dimension=0, storage_role=ROLE_TIME_SERIES)
+        self.data_pyramid = DataPyramid(self.storage_manager, self.data.field_name, self.PYRAMID_FACTOR,
+                                        self.PYRAMID_LEVELS, self.PYRAMID_MIN_LENGTH)
+        self.node_major_copy = NodeMajorCopy(path)
+        self._node_major_ready = None
         self.nr_dimensions = Scalar(Int(), self, name="nr_dimensions")
 
         # omitted length_nd , these are indexing props, to be removed from datatype too
         self.labels_ordering = Json(TimeSeries.labels_ordering, self)
         self.labels_dimensions = Json(TimeSeries.labels_dimensions, self)
 
-        self.time = DataSet(TimeSeries.time, self, expand_dimension=0)
         self.start_time = Scalar(TimeSeries.start_time, self)
         self.sample_period = Scalar(TimeSeries.sample_period, self)
         self.sample_period_unit = Scalar(TimeSeries.sample_period_unit, self)
         self.sample_rate = Scalar(Float(), self, name="sample_rate")
+        # declared after the sample period, which is stored first and tells whether the times need storing
+        self.time_origin = Scalar(Float(), self, name="time_origin")
+        self.time = RegularTimeDataSet(TimeSeries.time, self, self.data, self.sample_period, self.time_origin)
 
         # omitted has_surface_mapping, has_volume_mapping, indexing props, to be removed fro datatype too
 
@@ -70,21 +236,59 @@ class TimeSeriesH5(H5File):
     #       Those belong to a higher level where dependent h5 files are handles and
     #       partially loaded datatypes are filled
 
+    def store(self, datatype, scalars_only=False, store_references=True):
+        super(TimeSeriesH5, self).store(datatype, scalars_only, store_references)
+        if not scalars_only and datatype.data is not None and datatype.data.ndim > 0:
+            self.data_pyramid.rebuild(datatype.data)
+
+    def close(self):
+        self.data_pyramid.finish()
+        super(TimeSeriesH5, self).close()
+
+    def start_swmr_write(self):
+        # the final length is not known, and the pyramid can not be created in SWMR mode
+        self.data_pyramid.start_now()
+        super(TimeSeriesH5, self).start_swmr_write()
+
     def read_data_shape(self):
         return self.data.shape
 
     def read_data_slice(self, data_slice):
         """
         Expose chunked-data access.
+        Slices of a single node are read from the node-major copy of the data, when there is one.
         """
+        if self.node_major_copy.is_node_slice(data_slice):
+            if self._node_major_ready is None:
+                self._node_major_ready = self.node_major_copy.matches(self.data.field_name, self.swmr_read)
+            if self._node_major_ready:
+                return self.node_major_copy.read(data_slice)
         return self.data[data_slice]
 
+    def finalize(self):
+        """
+        Start writing the node-major copy of large time series, for the analyzers reading one node at a time.
+        """
+        min_bytes = getattr(TvbProfile.current, 'HDF5_NODE_MAJOR_MIN_BYTES', None)
+        if min_bytes is None:
+            return None
+        try:
+            shape = self.data.shape
+        except MissingDataSetException:
+            return None
+        node_dimension = self.node_major_copy.node_dimension
+        if len(shape) <= node_dimension or shape[node_dimension] < 2:
+            return None
+        itemsize = numpy.dtype(self.storage_manager.get_data_dtype(self.data.field_name)).itemsize
+        if numpy.prod(shape) * itemsize < min_bytes:
+            return None
+        return self.node_major_copy.build_in_background(self.data.field_name, self.swmr_read)
+
     def read_time_page(self, current_page, page_size, max_size=None):
         """
         Compute time for current page.
         :param current_page: Starting from 0
         """
-        # todo: why are we even storing the time array if we return a synthetized version?
         current_page = int(current_page)
         page_size = int(page_size)
 
@@ -99,7 +303,8 @@ class TimeSeriesH5(H5File):
 
         return numpy.arange(start_time, end_time, self._sample_period)
 
-    def read_channels_page(self, from_idx, to_idx, step=None, specific_slices=None, channels_list=None):
+    def read_channels_page(self, from_idx, to_idx, step=None, specific_slices=None, channels_list=None,
+                           aggregation=None):
         """
         Read and return only the data page for the specified channels list.
 
@@ -108,6 +313,7 @@ class TimeSeriesH5(H5File):
         :param step: increments in which to read the data. Optional, default to 1.
         :param specific_slices: optional parameter. If speficied slices the data accordingly.
         :param channels_list: the list of channels for which we want data
+        :param aggregation: see `read_data_page`
         """
         if channels_list:
             channels_list = json.loads(channels_list)
@@ -119,7 +325,7 @@ class TimeSeriesH5(H5File):
         else:
             channel_slice = slice(None)
 
-        data_page = self.read_data_page(from_idx, to_idx, step, specific_slices)
+        data_page = self.read_data_page(from_idx, to_idx, step, specific_slices, aggregation)
         # This is just a 1D array like in the case of Global Average monitor.
         # No need for the channels list
         if len(data_page.shape) == 1:
@@ -127,9 +333,12 @@ class TimeSeriesH5(H5File):
         else:
             return data_page[:, channel_slice]
 
-    def read_data_page(self, from_idx, to_idx, step=None, specific_slices=None):
+    def read_data_page(self, from_idx, to_idx, step=None, specific_slices=None, aggregation=None):
         """
         Retrieve one page of data (paging done based on time).
+        By default every `step`-th time point is returned. With an `aggregation` (PYRAMID_MIN, PYRAMID_MAX or
+        PYRAMID_MEAN) and a large enough `step`, the page is read from the data pyramid instead, and each returned
+        time point is the aggregation of the `step` time points it stands for.
         """
         from_idx, to_idx = int(from_idx), int(to_idx)
 
@@ -157,7 +366,11 @@ class TimeSeriesH5(H5File):
             else:
                 slices.append(slice(specific_slices[i], min(specific_slices[i] + 1, overall_shape[i]), 1))
 
-        data = self.data[tuple(slices)]
+        data = None
+        if aggregation is not None and step >= self.PYRAMID_FACTOR:
+            data = self.data_pyramid.read(from_idx, min(to_idx, overall_shape[0]), step, slices[1:], aggregation)
+        if data is None:
+            data = self.data[tuple(slices)]
         if len(data) == 1:
             # Do not allow time dimension to get squeezed, a 2D result need to
             # come out of this method.
@@ -178,11 +391,32 @@ class TimeSeriesH5(H5File):
         """
         Append a chunk of time-series data to the ``data`` attribute.
         """
+        self.data_pyramid.append(partial_result)
         self.data.append(partial_result)
 
     def write_data_slice_on_grow_dimension(self, partial_result, grow_dimension=0):
+        if grow_dimension in (0, None):
+            self.data_pyramid.append(partial_result)
+        else:
+            # the pyramid summarizes time only
+            self.data_pyramid.remove()
         self.data.append(partial_result, grow_dimension=grow_dimension)
 
+    def truncate(self, nr_time_points, data_metadata=None):
+        """
+        Drop the time points after the first `nr_time_points` (e.g. written after the last checkpoint of a simulation).
+        :param data_metadata: statistics of the data kept (DataSetMetaData), e.g. saved with the checkpoint.
+            When None, they are computed again from the data kept.
+        """
+        try:
+            self.storage_manager.truncate_data(self.data.field_name, nr_time_points)
+            self.data.reset_metadata(data_metadata)
+        except MissingDataSetException:
+            # nothing was written yet
+            pass
+        self.time.truncate(nr_time_points)
+        self.data_pyramid.remove(keep_building=True)
+
     def get_min_max_values(self):
         """
         Retrieve the minimum and maximum values from the metadata.
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Buffering of monitor output, between the simulator loop and the TimeSeries H5 files.
+"""
+
+import time
+import queue
+import threading
+import numpy
+from tvb.basic.logger.builder import get_logger
+from tvb.core.entities.file.hdf5_storage_policy import cast_to_precision
+
+LOG = get_logger(__name__)
+
+
+class MonitorOutputBuffer(object):
+    """
+    Collects the samples produced by one monitor into a preallocated block, and writes the whole block into the
+    TimeSeries H5 file at once, instead of one append (with its resize and metadata update) for every sample.
+
+    The block size is given either as a number of samples, or as a number of bytes of monitor data.
+    When a BackgroundBlockWriter is given, full blocks are handed to it and a new block is started right away,
+    so that the simulation continues while the previous block is being written.
+
+    In live mode, the H5 file is switched to SWMR after the first block, so that viewers can read the results
+    while the simulation runs. A block is then also written when `flush_interval` seconds passed since the
+    last write, even if not full.
+    """
+
+    def __init__(self, ts_h5, block_samples=None, block_bytes=None, writer=None, live=False, flush_interval=None,
+                 dtype=None):
+        """
+        :param dtype: floating point type the samples are stored with, None to keep the one of the monitor
+        """
+        if block_samples is None and block_bytes is None:
+            raise ValueError("Either block_samples or block_bytes needs to be given")
+        self.ts_h5 = ts_h5
+        self.block_samples = block_samples
+        self.block_bytes = block_bytes
+        self.writer = writer
+        self.live = live
+        self.flush_interval = flush_interval
+        self.dtype = dtype
+        self._times = None
+        self._data = None
+        self._filled = 0
+        self._last_flush = time.time()
+
+    def _allocate(self, sample):
+        block_samples = self.block_samples
+        if block_samples is None:
+            block_samples = self.block_bytes // max(sample.nbytes, 1)
+        block_samples = max(int(block_samples), 1)
+        self._times = numpy.empty((block_samples,), dtype=numpy.float64)
+        dtype = sample.dtype if self.dtype is None else cast_to_precision(sample, self.dtype).dtype
+        self._data = numpy.empty((block_samples,) + sample.shape, dtype=dtype)
+
+    def add(self, sample_time, sample):
+        """
+        Buffer one monitor sample. The block is written to file when it becomes full.
+
+        :param sample_time: the time of this sample
+        :param sample: an array (state variables, nodes, modes) as returned by a monitor
+        """
+        sample = numpy.asarray(sample)
+        if self._data is None:
+            self._allocate(sample)
+        self._times[self._filled] = sample_time
+        self._data[self._filled] = sample
+        self._filled += 1
+        if self._filled == len(self._times):
+            self.flush()
+        elif self.flush_interval is not None and time.time() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the samples buffered so far into the H5 file.
+        """
+        self._last_flush = time.time()
+        if not self._filled:
+            return
+        times, data = self._times[:self._filled], self._data[:self._filled]
+        if self.writer is None:
+            write_block(self.ts_h5, times, data, self.live)
+        else:
+            self.writer.submit(self.ts_h5, times, data, self.live)
+            # the submitted block belongs to the writer now
+            self._times, self._data = None, None
+        self._filled = 0
+
+
+def write_block(ts_h5, times, data, live=False):
+    ts_h5.write_time_slice(times)
+    ts_h5.write_data_slice(data)
+    if live:
+        # the datasets exist now, readers can follow the next appends
+        ts_h5.start_swmr_write()
+
+
+class BackgroundBlockWriter(object):
+    """
+    Writes blocks of monitor output into their H5 files, from a separate thread.
+
+    Blocks wait in a bounded queue: when the writer falls behind, `submit` blocks the simulation until a slot
+    is free. An error in the writer thread is raised again in the simulation thread, on the next `submit`
+    or on `close`.
+    """
+
+    def __init__(self, max_pending_blocks=4):
+        self._queue = queue.Queue(maxsize=max_pending_blocks)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="BackgroundBlockWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, ts_h5, times, data, live=False):
+        self._raise_error()
+        self._queue.put((ts_h5, times, data, live))
+
+    def wait(self):
+        """
+        Wait until all pending blocks are written.
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Wait until all pending blocks are written, then stop the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            try:
+                if block is None:
+                    return
+                if self._error is not None:
+                    # keep draining the queue, so that the simulation thread is not blocked in submit
+                    continue
+                write_block(*block)
+            except Exception as excep:
+                LOG.exception("Could not write simulation results")
+                self._error = excep
+            finally:
+                self._queue.task_done()
@@ -39,10 +39,15 @@ Few supplementary steps are done here:
 .. moduleauthor:: Stuart A. Knock <Stuart@tvb.invalid>
 
 """
+import os
+import math
+import time
+import uuid
 import numpy
 from tvb.simulator.simulator import Simulator
 from tvb.adapters.simulator.coupling_forms import get_ui_name_to_coupling_dict
-from tvb.adapters.datatypes.h5.simulation_state_h5 import SimulationStateH5
+from tvb.adapters.simulator.monitor_buffer import MonitorOutputBuffer, BackgroundBlockWriter
+from tvb.adapters.datatypes.h5.simulation_state_h5 import SimulationStateH5, SimulationCheckpointH5
 from tvb.adapters.datatypes.db.region_mapping import RegionMappingIndex, RegionVolumeMappingIndex
 from tvb.adapters.datatypes.db.connectivity import ConnectivityIndex
 from tvb.adapters.datatypes.db.simulation_state import SimulationStateIndex
@@ -50,9 +55,12 @@ from tvb.adapters.datatypes.db.time_series import TimeSeriesIndex
 from tvb.core.entities.storage import dao
 from tvb.core.adapters.abcadapter import ABCAsynchronous, ABCAdapterForm
 from tvb.core.adapters.exceptions import LaunchException
+from tvb.core.entities.file.exceptions import MissingDataSetException
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
 from tvb.core.neotraits.forms import DataTypeSelectField, SimpleSelectField, FloatField, jinja_env
 from tvb.core.services.simulator_service import SimulatorService
 from tvb.core.neocom import h5
+from tvb.core.neotraits.h5 import DataSetMetaData
 
 
 class SimulatorAdapterForm(ABCAdapterForm):
@@ -115,6 +123,25 @@ class SimulatorAdapter(ABCAsynchronous):
     # We exclude from this for example EEG, MEG or Bold which return 
     HAVE_STATE_VARIABLES = ["GlobalAverage", "SpatialAverage", "Raw", "SubSample", "TemporalAverage"]
 
+    # Monitor output is written to file in blocks of this many samples.
+    # When None, the block size is computed from MONITOR_BUFFER_BYTES.
+    MONITOR_BUFFER_SAMPLES = None
+    MONITOR_BUFFER_BYTES = 4 * 2 ** 20
+    # When True, full blocks are written from a background thread, while the simulation continues.
+    # At most MONITOR_WRITER_QUEUE_SIZE blocks wait to be written, before the simulation is paused.
+    ASYNC_MONITOR_WRITES = False
+    MONITOR_WRITER_QUEUE_SIZE = 4
+    # Write the TimeSeries in HDF5 SWMR mode, so that they can be viewed while the simulation runs.
+    # Results are then written at least every LIVE_FLUSH_INTERVAL seconds.
+    LIVE_MONITOR_RESULTS = False
+    LIVE_FLUSH_INTERVAL = 10
+    # Save the simulation state (with the monitor outputs written so far) every CHECKPOINT_INTERVAL_STEPS integration
+    # steps, or every CHECKPOINT_INTERVAL_SECONDS of wall time (checked when the monitors produce output).
+    # A failed or canceled simulation relaunched in the same operation continues from its last checkpoint.
+    CHECKPOINT_INTERVAL_STEPS = None
+    CHECKPOINT_INTERVAL_SECONDS = 600
+    CHECKPOINT_FILE_NAME = "simulation.checkpoint"
+
     def __init__(self):
         super(SimulatorAdapter, self).__init__()
         self.log.debug("%s: Initialized..." % str(self))
@@ -167,7 +194,7 @@ class SimulatorAdapter(ABCAsynchronous):
         """
         Return the required disk size this algorithm estimates it will take. (in kB)
         """
-        return self.algorithm.storage_requirement(self.simulation_length) / 2 ** 10
+        return self.algorithm.storage_requirement(self.simulation_length) * self.results_dtype.itemsize / 8.0 / 2 ** 10
 
     def get_execution_time_approximation(self, **kwargs):
         """
@@ -242,6 +269,7 @@ class SimulatorAdapter(ABCAsynchronous):
           stimulus: tvb.datatypes.patters.* object
         """
         result_h5 = dict()
+        result_buffers = dict()
         result_indexes = dict()
         start_time = self.algorithm.current_step * self.algorithm.integrator.dt
 
@@ -253,6 +281,13 @@ class SimulatorAdapter(ABCAsynchronous):
             with SimulationStateH5(self.branch_simulation_state_path) as branch_simulation_state_h5:
                 branch_simulation_state_h5.load_into(self.algorithm)
 
+        # the simulator computes ceil(simulation_length / dt) steps
+        first_step = self.algorithm.current_step
+        end_step = first_step + int(math.ceil(self.simulation_length / self.algorithm.integrator.dt))
+        checkpoint_time_series = {}
+        if os.path.exists(self._checkpoint_path()):
+            first_step, end_step, checkpoint_time_series = self._load_checkpoint()
+
         region_map, region_volume_map = self._try_load_region_mapping()
 
         for monitor in self.algorithm.monitors:
@@ -261,6 +296,9 @@ class SimulatorAdapter(ABCAsynchronous):
                                             region_volume_map)
             self.log.debug("Monitor created the TS")
             ts.start_time = start_time
+            if m_name in checkpoint_time_series:
+                # continue writing the TimeSeries of the interrupted run
+                ts.gid = uuid.UUID(checkpoint_time_series[m_name][0])
 
             ts_index_class = h5.REGISTRY.get_index_for_datatype(type(ts))
             ts_index = ts_index_class()
@@ -295,18 +333,45 @@ class SimulatorAdapter(ABCAsynchronous):
                     ts_index.region_mapping_volume_gid = region_volume_map.gid.hex
                     ts_h5.region_mapping_volume.store(region_volume_map.gid)
 
+            if m_name in checkpoint_time_series:
+                # drop what was written after the checkpoint, it will be computed again
+                checkpoint_entry = checkpoint_time_series[m_name]
+                data_metadata = DataSetMetaData.from_dict(checkpoint_entry[2]) if len(checkpoint_entry) > 2 else None
+                ts_h5.truncate(checkpoint_entry[1], data_metadata)
+
             result_indexes[m_name] = ts_index
             result_h5[m_name] = ts_h5
 
+        block_writer = None
+        if self.ASYNC_MONITOR_WRITES:
+            block_writer = BackgroundBlockWriter(self.MONITOR_WRITER_QUEUE_SIZE)
+        flush_interval = self.LIVE_FLUSH_INTERVAL if self.LIVE_MONITOR_RESULTS else None
+        results_dtype = self.results_dtype
+        for m_name, ts_h5 in result_h5.items():
+            result_buffers[m_name] = MonitorOutputBuffer(ts_h5, self.MONITOR_BUFFER_SAMPLES, self.MONITOR_BUFFER_BYTES,
+                                                         block_writer, self.LIVE_MONITOR_RESULTS, flush_interval,
+                                                         results_dtype)
+
         # Run simulation
         self.log.debug("Starting simulation...")
-        for result in self.algorithm(simulation_length=self.simulation_length):
-            for j, monitor in enumerate(self.algorithm.monitors):
-                if result[j] is not None:
-                    m_name = monitor.__class__.__name__
-                    ts_h5 = result_h5[m_name]
-                    ts_h5.write_time_slice([result[j][0]])
-                    ts_h5.write_data_slice([result[j][1]])
+        last_checkpoint_step, last_checkpoint_time = self.algorithm.current_step, time.time()
+        try:
+            for step, state, result in self._simulation_steps(first_step, end_step):
+                for j, monitor in enumerate(self.algorithm.monitors):
+                    if result[j] is not None:
+                        result_buffers[monitor.__class__.__name__].add(result[j][0], result[j][1])
+                self.report_progress((step - first_step) / (end_step - first_step))
+
+                if step < end_step and self._is_checkpoint_due(step - last_checkpoint_step, last_checkpoint_time):
+                    self._write_checkpoint(step, state, first_step, end_step, result_h5, result_buffers,
+                                           block_writer)
+                    last_checkpoint_step, last_checkpoint_time = step, time.time()
+            for monitor_buffer in result_buffers.values():
+                monitor_buffer.flush()
+        finally:
+            if block_writer is not None:
+                block_writer.close()
+        self.algorithm.simulation_length = self.simulation_length
 
         self.log.debug("Completed simulation, starting to store simulation state ")
         # Populate H5 file for simulator state. This step could also be done while running sim, in background.
@@ -323,9 +388,123 @@ class SimulatorAdapter(ABCAsynchronous):
             ts_shape = result_h5[m_name].read_data_shape()
             result_indexes[m_name].fill_shape(ts_shape)
             result_h5[m_name].close()
+        self._remove_checkpoint()
         # self.log.info("%s: Adapter simulation finished!!" % str(self))
         return list(result_indexes.values())
 
+    def _checkpoint_path(self):
+        return os.path.join(self.storage_path, self.CHECKPOINT_FILE_NAME)
+
+    def _simulation_steps(self, first_step, end_step):
+        """
+        Run the simulator from its current step up to `end_step`, with a single call of its generator,
+        so that e.g. the stimulus time axis is that of the whole run.
+
+        :param first_step: the step at which the run started, before the current step when continuing a checkpoint
+        :returns: generator of (step, state at that step, monitor outputs), for the steps with output
+        """
+        simulator = self.algorithm
+        dt = simulator.integrator.dt
+        last_step = {}
+
+        def update_history(step, n_reg, state):
+            # the simulator keeps the state of the running steps local, remember it for checkpoints
+            type(simulator)._loop_update_history(simulator, step, n_reg, state)
+            last_step['step'], last_step['state'] = step, state
+
+        simulator._loop_update_history = update_history
+        if simulator.stimulus is not None and simulator.current_step > first_step:
+            # continue the stimulus of the interrupted run, instead of restarting it at the current step
+            resumed_steps = simulator.current_step - first_step
+            run_length = (end_step - first_step - 0.5) * dt
+
+            def prepare_stimulus():
+                remaining_length = simulator.simulation_length
+                simulator.simulation_length = run_length
+                try:
+                    return type(simulator)._prepare_stimulus(simulator)
+                finally:
+                    simulator.simulation_length = remaining_length
+
+            def update_stimulus(step, stimulus):
+                type(simulator)._loop_update_stimulus(simulator, step + resumed_steps, stimulus)
+
+            simulator._prepare_stimulus = prepare_stimulus
+            simulator._loop_update_stimulus = update_stimulus
+        try:
+            # half a step less than the number of steps, so that rounding up gives exactly that number of steps
+            for result in simulator(simulation_length=(end_step - simulator.current_step - 0.5) * dt):
+                yield last_step['step'], last_step['state'], result
+        finally:
+            for method_name in ('_loop_update_history', '_prepare_stimulus', '_loop_update_stimulus'):
+                simulator.__dict__.pop(method_name, None)
+
+    def _is_checkpoint_due(self, steps_since_checkpoint, last_checkpoint_time):
+        if self.CHECKPOINT_INTERVAL_STEPS and steps_since_checkpoint >= self.CHECKPOINT_INTERVAL_STEPS:
+            return True
+        return bool(self.CHECKPOINT_INTERVAL_SECONDS) and \
+            time.time() - last_checkpoint_time >= self.CHECKPOINT_INTERVAL_SECONDS
+
+    def _write_checkpoint(self, step, state, first_step, end_step, result_h5, result_buffers, block_writer):
+        """
+        Write all the monitor output produced so far, then the simulator state at `step`, into a new
+        checkpoint file. The file replaces the previous checkpoint only once complete.
+        """
+        for monitor_buffer in result_buffers.values():
+            monitor_buffer.flush()
+        if block_writer is not None:
+            block_writer.wait()
+        monitor_time_series = {}
+        for m_name, ts_h5 in result_h5.items():
+            try:
+                nr_samples = ts_h5.read_data_shape()[0]
+                data_metadata = ts_h5.data.get_cached_metadata()
+            except MissingDataSetException:
+                # the monitor did not produce any sample yet
+                nr_samples, data_metadata = 0, DataSetMetaData(min=None, max=None, mean=None)
+            monitor_time_series[m_name] = [ts_h5.gid.load().hex, nr_samples, self._json_metadata(data_metadata)]
+
+        checkpoint_path = self._checkpoint_path()
+        tmp_path = checkpoint_path + ".tmp"
+        # the simulator generator is still running: its step and state are only updated at the end of the run
+        running_step, running_state = self.algorithm.current_step, self.algorithm.current_state
+        self.algorithm.current_step, self.algorithm.current_state = step, state
+        try:
+            with SimulationCheckpointH5(tmp_path) as checkpoint_h5:
+                checkpoint_h5.store(self.algorithm)
+                checkpoint_h5.store_progress(first_step, end_step, monitor_time_series)
+        finally:
+            self.algorithm.current_step, self.algorithm.current_state = running_step, running_state
+        H5_FILE_POOL.close(tmp_path)
+        H5_FILE_POOL.close(checkpoint_path)
+        os.replace(tmp_path, checkpoint_path)
+        self.log.debug("Simulation checkpoint written at step %d" % step)
+
+    @staticmethod
+    def _json_metadata(data_metadata):
+        return dict((key, value.item() if isinstance(value, numpy.generic) else value)
+                    for key, value in data_metadata.to_dict().items())
+
+    def _load_checkpoint(self):
+        """
+        Restore the simulator state from the checkpoint of an interrupted run.
+        :returns: (first step of the run, end step, {monitor name: [TimeSeries gid hex, number of samples,
+            statistics of the samples]})
+        """
+        with SimulationCheckpointH5(self._checkpoint_path()) as checkpoint_h5:
+            checkpoint_h5.load_into(self.algorithm)
+            first_step = checkpoint_h5.start_step.load()
+            end_step = checkpoint_h5.end_step.load()
+            monitor_time_series = checkpoint_h5.monitor_time_series.load()
+        self.log.info("Continuing the simulation from the checkpoint at step %d" % self.algorithm.current_step)
+        return first_step, end_step, monitor_time_series
+
+    def _remove_checkpoint(self):
+        checkpoint_path = self._checkpoint_path()
+        H5_FILE_POOL.close(checkpoint_path)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
     def _validate_model_parameters(self, model_instance, connectivity, surface):
         """
         Checks if the size of the model parameters is set correctly.
@@ -162,7 +162,7 @@ class TimeSeries(ABCSpaceDisplayer):
         h5_file = h5.h5_file_for_index(time_series)
         assert isinstance(h5_file, TimeSeriesH5)
         shape = list(h5_file.read_data_shape())
-        ts = h5_file.storage_manager.get_data('time')
+        ts = h5_file.time.load()
         state_variables = h5_file.labels_dimensions.load().get(time_series.labels_ordering[1], [])
         labels = self.get_space_labels(h5_file)
 
@@ -39,6 +39,7 @@ from sqlalchemy.sql import text
 from sqlalchemy.engine import reflection
 from tvb.basic.profile import TvbProfile
 from tvb.basic.logger.builder import get_logger
+from tvb.core.entities.file.hdf5_path_index import H5_PATH_INDEX
 from tvb.core.entities.storage import SA_SESSIONMAKER
 from tvb.core.neotraits.db import Base
 import tvb.core.entities.model.db_update_scripts as scripts
@@ -100,6 +101,8 @@ def reset_database():
                     LOGGER.error("Could no drop table %s", table)
                     LOGGER.exception(excep1)
         session.commit()
+        # operation ids will be reused, forget their folders
+        H5_PATH_INDEX.clear()
         LOGGER.info("Database was cleanup!")
     except Exception as excep:
         LOGGER.warning(excep)
@@ -51,6 +51,27 @@ class WebSettingsProfile(BaseSettingsProfile):
     """
     LOGGER_CONFIG_FILE_NAME = "logger_config.conf"
 
+    # Chunking and compression of the datasets in TVB H5 files (see tvb.core.entities.file.hdf5_storage_policy)
+    # HDF5_COMPRESSION can be None, 'gzip' or 'lzf'
+    HDF5_COMPRESSION = None
+    HDF5_COMPRESSION_LEVEL = 4
+    HDF5_SHUFFLE = True
+    HDF5_CHUNK_BYTES = 2 ** 18
+    # Time series larger than this many bytes get a copy chunked by node, for the analyzers reading one node at a
+    # time (e.g. 2 ** 26). None disables the copies (see tvb.core.entities.file.hdf5_node_major)
+    HDF5_NODE_MAJOR_MIN_BYTES = None
+    # Floating point precision of simulation and analysis results: 'float64' or 'float32'.
+    # An operation can choose another one, with the DataTypeMetaData.KEY_PRECISION of its meta-data.
+    HDF5_RESULTS_PRECISION = 'float64'
+    # Minimum number of seconds between two updates of the progress of a running operation
+    OPERATION_PROGRESS_INTERVAL = 2
+    # Launch operations on a pool of MAX_THREADS_NUMBER long lived processes, instead of a new process each.
+    # A worker is replaced after OPERATION_WORKER_MAX_OPERATIONS operations, or when its memory grows over
+    # OPERATION_WORKER_MAX_MEMORY bytes (None for no limit).
+    OPERATION_WORKER_POOL = False
+    OPERATION_WORKER_MAX_OPERATIONS = 100
+    OPERATION_WORKER_MAX_MEMORY = 2 ** 32
+
     def initialize_profile(self, change_logger_in_dev=True):
         """
         Specific initialization when functioning with storage
@@ -55,6 +55,9 @@ from tvb.core.neotraits.h5 import H5File
 from tvb.core.utils import date2string, LESS_COMPLEX_TIME_FORMAT
 from tvb.core.entities.storage import dao
 from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.operation_progress import ProgressReporter
+from tvb.core.entities.file.hdf5_group_view import refresh_group_view
+from tvb.core.entities.file.hdf5_storage_policy import results_dtype
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData
 from tvb.core.adapters.exceptions import IntrospectionException, LaunchException, InvalidParameterException
 from tvb.core.adapters.exceptions import NoMemoryAvailableException
@@ -223,6 +226,8 @@ class ABCAdapter(object):
         self.log = get_logger(self.__class__.__module__)
         self.tree_manager = InputTreeManager()
         self.submitted_form = None
+        # Publishes the progress of the running operation, only set while launched from _prelaunch
+        self.progress_reporter = None
 
     @classmethod
     def get_group_name(cls):
@@ -331,6 +336,22 @@ class ABCAdapter(object):
         """
 
 
+    def report_progress(self, fraction):
+        """
+        To be called by adapters during launch, with the fraction (between 0 and 1) of the work already done.
+        It is cheap enough to be called for every step of a loop, as the progress is only stored periodically.
+        """
+        if self.progress_reporter is not None:
+            self.progress_reporter.update(fraction)
+
+    @property
+    def results_dtype(self):
+        """
+        Floating point type to store the results of this operation with: the precision in the operation
+        meta-data, else the HDF5_RESULTS_PRECISION of the profile.
+        """
+        return results_dtype(self.meta_data.get(DataTypeMetaData.KEY_PRECISION))
+
     def add_operation_additional_info(self, message):
         """
         Adds additional info on the operation to be displayed in the UI. Usually a warning message.
@@ -394,7 +415,12 @@ class ABCAdapter(object):
         dao.store_entity(operation)
 
         self._prepare_generic_attributes(uid)
-        result = self.launch(**kwargs)
+        self.progress_reporter = ProgressReporter(operation.id)
+        try:
+            result = self.launch(**kwargs)
+        finally:
+            self.progress_reporter.remove()
+            self.progress_reporter = None
 
         if not isinstance(result, (list, tuple)):
             result = [result, ]
@@ -437,6 +463,7 @@ class ABCAdapter(object):
                 res.disk_size = self.file_handler.compute_size_on_disk(associated_file)
                 with H5File.from_file(associated_file) as f:
                     f.store_generic_attributes(self.generic_attributes)
+                    f.finalize()
             dao.store_entity(res)
             group_type = res.type
             count_stored += 1
@@ -446,6 +473,7 @@ class ABCAdapter(object):
             operation_group = dao.get_operationgroup_by_id(operation.fk_operation_group)
             operation_group.fill_operationgroup_name(group_type)
             dao.store_entity(operation_group)
+            refresh_group_view(data_type_group_id, self.operation_id)
 
         return 'Operation ' + str(self.operation_id) + ' has finished.', count_stored
 
@@ -582,6 +610,13 @@ class ABCAsynchronous(ABCAdapter):
         """
         return size * TvbProfile.current.MAGIC_NUMBER / 8 / 2 ** 10
 
+    def results_size2kb(self, size):
+        """
+        :param size: size in bytes of float64 results
+        :return: size in kB, for the precision the results are stored with
+        """
+        return self.array_size2kb(size * self.results_dtype.itemsize / 8.0)
+
 
 @add_metaclass(ABCMeta)
 class ABCSynchronous(ABCAdapter):
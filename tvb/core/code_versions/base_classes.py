@@ -79,12 +79,19 @@ class UpdateManager(object):
         return result
 
 
+    def get_script_module(self, script_name):
+        """
+        Import one script file.
+        """
+        script_module_name = self.update_scripts_module.__name__ + '.' + script_name.split('.')[0]
+        return __import__(script_module_name, globals(), locals(), ['update'])
+
+
     def run_update_script(self, script_name, **kwargs):
         """
         Run one script file.
         """
-        script_module_name = self.update_scripts_module.__name__ + '.' + script_name.split('.')[0]
-        script_module = __import__(script_module_name, globals(), locals(), ['update'])
+        script_module = self.get_script_module(script_name)
 
         if not hasattr(script_module, 'update'):
             raise InvalidUpgradeScriptException("Code update scripts should expose a 'update()' method.")
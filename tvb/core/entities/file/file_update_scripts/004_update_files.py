@@ -49,6 +49,8 @@ LOGGER = get_logger(__name__)
 FIELD_PROJECTION_TYPE = "Projection_type"
 FIELD_SURFACE_MAPPING = "Has_surface_mapping"
 FIELD_VOLUME_MAPPING = "Has_volume_mapping"
+# Stores DataTypes in the DB, thus the files are not upgraded by the pool processes (see FilesUpdateManager)
+UPDATES_DATABASE = True
 
 
 def update(input_file):
@@ -42,6 +42,10 @@ from tvb.core.decorators import synchronized
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData, GenericMetaData
 from tvb.core.entities.file.xml_metadata_handlers import XMLReader, XMLWriter
 from tvb.core.entities.file.exceptions import FileStructureException
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_node_major import NodeMajorCopy
+from tvb.core.entities.file.hdf5_path_index import H5_PATH_INDEX
 
 
 from threading import Lock
@@ -112,7 +116,9 @@ class FilesHelper(object):
             if os.path.exists(new_full_name):
                 raise IOError("Path exists %s " % new_full_name)
 
-            os.rename(path, new_full_name)
+            with H5_FILE_LOCKS.removing_folder(path):
+                os.rename(path, new_full_name)
+            H5_PATH_INDEX.invalidate_folder(path)
             return path, new_full_name
         except Exception:
             self.logger.exception("Could not rename node!")
@@ -123,11 +129,14 @@ class FilesHelper(object):
         """ Remove all folders for project or THROW FileStructureException. """
         try:
             complete_path = self.get_project_folder(project_name)
-            if os.path.exists(complete_path):
-                if os.path.isdir(complete_path):
-                    shutil.rmtree(complete_path)
-                else:
-                    os.remove(complete_path)
+            H5_FILE_POOL.close_folder(complete_path)
+            H5_PATH_INDEX.invalidate_folder(complete_path)
+            with H5_FILE_LOCKS.removing_folder(complete_path):
+                if os.path.exists(complete_path):
+                    if os.path.isdir(complete_path):
+                        shutil.rmtree(complete_path)
+                    else:
+                        os.remove(complete_path)
             self.logger.debug("Project folders were removed for " + project_name)
         except OSError:
             self.logger.exception("A problem occurred while removing folder.")
@@ -236,10 +245,13 @@ class FilesHelper(object):
         try:
             complete_path = self.get_operation_folder(project_name, operation_id)
             self.logger.debug("Removing: " + str(complete_path))
-            if os.path.isdir(complete_path):
-                shutil.rmtree(complete_path)
-            elif os.path.exists(complete_path):
-                os.remove(complete_path)
+            H5_FILE_POOL.close_folder(complete_path)
+            H5_PATH_INDEX.invalidate_folder(complete_path)
+            with H5_FILE_LOCKS.removing_folder(complete_path):
+                if os.path.isdir(complete_path):
+                    shutil.rmtree(complete_path)
+                elif os.path.exists(complete_path):
+                    os.remove(complete_path)
         except Exception:
             self.logger.exception("Could not remove files")
             raise FileStructureException("Could not remove files for OP" + str(operation_id))
@@ -251,10 +263,14 @@ class FilesHelper(object):
         Remove H5 storage fully.
         """
         try:
-            if os.path.exists(h5_file):
-                os.remove(h5_file)
-            else:
-                self.logger.warning("Data file already removed:" + str(h5_file))
+            H5_FILE_POOL.close(h5_file)
+            H5_PATH_INDEX.remove(h5_file)
+            NodeMajorCopy(h5_file).remove()
+            with H5_FILE_LOCKS.removing(h5_file):
+                if os.path.exists(h5_file):
+                    os.remove(h5_file)
+                else:
+                    self.logger.warning("Data file already removed:" + str(h5_file))
         except Exception:
             self.logger.exception("Could not remove file")
             raise FileStructureException("Could not remove " + str(h5_file))
@@ -268,7 +284,12 @@ class FilesHelper(object):
             full_path = datatype.get_storage_file_path()
             folder = self.get_project_folder(new_project_name, str(new_op_id))
             full_new_file = os.path.join(folder, os.path.split(full_path)[1])
-            os.rename(full_path, full_new_file)
+            H5_FILE_POOL.close(full_path)
+            with H5_FILE_LOCKS.removing(full_path):
+                os.rename(full_path, full_new_file)
+            NodeMajorCopy(full_path).move_to(full_new_file)
+            H5_PATH_INDEX.remove(full_path)
+            H5_PATH_INDEX.add(full_new_file)
         except Exception:
             self.logger.exception("Could not move file")
             raise FileStructureException("Could not move " + str(datatype))
@@ -458,8 +479,12 @@ class FilesHelper(object):
         for file_ in file_list:
             try:
                 if os.path.isfile(file_):
+                    H5_FILE_POOL.close(file_)
+                    H5_PATH_INDEX.remove(file_)
                     os.remove(file_)
                 if os.path.isdir(file_):
+                    H5_FILE_POOL.close_folder(file_)
+                    H5_PATH_INDEX.invalidate_folder(file_)
                     shutil.rmtree(file_)
             except Exception:
                 logger = get_logger(__name__)
@@ -475,6 +500,8 @@ class FilesHelper(object):
         :param ignore_errors: When False throw FileStructureException if folder_path is invalid.
         """
         if os.path.isdir(folder_path):
+            H5_FILE_POOL.close_folder(folder_path)
+            H5_PATH_INDEX.invalidate_folder(folder_path)
             shutil.rmtree(folder_path, ignore_errors)
             return 
         if not ignore_errors:
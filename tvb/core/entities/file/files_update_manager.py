@@ -37,29 +37,96 @@ Manager for the file storage version updates.
 """
 
 import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 import tvb.core.entities.file.file_update_scripts as file_update_scripts
 from datetime import datetime
 from tvb.basic.config import stored
+from tvb.basic.logger.builder import get_logger
 from tvb.basic.profile import TvbProfile
 from tvb.core.code_versions.base_classes import UpdateManager
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_validity_cache import H5_VALIDITY_CACHE
 from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
 from tvb.core.entities.file.files_helper import FilesHelper
 from tvb.core.entities.file.exceptions import MissingDataFileException, FileStructureException
+from tvb.core.entities.model.model_datatype import DataTypeGroup
 from tvb.core.entities.storage import dao
+from tvb.core.entities.storage import session_maker
+from tvb.core.neocom import h5
 
 
 FILE_STORAGE_VALID = 'valid'
 FILE_STORAGE_INVALID = 'invalid'
 
+# Outcome of upgrading one file, in a process of the upgrade pool
+UPGRADE_DONE = 'done'
+UPGRADE_NOT_NEEDED = 'not needed'
+UPGRADE_FAILED = 'failed'
+
+# DB connections inherited from the parent process. They are kept referenced (never closed) in the pool processes,
+# because closing them from a child would also end the session of the parent.
+_PARENT_DB_POOLS = []
+
+
+def _init_upgrade_process(profile_name):
+    """
+    Prepare a process of the upgrade pool, before it gets any file.
+    """
+    if TvbProfile.CURRENT_PROFILE_NAME != profile_name:
+        # spawned, not forked: nothing was inherited from the parent
+        TvbProfile.set_profile(profile_name)
+        return
+    H5_FILE_POOL.reset_after_fork()
+    H5_FILE_LOCKS.reset_after_fork()
+    _PARENT_DB_POOLS.append(session_maker.DB_ENGINE.pool)
+    session_maker.DB_ENGINE.pool = session_maker.DB_ENGINE.pool.recreate()
+
+
+def _upgrade_file_task(file_path):
+    """
+    Upgrade one H5 file, in a process of the upgrade pool.
+    :returns: tuple (outcome, file size in bytes, size on disk as stored in DB, error message)
+    """
+    try:
+        update_was_needed = FilesUpdateManager().upgrade_file(file_path)
+    except Exception as excep:
+        get_logger(__name__).exception(excep)
+        return UPGRADE_FAILED, 0, None, str(excep)
+    file_size = os.path.getsize(file_path)
+    if not update_was_needed:
+        return UPGRADE_NOT_NEEDED, file_size, None, None
+    return UPGRADE_DONE, file_size, FilesHelper.compute_size_on_disk(file_path), None
+
+
+def _check_file_task(file_path):
+    """
+    :returns: tuple (True when the file needs an upgrade, file size in bytes)
+    """
+    if not os.path.exists(file_path):
+        return False, 0
+    return not FilesUpdateManager().is_file_up_to_date(file_path), os.path.getsize(file_path)
+
 
 class FilesUpdateManager(UpdateManager):
     """
     Manager for updating H5 files version, when code gets changed.
+
+    The files are upgraded by a pool of processes. After each page of DataTypes, the progress is saved in a
+    checkpoint file in the TVB storage, thus an interrupted upgrade continues from the last finished page.
+    Files needing a script which writes into the database (UPDATES_DATABASE in the script module) are upgraded
+    by this process instead, one at a time, while the pool upgrades the others: concurrent writes from the pool
+    processes fail on the database lock (e.g. "database is locked" with SQLite).
     """
 
     UPDATE_SCRIPTS_SUFFIX = "_update_files"
     PROJECTS_PAGE_SIZE = 20
     DATA_TYPES_PAGE_SIZE = 500
+    CHECKPOINT_FILE = "files_update_checkpoint.json"
+    # number of files sent at once to a process of the pool
+    FILES_PER_TASK = 10
     STATUS = True
     MESSAGE = "Done"
 
@@ -69,17 +136,19 @@ class FilesUpdateManager(UpdateManager):
                                                  TvbProfile.current.version.DATA_CHECKED_TO_VERSION,
                                                  TvbProfile.current.version.DATA_VERSION)
         self.files_helper = FilesHelper()
+        # script name -> True when the script writes into the database
+        self._database_scripts = {}
 
 
     def get_file_data_version(self, file_path):
         """
-        Return the data version for the given file.
+        Return the data version for the given file. It is cached until the file changes on disk.
         
         :param file_path: the path on disk to the file for which you need the TVB data version
         :returns: a number representing the data version for which the input file was written
         """
         manager = self._get_manager(file_path)
-        return manager.get_file_data_version()
+        return H5_VALIDITY_CACHE.data_version(file_path, manager.get_file_data_version)
 
 
     def is_file_up_to_date(self, file_path):
@@ -119,6 +188,7 @@ class FilesUpdateManager(UpdateManager):
         self.log.info("Updating from version %s , file: %s " % (file_version, input_file_name))
         for script_name in self.get_update_scripts(file_version):
             self.run_update_script(script_name, input_file=input_file_name)
+        H5_VALIDITY_CACHE.forget(input_file_name)
 
         if datatype:
             # Compute and update the disk_size attribute of the DataType in DB:
@@ -128,59 +198,186 @@ class FilesUpdateManager(UpdateManager):
         return True
 
 
-    def __upgrade_datatype_list(self, datatypes):
+    def _updates_database(self, file_path):
         """
-        Upgrade a list of DataTypes to the current version.
-        
-        :param datatypes: The list of DataTypes that should be upgraded.
+        :returns: True when one of the scripts upgrading `file_path` writes into the database
+        """
+        try:
+            script_names = self.get_update_scripts(self.get_file_data_version(file_path))
+        except Exception:
+            # the upgrade of the file reports the problem
+            return False
+        for script_name in script_names:
+            if script_name not in self._database_scripts:
+                try:
+                    script_module = self.get_script_module(script_name)
+                except ImportError:
+                    # the upgrade of the file reports the problem
+                    return False
+                self._database_scripts[script_name] = getattr(script_module, 'UPDATES_DATABASE', False)
+            if self._database_scripts[script_name]:
+                return True
+        return False
+
 
-        :returns: (nr_of_dts_upgraded_fine, nr_of_dts_upgraded_fault) a two-tuple of integers representing
-            the number of DataTypes for which the upgrade worked fine, and the number of DataTypes for which
-            some kind of fault occurred
+    @staticmethod
+    def __mark_invalid(datatype):
+        datatype.invalid = True
+        dao.store_entity(datatype)
+
+
+    def __datatype_files(self, datatypes):
         """
-        nr_of_dts_upgraded_fine = 0
-        nr_of_dts_upgraded_fault = 0
-        no_of_dts_ignored = 0
+        Find the H5 files of a list of DataTypes.
 
+        :returns: (files, nr_of_dts_fault, nr_of_dts_ignored) where files is a list of (DataType, H5 path).
+            DataTypes which can not be loaded are marked as invalid, DataTypeGroups have no file and are ignored.
+        """
+        files = []
+        nr_of_dts_fault = 0
+        nr_of_dts_ignored = 0
         for datatype in datatypes:
             try:
-                from tvb.basic.traits.types_mapped import MappedType
-
                 specific_datatype = dao.get_datatype_by_gid(datatype.gid, load_lazy=False)
 
                 if specific_datatype is None:
-                    datatype.invalid = True
-                    dao.store_entity(datatype)
-                    nr_of_dts_upgraded_fault += 1
-                elif isinstance(specific_datatype, MappedType):
-                    update_was_needed = self.upgrade_file(specific_datatype.get_storage_file_path(), specific_datatype)
-                    if update_was_needed:
-                        nr_of_dts_upgraded_fine += 1
-                    else:
-                        no_of_dts_ignored += 1
-                else:
-                    # Ignore DataTypeGroups
+                    self.__mark_invalid(datatype)
+                    nr_of_dts_fault += 1
+                elif isinstance(specific_datatype, DataTypeGroup):
                     self.log.debug("We will ignore, due to type: " + str(specific_datatype))
-                    no_of_dts_ignored += 1
+                    nr_of_dts_ignored += 1
+                else:
+                    files.append((specific_datatype, h5.path_for_stored_index(specific_datatype)))
 
             except Exception as ex:
                 # The file/class is missing for some reason. Just mark the DataType as invalid.
-                datatype.invalid = True
+                self.__mark_invalid(datatype)
+                nr_of_dts_fault += 1
+                self.log.exception(ex)
+
+        return files, nr_of_dts_fault, nr_of_dts_ignored
+
+
+    def __upgrade_datatype_list(self, datatypes, executor):
+        """
+        Upgrade a list of DataTypes to the current version, with the processes of the given executor.
+        
+        :param datatypes: The list of DataTypes that should be upgraded.
+
+        :returns: (nr_of_dts_upgraded_fine, nr_of_dts_upgraded_fault, nr_of_dts_ignored, nr_of_bytes)
+            the number of DataTypes for which the upgrade worked fine, the number of DataTypes for which
+            some kind of fault occurred, the number of DataTypes which did not need an upgrade, and the size
+            of the files processed
+        """
+        files, nr_of_dts_upgraded_fault, nr_of_dts_ignored = self.__datatype_files(datatypes)
+        nr_of_dts_upgraded_fine = 0
+        nr_of_bytes = 0
+
+        paths = [path for _, path in files]
+        local_paths = set(path for path in paths if self._updates_database(path))
+        # handles opened by this process should not be written meanwhile by the pool
+        H5_FILE_POOL.close_all()
+        pool_results = executor.map(_upgrade_file_task, [path for path in paths if path not in local_paths],
+                                    chunksize=self.FILES_PER_TASK)
+        # files upgraded here, one at a time, while the pool upgrades the others
+        results = (_upgrade_file_task(path) if path in local_paths else next(pool_results) for path in paths)
+        for (datatype, path), (outcome, file_size, disk_size, error) in zip(files, results):
+            nr_of_bytes += file_size
+            if outcome == UPGRADE_DONE:
+                datatype.disk_size = disk_size
                 dao.store_entity(datatype)
+                nr_of_dts_upgraded_fine += 1
+            elif outcome == UPGRADE_NOT_NEEDED:
+                nr_of_dts_ignored += 1
+            else:
+                self.log.error("Could not upgrade %s: %s" % (path, error))
+                self.__mark_invalid(datatype)
                 nr_of_dts_upgraded_fault += 1
-                self.log.exception(ex)
 
-        return nr_of_dts_upgraded_fine, nr_of_dts_upgraded_fault, no_of_dts_ignored
+        return nr_of_dts_upgraded_fine, nr_of_dts_upgraded_fault, nr_of_dts_ignored, nr_of_bytes
+
+
+    def _checkpoint_path(self):
+        return os.path.join(TvbProfile.current.TVB_STORAGE, self.CHECKPOINT_FILE)
+
+
+    def _read_checkpoint(self):
+        """
+        :returns: the progress saved by an interrupted upgrade between the same versions, or None
+        """
+        checkpoint_path = self._checkpoint_path()
+        if not os.path.exists(checkpoint_path):
+            return None
+        try:
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (IOError, ValueError):
+            self.log.exception("Ignoring unreadable upgrade checkpoint %s" % checkpoint_path)
+            return None
+        if (checkpoint.get('from_version') != TvbProfile.current.version.DATA_CHECKED_TO_VERSION
+                or checkpoint.get('to_version') != TvbProfile.current.version.DATA_VERSION):
+            return None
+        return checkpoint
+
+
+    def _write_checkpoint(self, checkpoint):
+        checkpoint_path = self._checkpoint_path()
+        # write aside and rename, an interruption must not leave a partial checkpoint
+        with open(checkpoint_path + '.tmp', 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
 
+    def _new_executor(self, nr_of_processes):
+        # handles opened by this process should not be written meanwhile by the pool
+        H5_FILE_POOL.close_all()
+        return ProcessPoolExecutor(max_workers=nr_of_processes or os.cpu_count(), initializer=_init_upgrade_process,
+                                   initargs=(TvbProfile.CURRENT_PROFILE_NAME,))
 
-    def run_all_updates(self):
+
+    def count_outdated_files(self, nr_of_processes=None):
+        """
+        Dry-run of the upgrade: count the H5 files written with an older data version, without changing anything.
+
+        :param nr_of_processes: size of the process pool, by default the number of CPUs
+        :returns: (nr_of_outdated_files, nr_of_checked_files)
+        """
+        total_count = dao.count_all_datatypes()
+        nr_outdated = 0
+        nr_checked = 0
+        with self._new_executor(nr_of_processes) as executor:
+            for current_idx in range(0, total_count, self.DATA_TYPES_PAGE_SIZE):
+                datatypes_for_page = dao.get_all_datatypes(current_idx, self.DATA_TYPES_PAGE_SIZE)
+                files = []
+                for datatype in datatypes_for_page:
+                    try:
+                        specific_datatype = dao.get_datatype_by_gid(datatype.gid, load_lazy=False)
+                        if specific_datatype is not None and not isinstance(specific_datatype, DataTypeGroup):
+                            files.append(h5.path_for_stored_index(specific_datatype))
+                    except Exception as ex:
+                        self.log.warning("Can not find the file of %s: %s" % (datatype.gid, ex))
+                for outdated, _ in executor.map(_check_file_task, files, chunksize=self.FILES_PER_TASK):
+                    nr_outdated += int(outdated)
+                nr_checked += len(files)
+                self.log.info("Checked H5 files so far: %d of %d, outdated: %d" % (nr_checked, total_count,
+                                                                                  nr_outdated))
+        return nr_outdated, nr_checked
+
+
+    def run_all_updates(self, dry_run=False, nr_of_processes=None):
         """
         Upgrades all the data types from TVB storage to the latest data version.
         
-        :returns: a two entry tuple (status, message) where status is a boolean that is True in case
-            the upgrade was successfully for all DataTypes and False otherwise, and message is a status
-            update message.
+        :param dry_run: when True, only count the files which need an upgrade (see `count_outdated_files`)
+        :param nr_of_processes: size of the process pool, by default the number of CPUs
+        :returns: in dry-run mode, the number of outdated files
         """
+        if dry_run:
+            nr_outdated, nr_checked = self.count_outdated_files(nr_of_processes)
+            self.log.info("Dry-run: %d out of %d H5 files need an upgrade to version %d" % (
+                nr_outdated, nr_checked, TvbProfile.current.version.DATA_VERSION))
+            return nr_outdated
+
         if TvbProfile.current.version.DATA_CHECKED_TO_VERSION < TvbProfile.current.version.DATA_VERSION:
             total_count = dao.count_all_datatypes()
 
@@ -190,22 +387,45 @@ class FilesUpdateManager(UpdateManager):
 
             # Keep track of how many DataTypes were properly updated and how many 
             # were marked as invalid due to missing files or invalid manager.
-            no_ok = 0
-            no_error = 0
-            no_ignored = 0
+            checkpoint = self._read_checkpoint()
+            if checkpoint is None:
+                checkpoint = dict(from_version=TvbProfile.current.version.DATA_CHECKED_TO_VERSION,
+                                  to_version=TvbProfile.current.version.DATA_VERSION,
+                                  next_index=0, no_ok=0, no_error=0, no_ignored=0)
+            else:
+                self.log.info("Resuming the H5 files update from datatype %d" % checkpoint['next_index'])
+            start_index = checkpoint['next_index']
+            no_bytes = 0
             start_time = datetime.now()
+            start_clock = time.time()
 
             # Read DataTypes in pages to limit the memory consumption
-            for current_idx in range(0, total_count, self.DATA_TYPES_PAGE_SIZE):
-                datatypes_for_page = dao.get_all_datatypes(current_idx, self.DATA_TYPES_PAGE_SIZE)
-                count_ok, count_error, count_ignored = self.__upgrade_datatype_list(datatypes_for_page)
-                no_ok += count_ok
-                no_error += count_error
-                no_ignored += count_ignored
-
-                self.log.info("Updated H5 files so far: %d [fine:%d, error:%d, ignored:%d of total:%d, in: %s min]" % (
-                    current_idx + len(datatypes_for_page), no_ok, no_error, no_ignored, total_count,
-                    int((datetime.now() - start_time).seconds / 60)))
+            with self._new_executor(nr_of_processes) as executor:
+                for current_idx in range(start_index, total_count, self.DATA_TYPES_PAGE_SIZE):
+                    datatypes_for_page = dao.get_all_datatypes(current_idx, self.DATA_TYPES_PAGE_SIZE)
+                    count_ok, count_error, count_ignored, count_bytes = self.__upgrade_datatype_list(
+                        datatypes_for_page, executor)
+                    checkpoint['no_ok'] += count_ok
+                    checkpoint['no_error'] += count_error
+                    checkpoint['no_ignored'] += count_ignored
+                    checkpoint['next_index'] = current_idx + len(datatypes_for_page)
+                    self._write_checkpoint(checkpoint)
+                    no_bytes += count_bytes
+
+                    elapsed = max(time.time() - start_clock, 1e-6)
+                    files_speed = (checkpoint['next_index'] - start_index) / elapsed
+                    mega_bytes_speed = no_bytes / 2.0 ** 20 / elapsed
+                    FilesUpdateManager.MESSAGE = ("Updating H5 files: %d of %d done (%.1f files/s, %.1f MB/s)" % (
+                        checkpoint['next_index'], total_count, files_speed, mega_bytes_speed))
+                    self.log.info("Updated H5 files so far: %d [fine:%d, error:%d, ignored:%d of total:%d, "
+                                  "in: %s min, %.1f files/s, %.1f MB/s]" % (
+                                      checkpoint['next_index'], checkpoint['no_ok'], checkpoint['no_error'],
+                                      checkpoint['no_ignored'], total_count,
+                                      int((datetime.now() - start_time).seconds / 60), files_speed,
+                                      mega_bytes_speed))
+
+            no_ok = checkpoint['no_ok']
+            no_error = checkpoint['no_error']
 
             # Now update the configuration file since update was done
             config_file_update_dict = {stored.KEY_LAST_CHECKED_FILE_VERSION: TvbProfile.current.version.DATA_VERSION}
@@ -227,6 +447,8 @@ class FilesUpdateManager(UpdateManager):
 
             TvbProfile.current.version.DATA_CHECKED_TO_VERSION = TvbProfile.current.version.DATA_VERSION
             TvbProfile.current.manager.add_entries_to_config_file(config_file_update_dict)
+            if os.path.exists(self._checkpoint_path()):
+                os.remove(self._checkpoint_path())
 
 
     @staticmethod
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Process-wide pool of open h5py file handles.
+
+Opening and closing an HDF5 file is expensive compared with reading a few attributes or a small slice from it.
+The pool keeps recently used handles open, so that consecutive reads on the same file (e.g. from viewers paging
+through a TimeSeries) share one handle instead of re-opening the file every time.
+"""
+
+import os
+import time
+import atexit
+import threading
+from collections import OrderedDict
+import h5py as hdf5
+from tvb.basic.logger.builder import get_logger
+
+LOG = get_logger(__name__)
+
+MODE_READ = 'r'
+MODE_APPEND = 'a'
+
+
+class _PooledHandle(object):
+    """
+    One open h5py file, together with the bookkeeping needed by the pool.
+    """
+
+    def __init__(self, h5_file, mode):
+        self.h5_file = h5_file
+        self.mode = mode
+        self.users = 0
+        # {thread ident: number of acquire calls not released yet}
+        self.thread_users = {}
+        self.last_used = time.time()
+        self.signature = None
+        # close as soon as the last user releases it
+        self.close_when_unused = False
+        # deserialized attributes per node path, kept as long as this handle is open
+        self.attributes = {}
+
+    @property
+    def is_valid(self):
+        return self.h5_file is not None and self.h5_file.id.valid
+
+    @property
+    def is_writable(self):
+        return self.mode != MODE_READ
+
+
+class HDF5FilePool(object):
+    """
+    A bounded LRU pool of open h5py.File handles, keyed by file path.
+
+    - Readers share the same handle. A handle opened for writing also serves readers.
+    - Requesting write access on a file currently opened read-only re-opens it in append mode (upgrade),
+      after the readers of other threads released it. HDF5 does not open the same file twice in a process,
+      so a thread still reading the file can not upgrade it.
+    - Handles which are not in use are closed when the pool grows over `max_size`, or when they have been
+      idle for longer than `idle_timeout` seconds.
+    - A handle which is not in use is re-opened when the file changed on disk since it was released
+      (e.g. it was written by another process).
+    """
+
+    def __init__(self, max_size=32, idle_timeout=30):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._handles = OrderedDict()
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def acquire(self, path, mode=MODE_APPEND, **h5_kwargs):
+        """
+        Get an open h5py.File for `path`. Every call needs to be matched by a call to `release`.
+
+        :param mode: 'r' for read access, anything else for write access.
+        :param h5_kwargs: extra arguments passed to h5py.File when a new handle needs to be opened.
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None and handle.users > 0 and mode != MODE_READ and not handle.is_writable:
+                handle = self._wait_for_readers(path, handle)
+            if handle is not None and not self._is_reusable(handle, path, mode):
+                self._close_handle(path, handle)
+                handle = None
+
+            if handle is None:
+                self.misses += 1
+                handle = _PooledHandle(self._open(path, mode, **h5_kwargs), mode)
+                self._handles[path] = handle
+            else:
+                self.hits += 1
+                self._handles.move_to_end(path)
+
+            handle.users += 1
+            thread = threading.get_ident()
+            handle.thread_users[thread] = handle.thread_users.get(thread, 0) + 1
+            handle.last_used = time.time()
+            self._evict_unused()
+            return handle.h5_file
+
+    def _wait_for_readers(self, path, handle):
+        """
+        Wait until the read-only `handle` is not used anymore, so that it can be re-opened for writing.
+        :returns: the handle now pooled for `path`, which might have been replaced meanwhile
+        """
+        thread = threading.get_ident()
+        while handle is not None and handle.users > 0 and not handle.is_writable:
+            if handle.thread_users.get(thread):
+                raise IOError("File %s is still open for reading in this thread, it can not be opened "
+                              "for writing before it is released" % path)
+            self._released.wait()
+            handle = self._handles.get(path)
+        return handle
+
+    def release(self, path, h5_file):
+        """
+        Mark one user of the handle on `path` as done. The handle stays open for later reuse.
+
+        :param h5_file: the h5py.File previously returned by `acquire`. When the pool closed that handle
+            meanwhile (e.g. upgrade to write mode), there is nothing left to release.
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None or handle.h5_file is not h5_file:
+                return
+            handle.users = max(handle.users - 1, 0)
+            thread = threading.get_ident()
+            if handle.thread_users.get(thread, 0) > 1:
+                handle.thread_users[thread] -= 1
+            else:
+                handle.thread_users.pop(thread, None)
+            handle.last_used = time.time()
+            if handle.users == 0:
+                self._released.notify_all()
+            if handle.users == 0 and handle.close_when_unused:
+                self._close_handle(path, handle)
+                return
+            if handle.users == 0:
+                if handle.is_valid and handle.is_writable:
+                    handle.h5_file.flush()
+                handle.signature = self._signature(path)
+            self._evict_unused()
+
+    def attribute_cache(self, path, h5_file):
+        """
+        Attributes cache for the open handle on `path`. The cache lives and dies together with the handle, thus
+        it is dropped when the file is closed or re-opened because it was changed by somebody else.
+
+        :param h5_file: the h5py.File previously returned by `acquire`
+        :returns: dictionary {node path: {attribute name: value}}, or None when `h5_file` is not pooled anymore
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None or handle.h5_file is not h5_file:
+                return None
+            return handle.attributes
+
+    def close(self, path):
+        """
+        Close the handle on `path` (if any), regardless of its users. To be called before removing or moving files.
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None:
+                self._close_handle(path, handle)
+
+    def close_writable(self, path):
+        """
+        Close the handle on `path` if it is open for writing, as soon as it is not in use anymore.
+        HDF5 does not let other processes open a file, as long as it is open for writing here.
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None or not handle.is_writable:
+                return
+            if handle.users == 0:
+                self._close_handle(path, handle)
+            else:
+                handle.close_when_unused = True
+
+    def close_folder(self, folder):
+        """
+        Close all handles on files placed under `folder`.
+        """
+        folder = os.path.join(folder, '')
+        with self._lock:
+            for path in [p for p in self._handles if p.startswith(folder)]:
+                self._close_handle(path, self._handles[path])
+
+    def close_all(self):
+        with self._lock:
+            for path in list(self._handles):
+                self._close_handle(path, self._handles[path])
+
+    def reset_after_fork(self):
+        """
+        Forget the handles inherited from the parent process, without closing them.
+        To be called first thing in a forked child: closing (and thus flushing) the parent's handles from the child
+        could corrupt the files, and the pool lock might have been taken by another thread of the parent.
+        """
+        self._handles = OrderedDict()
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+
+    def get_statistics(self):
+        """
+        :returns: dictionary with the number of open handles, hits, misses and evictions
+        """
+        with self._lock:
+            return {'open': len(self._handles), 'in_use': sum(1 for h in self._handles.values() if h.users > 0),
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _is_reusable(self, handle, path, mode):
+        if not handle.is_valid:
+            return False
+        if mode != MODE_READ and not handle.is_writable:
+            # upgrade from read-only to write access
+            return False
+        if handle.users == 0 and handle.signature != self._signature(path):
+            # changed on disk since we released it
+            return False
+        return True
+
+    def _open(self, path, mode, **h5_kwargs):
+        if mode != MODE_READ and not os.path.exists(path):
+            # bug in some versions of hdf5 on windows prevent creating file with mode='a'
+            mode = 'w'
+        LOG.debug("Opening file: %s in mode: %s" % (path, mode))
+        return hdf5.File(path, mode, **h5_kwargs)
+
+    def _close_handle(self, path, handle):
+        del self._handles[path]
+        self.evictions += 1
+        self._released.notify_all()
+        if handle.is_valid:
+            LOG.debug("Closing file: %s" % path)
+            try:
+                handle.h5_file.close()
+            except Exception as excep:
+                LOG.exception(excep)
+
+    def _evict_unused(self):
+        now = time.time()
+        for path in list(self._handles):
+            handle = self._handles[path]
+            if handle.users == 0 and (not handle.is_valid or now - handle.last_used > self.idle_timeout):
+                self._close_handle(path, handle)
+
+        # OrderedDict keeps the least recently used handles first
+        for path in list(self._handles):
+            if len(self._handles) <= self.max_size:
+                break
+            if self._handles[path].users == 0:
+                self._close_handle(path, self._handles[path])
+
+
+H5_FILE_POOL = HDF5FilePool()
+
+atexit.register(H5_FILE_POOL.close_all)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Virtual view over the time series of a DataTypeGroup (e.g. the results of a PSE).
+
+The `data` of every time series in the group is mapped into one HDF5 virtual dataset, with one leading axis for
+each ranged parameter. The view file only references the H5 files of the group members, so building it is cheap,
+while reading one parameter point, or one node across all points, is a single read.
+
+Building the view still reads the shape of every member, thus it is built once, when the last operation of the
+group finishes. Reads before that build the view of the members finished so far.
+"""
+
+import os
+import json
+import numpy
+from tvb.adapters.datatypes.db.time_series import TimeSeriesIndex
+from tvb.basic.logger.builder import get_logger
+from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+from tvb.core.entities.model.model_datatype import DataTypeGroup
+from tvb.core.entities.storage import dao
+from tvb.core.neocom import h5
+
+LOG = get_logger(__name__)
+
+# Not ending in .h5, so that the view is not taken for a datatype when a project is imported
+VIEW_FILE_EXTENSION = ".vds"
+SOURCE_DATASET = "data"
+KEY_RANGE_NAMES = "Range_names"
+KEY_RANGE_VALUES = "Range_values"
+KEY_MEMBERS = "Members"
+KEY_DATASETS = "Datasets"
+
+
+class DataTypeGroupView(object):
+    """
+    HDF5 virtual datasets stacking the `data` of the time series in a DataTypeGroup, stored beside the group
+    (in the folder of its first operation).
+
+    The virtual dataset has one leading axis for each ranged parameter, followed by the axes of the time series.
+    The axes cover all the operations of the group. Points without a (finished) time series, and the end of time series shorter than the others,
+    read as NaN. When every operation of the group produces more time series (e.g. one per monitor),
+    there is one virtual dataset for each of them, named by their type (`dataset_names`).
+    """
+
+    def __init__(self, datatype_group):
+        # type: (DataTypeGroup) -> None
+        self.datatype_group = datatype_group
+        self.logger = get_logger(self.__class__.__module__)
+        self._members = None
+
+        operation_id = datatype_group.fk_from_operation
+        if operation_id is None:
+            members = self._get_members()
+            if not members:
+                raise ValueError("DataTypeGroup %s has no results yet" % datatype_group.gid)
+            operation_id = members[0][0].fk_from_operation
+        operation = dao.get_operation_by_id(operation_id)
+        self.folder = FilesHelper().get_project_folder(dao.get_project_by_id(operation.fk_launched_in),
+                                                       str(operation.id))
+        self.file_name = DataTypeGroup.__name__ + "View_" + datatype_group.gid + VIEW_FILE_EXTENSION
+        self.storage_manager = HDF5StorageManager(self.folder, self.file_name)
+
+    @classmethod
+    def for_group_id(cls, datatype_group_id):
+        return cls(dao.get_generic_entity(DataTypeGroup, datatype_group_id)[0])
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, self.file_name)
+
+    def _get_members(self):
+        """
+        :returns: list of (TimeSeriesIndex, ranges dictionary of its operation), for the time series in the group
+        """
+        if self._members is None:
+            operation_ranges = self._get_operation_ranges()
+            self._members = [(datatype, operation_ranges.get(datatype.fk_from_operation, {}))
+                             for datatype in dao.get_datatypes_from_datatype_group(self.datatype_group.id) or []
+                             if isinstance(datatype, TimeSeriesIndex)]
+        return self._members
+
+    def _get_operation_ranges(self):
+        """
+        :returns: {operation id: ranges dictionary}, for all the operations in the group, finished or not
+        """
+        operations = dao.get_operations_in_group(self.datatype_group.fk_operation_group) or []
+        return dict((operation.id, json.loads(operation.range_values) if operation.range_values else {})
+                    for operation in operations)
+
+    @staticmethod
+    def _compute_ranges(all_ranges):
+        """
+        :param all_ranges: the ranges dictionaries of the operations in the group
+        :returns: list of range names, and for each of them the list of its values (sorted, when numeric)
+        """
+        names = []
+        values = {}
+        for ranges in all_ranges:
+            for name, value in ranges.items():
+                if name not in values:
+                    names.append(name)
+                    values[name] = []
+                if value not in values[name]:
+                    values[name].append(value)
+
+        range_values = []
+        for name in names:
+            if all(isinstance(value, (int, float)) for value in values[name]):
+                values[name].sort()
+            range_values.append(values[name])
+        return names, range_values
+
+    def _group_by_dataset(self, members):
+        """
+        :returns: list of (virtual dataset name, [(member, ranges)]). The n-th time series of a given type,
+            from every operation, goes into the same virtual dataset.
+        """
+        datasets = {}
+        ranks = {}
+        names = []
+        for member, ranges in members:
+            rank_key = (member.fk_from_operation, member.type)
+            rank = ranks.get(rank_key, 0)
+            ranks[rank_key] = rank + 1
+            name = member.type if rank == 0 else "%s_%d" % (member.type, rank)
+            if name not in datasets:
+                names.append(name)
+                datasets[name] = []
+            datasets[name].append((member, ranges))
+        return [(name, datasets[name]) for name in names]
+
+    def refresh(self):
+        """
+        (Re)build the virtual datasets, from the time series currently in the group.
+        Should be called when members of the group finish.
+        """
+        self._members = None
+        members = self._get_members()
+        range_names, range_values = self._compute_ranges(self._get_operation_ranges().values())
+        grid_shape = tuple(len(values) for values in range_values)
+
+        dataset_names = []
+        for dataset_name, dataset_members in self._group_by_dataset(members):
+            sources = []
+            shapes = []
+            dtypes = []
+            for member, ranges in dataset_members:
+                member_path = h5.path_for_stored_index(member)
+                if not os.path.exists(member_path):
+                    continue
+                member_storage = HDF5StorageManager(os.path.dirname(member_path), os.path.basename(member_path))
+                try:
+                    # a single open of the member file
+                    shape = member_storage.get_data_shape(SOURCE_DATASET, close_file=False)
+                    dtype = member_storage.get_data_dtype(SOURCE_DATASET)
+                finally:
+                    member_storage.close_file()
+                if shapes and len(shape) != len(shapes[0]):
+                    self.logger.warning("Time series %s does not fit in view %s" % (member.gid, self.file_name))
+                    continue
+                if any(name not in ranges for name in range_names):
+                    self.logger.warning("Time series %s misses range values for view %s" % (member.gid,
+                                                                                           self.file_name))
+                    continue
+                point = tuple(values.index(ranges[name]) for name, values in zip(range_names, range_values))
+                target = point + tuple(slice(0, dim) for dim in shape)
+                sources.append((target, os.path.relpath(member_path, self.folder), SOURCE_DATASET, shape))
+                shapes.append(shape)
+                dtypes.append(dtype)
+
+            if not sources:
+                continue
+            dtype = numpy.result_type(*dtypes)
+            fillvalue = numpy.nan if dtype.kind in 'fc' else 0
+            view_shape = grid_shape + tuple(numpy.max(shapes, axis=0))
+            self.storage_manager.store_virtual_data(dataset_name, view_shape, dtype, sources, fillvalue=fillvalue)
+            dataset_names.append(dataset_name)
+
+        self.storage_manager.set_metadata({KEY_RANGE_NAMES: json.dumps(range_names),
+                                           KEY_RANGE_VALUES: json.dumps(range_values),
+                                           KEY_DATASETS: json.dumps(dataset_names),
+                                           KEY_MEMBERS: len(members)})
+        return dataset_names
+
+    def is_up_to_date(self):
+        """
+        :returns: True when the view file exists and maps every time series currently in the group
+        """
+        if not os.path.exists(self.path):
+            return False
+        meta = self.storage_manager.get_metadata()
+        return int(meta.get(KEY_MEMBERS, -1)) == len(self._get_members())
+
+    def _ensure(self):
+        if not self.is_up_to_date():
+            self.refresh()
+
+    @property
+    def dataset_names(self):
+        self._ensure()
+        return json.loads(self.storage_manager.get_metadata()[KEY_DATASETS])
+
+    @property
+    def ranges(self):
+        """
+        :returns: list of (range name, range values), one for each leading axis of the virtual datasets
+        """
+        self._ensure()
+        meta = self.storage_manager.get_metadata()
+        return list(zip(json.loads(meta[KEY_RANGE_NAMES]), json.loads(meta[KEY_RANGE_VALUES])))
+
+    def _default_dataset(self, dataset_name):
+        if dataset_name is not None:
+            return dataset_name
+        names = self.dataset_names
+        if not names:
+            raise ValueError("DataTypeGroup %s has no time series to view" % self.datatype_group.gid)
+        return names[0]
+
+    def get_shape(self, dataset_name=None):
+        return self.storage_manager.get_data_shape(self._default_dataset(dataset_name))
+
+    def read(self, data_slice=None, dataset_name=None):
+        """
+        Read from the stacked time series, in a single read.
+        E.g. for a 2D range, `read((i, j))` returns the time series at point (i, j), and
+        `read((slice(None), slice(None), slice(None), 0, node))` the first state variable of one node,
+        at all the points.
+
+        :param dataset_name: one of `dataset_names`, by default the first of them
+        """
+        return self.storage_manager.get_data(self._default_dataset(dataset_name), data_slice)
+
+
+def refresh_group_view(datatype_group_id, finished_operation_id=None):
+    """
+    Build the view of a DataTypeGroup, once all the operations of the group finished. The view is derived data,
+    so problems building it are logged, not raised: it is rebuilt when it is read next time.
+
+    :param finished_operation_id: operation of the group which just finished, but is not marked as finished yet
+    """
+    try:
+        view = DataTypeGroupView.for_group_id(datatype_group_id)
+        if dao.count_unfinished_operations_in_group(view.datatype_group.fk_operation_group,
+                                                    finished_operation_id) > 0:
+            return
+        view.refresh()
+    except Exception:
+        LOG.exception("Could not refresh the view of DataTypeGroup %s" % datatype_group_id)
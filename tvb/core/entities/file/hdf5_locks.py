@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Shared-read / exclusive-write locks on TVB H5 files.
+
+Readers of a file share it, while a writer has it alone. Within a process the threads are synchronized with
+a condition per file, and between processes (e.g. the web process and the operation workers) with POSIX
+locks on a lock file per H5 file. The lock files are kept in the LOCKS folder of the TVB storage, at the same
+path as the absolute path of their H5 file, so that two H5 files never share a lock.
+Waiting writers have priority over new readers, so that a stream of page reads can not starve a writer.
+
+The HDF5 library has its own file locks, which fail instead of waiting, and which last as long as the file is open,
+while the file pool keeps files open after use. Thus files are opened without them when the processes are
+synchronized here, and a file open for writing is closed when its write lock is released.
+
+A thread which already holds a file (through another storage manager) is never blocked by its own locks,
+so nested readers and writers in the same thread do not deadlock. A thread reading a file can ask to write it
+(upgrade) and waits for the other readers, unless another of those readers is also waiting to upgrade: the
+second upgrade would never be granted, thus it fails instead.
+
+Locks of files not in use are forgotten, thus the number of entries is bounded by the number of open files.
+The lock files are removed together with their H5 files (see `removing` and `removing_folder`), while the write
+locks of those files are held. A process which was waiting on a removed lock file locks the new one instead.
+"""
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+import h5py
+from tvb.basic.logger.builder import get_logger
+from tvb.basic.profile import TvbProfile
+
+try:
+    import fcntl
+except ImportError:
+    # e.g. Windows: only the threads of the same process are synchronized
+    fcntl = None
+
+LOG = get_logger(__name__)
+
+# h5py can open files without the HDF5 file locks since version 3.5
+H5PY_LOCKING_ARGUMENT = h5py.version.version_tuple >= (3, 5)
+
+LOCKS_FOLDER = "LOCKS"
+LOCK_FILE_SUFFIX = ".lock"
+
+
+class _ProcessLock(object):
+    """
+    Lock of one file against the other processes: its own lock file.
+    POSIX locks belong to the process, thus the threads of this process share them. Closing any descriptor
+    of the lock file drops them, thus the process keeps a single descriptor per lock file.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        self.mode = None
+
+    def _is_removed(self):
+        # the lock file was removed (or replaced) while this process was waiting for it
+        try:
+            current = os.stat(self.lock_path)
+        except OSError:
+            return True
+        opened = os.fstat(self.lock_fd)
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def set_mode(self, mode):
+        """
+        :param mode: fcntl.LOCK_SH, fcntl.LOCK_EX or None to unlock
+        """
+        if mode == self.mode:
+            return
+        fcntl.lockf(self.lock_fd, fcntl.LOCK_UN if mode is None else mode)
+        self.mode = mode
+        while mode is not None and self._is_removed():
+            # the lock on a removed file excludes nobody, lock the file the other processes use now
+            self.close()
+            self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+            fcntl.lockf(self.lock_fd, mode)
+            self.mode = mode
+
+    def close(self):
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+        self.lock_fd = None
+        self.mode = None
+
+
+class _FileLock(object):
+    """
+    Readers and writer of one file, in this process.
+    """
+
+    def __init__(self, process_lock):
+        self.condition = threading.Condition(threading.Lock())
+        # thread id -> number of read locks held by that thread
+        self.readers = {}
+        self.writer = None
+        self.write_count = 0
+        self.waiting_writers = 0
+        # readers waiting to write
+        self.upgrading = set()
+        # holders and waiters, the lock is forgotten when there are none
+        self.users = 0
+        self.process_lock = process_lock
+
+    def _can_read(self, thread):
+        if self.writer is not None and self.writer != thread:
+            return False
+        return self.waiting_writers == 0 or thread in self.readers or self.writer == thread
+
+    def _can_write(self, thread):
+        if self.writer is not None and self.writer != thread:
+            return False
+        return all(reader == thread for reader in self.readers)
+
+    def _update_process_lock(self):
+        if self.process_lock is None:
+            return
+        if self.writer is not None:
+            self.process_lock.set_mode(fcntl.LOCK_EX)
+        elif self.readers:
+            self.process_lock.set_mode(fcntl.LOCK_SH)
+        else:
+            self.process_lock.set_mode(None)
+
+    def acquire(self, thread, write):
+        with self.condition:
+            if write:
+                upgrade = thread in self.readers and self.writer != thread
+                if upgrade:
+                    if self.upgrading:
+                        raise IOError("Another thread reading the file waits to write it, thus this thread can "
+                                      "not start writing it before releasing its read lock")
+                    self.upgrading.add(thread)
+                self.waiting_writers += 1
+                try:
+                    while not self._can_write(thread):
+                        self.condition.wait()
+                finally:
+                    self.waiting_writers -= 1
+                    self.upgrading.discard(thread)
+                self.writer = thread
+                self.write_count += 1
+            else:
+                while not self._can_read(thread):
+                    self.condition.wait()
+                self.readers[thread] = self.readers.get(thread, 0) + 1
+            try:
+                # blocks while other processes hold the file
+                self._update_process_lock()
+            except Exception:
+                self._release(thread, write)
+                raise
+
+    def _release(self, thread, write):
+        if write:
+            self.write_count -= 1
+            if self.write_count == 0:
+                self.writer = None
+        else:
+            self.readers[thread] -= 1
+            if self.readers[thread] == 0:
+                del self.readers[thread]
+        self.condition.notify_all()
+
+    def release(self, thread, write):
+        with self.condition:
+            self._release(thread, write)
+            self._update_process_lock()
+
+    def downgrade(self, thread):
+        with self.condition:
+            self._release(thread, True)
+            self.readers[thread] = self.readers.get(thread, 0) + 1
+            self._update_process_lock()
+
+    def release_all(self):
+        with self.condition:
+            self.readers = {}
+            self.writer = None
+            self.write_count = 0
+            self.condition.notify_all()
+            if self.process_lock is not None:
+                self.process_lock.close()
+
+
+class LockToken(object):
+    """
+    Returned by `HDF5FileLocks.acquire`, to be given back to `release`, possibly from another thread.
+    """
+
+    def __init__(self, path, thread, write, file_lock):
+        self.path = path
+        self.thread = thread
+        self.write = write
+        self.file_lock = file_lock
+
+
+class HDF5FileLocks(object):
+    """
+    Process-wide registry of the locks on H5 files, keyed by path.
+    """
+
+    def __init__(self, lock_folder=None):
+        """
+        :param lock_folder: folder of the lock files shared with the other processes.
+            None for the LOCKS folder of the TVB storage. Other processes are ignored when no folder is available.
+        """
+        self._lock_folder = lock_folder
+        # the folder in use, once a lock file was created in it
+        self._lock_files_folder = None
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def _locks_folder(self):
+        """
+        :returns: the folder of the lock files, None when other processes are ignored
+        """
+        if fcntl is None:
+            return None
+        if self._lock_folder is not None:
+            return self._lock_folder
+        storage = getattr(TvbProfile.current, 'TVB_STORAGE', None)
+        if not storage:
+            return None
+        return os.path.join(storage, LOCKS_FOLDER)
+
+    @staticmethod
+    def _mirror_path(folder, path):
+        return os.path.join(folder, os.path.splitdrive(path)[1].lstrip(os.sep))
+
+    def _process_lock(self, path):
+        """
+        :param path: absolute path of the H5 file, without symbolic links
+        """
+        folder = self._locks_folder()
+        if folder is None:
+            return None
+        lock_path = self._mirror_path(folder, path) + LOCK_FILE_SUFFIX
+        try:
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            process_lock = _ProcessLock(lock_path)
+        except OSError:
+            LOG.warning("Could not create the lock file %s, only threads are synchronized" % lock_path)
+            return None
+        self._lock_files_folder = folder
+        return process_lock
+
+    def acquire(self, path, write):
+        """
+        Block until `path` can be read (or written, when `write`) by the current thread.
+        A thread reading `path` which asks to write it waits for the other readers, but fails with IOError when
+        another of them waits to write it too.
+        :returns: LockToken to be given to `release`
+        """
+        path = os.path.realpath(path)
+        with self._registry_lock:
+            file_lock = self._locks.get(path)
+            if file_lock is None:
+                file_lock = _FileLock(self._process_lock(path))
+                self._locks[path] = file_lock
+            file_lock.users += 1
+        token = LockToken(path, threading.get_ident(), write, file_lock)
+        try:
+            file_lock.acquire(token.thread, write)
+        except Exception:
+            self._forget(path, file_lock)
+            raise
+        return token
+
+    def release(self, token):
+        """
+        :returns: True when this process stopped writing the file, and other processes might wait for it
+        """
+        with self._registry_lock:
+            file_lock = self._locks.get(token.path)
+        if file_lock is None or file_lock is not token.file_lock:
+            # dropped by release_all meanwhile
+            return False
+        file_lock.release(token.thread, token.write)
+        self._forget(token.path, file_lock)
+        return token.write and file_lock.process_lock is not None and file_lock.writer is None
+
+    def h5py_options(self):
+        """
+        :returns: extra h5py.File arguments for the files protected by these locks
+        """
+        if self._lock_files_folder is not None and H5PY_LOCKING_ARGUMENT:
+            return {'locking': False}
+        return {}
+
+    def downgrade(self, token):
+        """
+        Turn the write lock of `token` into a read lock, without letting another writer in meanwhile.
+        :returns: the LockToken of the read lock
+        """
+        with self._registry_lock:
+            file_lock = self._locks[token.path]
+        file_lock.downgrade(token.thread)
+        return LockToken(token.path, token.thread, False, file_lock)
+
+    @contextmanager
+    def removing(self, path):
+        """
+        Hold the write lock of `path` while the H5 file is removed or moved away, then remove its lock file.
+        The lock file is kept when the removal fails.
+        """
+        token = self.acquire(path, write=True)
+        try:
+            yield
+            self._remove_lock_file(token.file_lock.process_lock)
+        finally:
+            self.release(token)
+
+    @contextmanager
+    def removing_folder(self, folder):
+        """
+        Hold the write locks of the H5 files under `folder` while the folder is removed or renamed,
+        then remove their lock files. The lock files are kept when the removal fails.
+        """
+        locks_folder = self._locks_folder()
+        mirror_folder = None
+        paths = []
+        if locks_folder is not None:
+            mirror_folder = self._mirror_path(locks_folder, os.path.realpath(folder))
+            for lock_folder, _, file_names in os.walk(mirror_folder):
+                for file_name in file_names:
+                    if file_name.endswith(LOCK_FILE_SUFFIX):
+                        lock_path = os.path.join(lock_folder, file_name)
+                        paths.append(os.sep + os.path.relpath(lock_path, locks_folder)[:-len(LOCK_FILE_SUFFIX)])
+        tokens = []
+        try:
+            # always in the same order, thus two removals of the same files do not deadlock
+            for path in sorted(paths):
+                tokens.append(self.acquire(path, write=True))
+            yield
+            if mirror_folder is not None and os.path.isdir(mirror_folder):
+                shutil.rmtree(mirror_folder, ignore_errors=True)
+        finally:
+            for token in reversed(tokens):
+                self.release(token)
+
+    @staticmethod
+    def _remove_lock_file(process_lock):
+        if process_lock is None:
+            return
+        try:
+            os.remove(process_lock.lock_path)
+        except OSError:
+            pass
+
+    def release_all(self):
+        """
+        Drop every lock held by this process, e.g. after an operation was interrupted before closing its files.
+        The tokens acquired before are ignored by `release` afterwards.
+        To be called when no other thread of the process uses H5 files.
+        """
+        with self._registry_lock:
+            file_locks = list(self._locks.values())
+            self._locks = {}
+        for file_lock in file_locks:
+            file_lock.release_all()
+
+    def _forget(self, path, file_lock):
+        with self._registry_lock:
+            file_lock.users -= 1
+            if file_lock.users == 0:
+                if self._locks.get(path) is file_lock:
+                    del self._locks[path]
+                if file_lock.process_lock is not None:
+                    file_lock.process_lock.close()
+
+    def __len__(self):
+        return len(self._locks)
+
+    def reset_after_fork(self):
+        """
+        To be called first thing in a forked child: POSIX locks are not inherited, and the registry lock might
+        have been taken by another thread of the parent.
+        """
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self._lock_files_folder = None
+
+
+H5_FILE_LOCKS = HDF5FileLocks()
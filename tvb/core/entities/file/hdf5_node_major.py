@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Copy of a time-major dataset, chunked by node, for readers which load one node at a time.
+
+Time series are written by time, thus their chunks hold a few time points of many nodes. Reading the full history of
+one node from them means reading (almost) the whole file, once for every node. The copy is kept in a separate file
+next to the H5 file of the time series, so that building it does not lock the time series for its readers.
+
+The copy remembers the version of the data it was built from (shape, dtype and the statistics stored with the
+dataset, which change with every write), and is ignored by readers once the source data changed.
+"""
+
+import os
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from tvb.basic.logger.builder import get_logger
+from tvb.core.entities.file.exceptions import MissingDataSetException
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_NODE_SERIES
+
+LOG = get_logger(__name__)
+
+NODE_MAJOR_SUFFIX = ".nodes"
+_BUILDER = None
+
+
+def _background_builder():
+    global _BUILDER
+    if _BUILDER is None:
+        _BUILDER = ThreadPoolExecutor(max_workers=1)
+    return _BUILDER
+
+
+def wait_for_background_builds():
+    """
+    Block until the copies started so far in the background are written.
+    """
+    if _BUILDER is not None:
+        _BUILDER.submit(lambda: None).result()
+
+
+class NodeMajorCopy(object):
+    """
+    The copy of the dataset in the H5 file at `source_path`, stored in the file `source_path + NODE_MAJOR_SUFFIX`.
+    """
+
+    DATASET_NAME = "data"
+    SOURCE_VERSION_KEY = "Source_version"
+    # approximate size of the blocks of time points copied at once
+    BLOCK_BYTES = 2 ** 26
+
+    def __init__(self, source_path, node_dimension=2):
+        self.source_path = source_path
+        self.path = source_path + NODE_MAJOR_SUFFIX
+        self.node_dimension = node_dimension
+
+    def _storage_manager(self, path=None, swmr_read=False):
+        path = path or self.path
+        return HDF5StorageManager(os.path.dirname(path), os.path.basename(path), swmr_read=swmr_read)
+
+    def is_node_slice(self, data_slice):
+        """
+        :returns: True when `data_slice` selects a single node
+        """
+        if not isinstance(data_slice, tuple) or len(data_slice) <= self.node_dimension:
+            return False
+        node = data_slice[self.node_dimension]
+        if isinstance(node, (int, numpy.integer)):
+            return True
+        return (isinstance(node, slice) and node.stop is not None and node.step in (None, 1)
+                and (node.start or 0) + 1 == node.stop)
+
+    @staticmethod
+    def _source_version(source_manager, dataset_name):
+        """
+        :returns: a string identifying the current content of `dataset_name` in the source file
+        """
+        shape = source_manager.get_data_shape(dataset_name)
+        dtype = source_manager.get_data_dtype(dataset_name)
+        statistics = sorted(source_manager.get_metadata(dataset_name).items())
+        return "%s|%s|%s" % (tuple(shape), numpy.dtype(dtype).str, statistics)
+
+    def matches(self, dataset_name, swmr_read=False):
+        """
+        :returns: True when the copy exists, and was built from the current data of `dataset_name` in the source
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            copy_version = self._storage_manager().get_metadata().get(self.SOURCE_VERSION_KEY)
+            source_manager = self._storage_manager(self.source_path, swmr_read)
+            return copy_version == self._source_version(source_manager, dataset_name)
+        except MissingDataSetException:
+            return False
+
+    def read(self, data_slice):
+        return self._storage_manager().get_data(self.DATASET_NAME, data_slice)
+
+    def build(self, dataset_name, swmr_read=False):
+        """
+        Copy `dataset_name` from the source file block by block, into a temporary file which replaces the copy
+        when complete. Readers never see a partial copy.
+        """
+        source_manager = self._storage_manager(self.source_path, swmr_read)
+        shape = source_manager.get_data_shape(dataset_name)
+        source_version = self._source_version(source_manager, dataset_name)
+        tmp_path = self.path + ".tmp"
+        self.remove(tmp_path)
+
+        target_manager = self._storage_manager(tmp_path)
+        itemsize = numpy.dtype(source_manager.get_data_dtype(dataset_name)).itemsize
+        time_point_bytes = int(numpy.prod(shape[1:])) * itemsize
+        block = max(self.BLOCK_BYTES // max(time_point_bytes, 1), 1)
+        try:
+            for idx in range(0, shape[0], block):
+                data = source_manager.get_data(dataset_name, (slice(idx, idx + block),))
+                target_manager.append_data(self.DATASET_NAME, data, grow_dimension=0, close_file=False,
+                                           role=ROLE_NODE_SERIES)
+            target_manager.set_metadata({self.SOURCE_VERSION_KEY: source_version})
+            target_manager.close_file()
+        finally:
+            H5_FILE_POOL.close(tmp_path)
+        H5_FILE_POOL.close(self.path)
+        with H5_FILE_LOCKS.removing(tmp_path):
+            os.replace(tmp_path, self.path)
+
+    def build_in_background(self, dataset_name, swmr_read=False):
+        """
+        Build the copy on a background thread. Failures are only logged, readers keep using the source.
+        The process waits for a build in progress before exiting.
+        """
+
+        def _build():
+            try:
+                self.build(dataset_name, swmr_read)
+                LOG.debug("Node-major copy written for %s" % self.source_path)
+            except Exception:
+                LOG.exception("Could not write the node-major copy of %s" % self.source_path)
+                self.remove(self.path + ".tmp")
+
+        return _background_builder().submit(_build)
+
+    def remove(self, path=None):
+        path = path or self.path
+        H5_FILE_POOL.close(path)
+        with H5_FILE_LOCKS.removing(path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def move_to(self, new_source_path):
+        """
+        Follow the H5 file of the source when it moves (e.g. into another project).
+        """
+        if os.path.exists(self.path):
+            H5_FILE_POOL.close(self.path)
+            with H5_FILE_LOCKS.removing(self.path):
+                os.rename(self.path, new_source_path + NODE_MAJOR_SUFFIX)
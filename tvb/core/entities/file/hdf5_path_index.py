@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Process-wide index from datatype gid to the H5 file storing it.
+
+File names of TVB H5 files end with the gid of the stored entity (e.g. `Connectivity_<gid hex>.h5`).
+Instead of listing a folder every time a gid is resolved, the listing is done once per folder and kept here.
+The folders of the operations are remembered too, so that the path of a stored index does not need a DB query.
+
+Entries are dropped when files or folders are removed, moved or renamed through FilesHelper. An entry pointing
+to a file which no longer exists is detected on lookup, and the folder is listed again.
+Both maps are bounded LRU caches, thus a long running process does not keep every folder it ever browsed.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+H5_EXTENSION = ".h5"
+_GID_HEX_LENGTH = 32
+
+
+class HDF5PathIndex(object):
+    """
+    Lazily built gid -> file name maps, one per folder, and an operation id -> folder map.
+    """
+
+    def __init__(self, max_folders=1024, max_operations=4096):
+        self.max_folders = max_folders
+        self.max_operations = max_operations
+        self._lock = threading.Lock()
+        self._folders = OrderedDict()
+        self._operation_folders = OrderedDict()
+
+    @staticmethod
+    def _get_recent(entries, key):
+        # called with the lock held
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _put_bounded(entries, key, value, max_size):
+        # called with the lock held
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+
+    @staticmethod
+    def gid_of_file_name(file_name):
+        """
+        :returns: the gid hex at the end of a TVB H5 file name, or None for other files
+        """
+        if not file_name.endswith(H5_EXTENSION) or len(file_name) < _GID_HEX_LENGTH + len(H5_EXTENSION):
+            return None
+        return file_name[-_GID_HEX_LENGTH - len(H5_EXTENSION):-len(H5_EXTENSION)]
+
+    def _scan(self, folder):
+        file_names = {}
+        for file_name in os.listdir(folder):
+            gid_hex = self.gid_of_file_name(file_name)
+            if gid_hex is not None:
+                file_names[gid_hex] = file_name
+        with self._lock:
+            self._put_bounded(self._folders, folder, file_names, self.max_folders)
+        return file_names
+
+    def locate(self, folder, gid_hex):
+        """
+        :returns: the name of the H5 file in `folder` storing the entity with the given gid, or None
+        """
+        folder = os.path.normpath(folder)
+        with self._lock:
+            file_names = self._get_recent(self._folders, folder)
+        if file_names is not None:
+            file_name = file_names.get(gid_hex)
+            if file_name is not None and os.path.exists(os.path.join(folder, file_name)):
+                return file_name
+        # not indexed yet, written by somebody else since the listing, or removed meanwhile
+        return self._scan(folder).get(gid_hex)
+
+    def add(self, path):
+        """
+        Record a H5 file which has just been written. Folders not listed yet stay unlisted.
+        """
+        folder, file_name = os.path.split(os.path.normpath(path))
+        gid_hex = self.gid_of_file_name(file_name)
+        with self._lock:
+            file_names = self._folders.get(folder)
+            if file_names is not None and gid_hex is not None:
+                file_names[gid_hex] = file_name
+
+    def remove(self, path):
+        """
+        Forget a H5 file which is removed or moved.
+        """
+        folder, file_name = os.path.split(os.path.normpath(path))
+        gid_hex = self.gid_of_file_name(file_name)
+        with self._lock:
+            file_names = self._folders.get(folder)
+            if file_names is not None and file_names.get(gid_hex) == file_name:
+                del file_names[gid_hex]
+
+    def operation_folder(self, operation_id):
+        """
+        :returns: the remembered folder of an operation, or None
+        """
+        with self._lock:
+            return self._get_recent(self._operation_folders, operation_id)
+
+    def set_operation_folder(self, operation_id, folder):
+        with self._lock:
+            self._put_bounded(self._operation_folders, operation_id, folder, self.max_operations)
+
+    def invalidate_folder(self, folder):
+        """
+        Forget everything about `folder` and its sub-folders (e.g. an operation or project folder removed or renamed).
+        """
+        folder = os.path.normpath(folder)
+        prefix = folder + os.sep
+        with self._lock:
+            for indexed_folder in list(self._folders):
+                if indexed_folder == folder or indexed_folder.startswith(prefix):
+                    del self._folders[indexed_folder]
+            for operation_id, operation_folder in list(self._operation_folders.items()):
+                operation_folder = os.path.normpath(operation_folder)
+                if operation_folder == folder or operation_folder.startswith(prefix):
+                    del self._operation_folders[operation_id]
+
+    def clear(self):
+        with self._lock:
+            self._folders.clear()
+            self._operation_folders.clear()
+
+
+H5_PATH_INDEX = HDF5PathIndex()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Multi-resolution summaries of a dataset growing in time, stored beside it in the same H5 file.
+
+Level k of the pyramid holds, for each bin of `factor ** k` consecutive time points, the minimum, maximum and mean
+over that bin. The levels are built incrementally while the data is appended, so that zoomed out pages of a long
+time series can be read from a small level, instead of striding over the full data.
+Short time series get no levels: striding over them is cheap, and their files stay small.
+"""
+
+import numpy
+from tvb.core.entities.file.exceptions import MissingDataSetException
+
+PYRAMID_MIN = "min"
+PYRAMID_MAX = "max"
+PYRAMID_MEAN = "mean"
+PYRAMID_KINDS = (PYRAMID_MIN, PYRAMID_MAX, PYRAMID_MEAN)
+
+
+class DataPyramid(object):
+    """
+    Min / max / mean pyramid over the first dimension of a dataset, written through an HDF5StorageManager.
+
+    Complete bins are written in batches. What is left over is kept in memory, and written as partial last bins
+    by `finish`, so that a closed file has levels covering all of its data. When appends continue in a later session,
+    the levels are rebuilt from the stored data first (partial bins can not be completed in place).
+    """
+
+    # number of time points read at once, when the levels are rebuilt from stored data
+    REBUILD_BLOCK = 2 ** 14
+    # complete bins are kept in memory until they add up to this size, then written to the file in one append
+    PENDING_BYTES = 2 ** 22
+
+    def __init__(self, storage_manager, dataset_name, factor=8, nr_levels=5, min_length=0):
+        """
+        :param min_length: the levels are only written once the dataset has this many time points
+        """
+        self.storage_manager = storage_manager
+        self.dataset_name = dataset_name
+        self.factor = factor
+        self.nr_levels = nr_levels
+        self.min_length = min_length
+        # per level, the (min, max, mean) of the bins of the finer level not yet folded into a complete bin
+        self._carries = None
+        # per level, the complete bins not yet written
+        self._pending = None
+        self._pending_bytes = 0
+        self._mean_dtype = None
+        self._enabled = nr_levels > 0
+
+    def level_name(self, kind, level):
+        return "%s_pyramid_%s_%d" % (self.dataset_name, kind, level)
+
+    def bin_size(self, level):
+        return self.factor ** level
+
+    def append(self, data):
+        """
+        Fold `data` into the levels. Call it before `data` is appended to the dataset itself.
+        """
+        if not self._enabled:
+            return
+        data = numpy.asarray(data)
+        if self._carries is None:
+            stored = self._stored_length()
+            if stored + len(data) < self.min_length or self.storage_manager.is_swmr_writing:
+                # too short for now, the levels are built from the stored data once it gets longer.
+                # In SWMR mode no dataset can be created anymore (see `start_now`)
+                return
+            self._start(data, stored)
+        self._fold(data)
+
+    def start_now(self):
+        """
+        Create the levels from the data stored so far, even when it is shorter than `min_length`.
+        To be called before the file goes into SWMR mode, as the levels can not be created afterwards.
+        """
+        if not self._enabled or self._carries is not None:
+            return
+        try:
+            first = self.storage_manager.get_data(self.dataset_name, (slice(0, 1),), close_file=False)
+        except MissingDataSetException:
+            return
+        self._start(first, self._stored_length())
+
+    def _stored_length(self):
+        try:
+            return self.storage_manager.get_data_shape(self.dataset_name)[0]
+        except MissingDataSetException:
+            return 0
+
+    def finish(self):
+        """
+        Write the partial last bins of every level. Call it before the file is closed.
+        """
+        if self._carries is None:
+            return
+        self._write_pending()
+        partial, partial_count = None, 0
+        for level in range(1, self.nr_levels + 1):
+            mins, maxs, means = self._carries[level - 1]
+            weights = [self.bin_size(level - 1)] * len(mins)
+            if partial is not None:
+                mins = numpy.concatenate((mins, partial[0][numpy.newaxis]))
+                maxs = numpy.concatenate((maxs, partial[1][numpy.newaxis]))
+                means = numpy.concatenate((means, partial[2][numpy.newaxis]))
+                weights.append(partial_count)
+            if len(mins) == 0:
+                # the data ends on a bin boundary of this level
+                continue
+            partial = (mins.min(axis=0), maxs.max(axis=0),
+                       numpy.average(means, axis=0, weights=weights).astype(self._mean_dtype))
+            partial_count = sum(weights)
+            self._write_level(level, [level_data[numpy.newaxis] for level_data in partial])
+        self._carries = None
+
+    def rebuild(self, data):
+        """
+        Replace the levels with ones computed from the full `data` (an array, or an array-like supporting slices).
+        """
+        if not self._enabled:
+            return
+        self.remove()
+        self._enabled = True
+        if len(data) < self.min_length:
+            return
+        self._start(numpy.asarray(data[:1]), 0)
+        for idx in range(0, len(data), self.REBUILD_BLOCK):
+            self._fold(numpy.asarray(data[idx:idx + self.REBUILD_BLOCK]))
+        self.finish()
+
+    def remove(self, keep_building=False):
+        """
+        Drop the stored levels. Unless `keep_building`, stop building them for the rest of this session
+        (e.g. when the data grows on another dimension than time). Otherwise, the next append rebuilds them.
+        """
+        self._carries = None
+        self._pending = None
+        self._enabled = keep_building
+        for level in range(1, self.nr_levels + 1):
+            for kind in PYRAMID_KINDS:
+                if self._exists(self.level_name(kind, level)):
+                    self.storage_manager.remove_data(self.level_name(kind, level))
+
+    def read(self, from_idx, to_idx, step, other_slices, kind=PYRAMID_MEAN):
+        """
+        Read `data[from_idx:to_idx:step]` from a level with bins not larger than `step`.
+        Each returned row summarizes (min, max or mean) the `step` time points starting at the strided index,
+        instead of sampling one of them.
+        The coarsest level with bins aligned to `from_idx` and `step` is used, as its rows are exact.
+        Otherwise the coarsest level that fits is used, and rows are approximated to whole bins.
+
+        :param other_slices: slices for the dimensions after time
+        :returns: the page, or None when no level covers the requested interval
+        """
+        if not self._enabled or kind not in PYRAMID_KINDS or to_idx <= from_idx:
+            return None
+        fitting = []
+        for level in range(self.nr_levels, 0, -1):
+            bin_size = self.bin_size(level)
+            if bin_size > min(step, to_idx - from_idx):
+                continue
+            try:
+                nr_bins = self.storage_manager.get_data_shape(self.level_name(kind, level))[0]
+            except MissingDataSetException:
+                return None
+            if nr_bins * bin_size < to_idx:
+                # the last bins are still being written
+                continue
+            if from_idx % bin_size == 0 and step % bin_size == 0:
+                fitting.insert(0, level)
+                break
+            fitting.append(level)
+        if not fitting:
+            return None
+        return self._read_level(fitting[0], from_idx, to_idx, step, other_slices, kind)
+
+    def _read_level(self, level, from_idx, to_idx, step, other_slices, kind):
+        bin_size = self.bin_size(level)
+        bin_from = from_idx // bin_size
+        bin_to = -(-to_idx // bin_size)
+        values = self.storage_manager.get_data(self.level_name(kind, level), (slice(bin_from, bin_to),) + tuple(other_slices),
+                                               close_file=False)
+        starts = numpy.arange(from_idx, to_idx, step) // bin_size - bin_from
+        if kind == PYRAMID_MIN:
+            return numpy.minimum.reduceat(values, starts, axis=0)
+        if kind == PYRAMID_MAX:
+            return numpy.maximum.reduceat(values, starts, axis=0)
+        counts = numpy.diff(numpy.append(starts, len(values)))
+        counts = counts.reshape((-1,) + (1,) * (values.ndim - 1))
+        return (numpy.add.reduceat(values, starts, axis=0) / counts).astype(values.dtype)
+
+    def _exists(self, name):
+        try:
+            self.storage_manager.get_data_shape(name)
+            return True
+        except MissingDataSetException:
+            return False
+
+    def _start(self, data, stored):
+        """
+        Create the (empty) levels, so that they exist before the file goes into SWMR mode.
+        When `stored` time points are already in the file, fold them first.
+        """
+        if stored > 0 or self._exists(self.level_name(PYRAMID_MIN, 1)):
+            self.remove()
+            self._enabled = True
+
+        self._mean_dtype = data.dtype if data.dtype.kind == 'f' else numpy.dtype(numpy.float64)
+        empty = data[:0]
+        empty_mean = numpy.empty(empty.shape, dtype=self._mean_dtype)
+        self._carries = [(empty, empty, empty_mean)] * self.nr_levels
+        self._pending = [[] for _ in range(self.nr_levels)]
+        self._pending_bytes = 0
+        for level in range(1, self.nr_levels + 1):
+            self._write_level(level, self._carries[level - 1])
+
+        for idx in range(0, stored, self.REBUILD_BLOCK):
+            data_slice = (slice(idx, min(idx + self.REBUILD_BLOCK, stored)),)
+            self._fold(self.storage_manager.get_data(self.dataset_name, data_slice, close_file=False))
+
+    def _fold(self, data):
+        level_input = (data, data, data)
+        for level in range(1, self.nr_levels + 1):
+            carry = self._carries[level - 1]
+            if len(carry[0]):
+                level_input = tuple(numpy.concatenate((old, new)) for old, new in zip(carry, level_input))
+            complete = len(level_input[0]) // self.factor * self.factor
+            # copies, not to keep the whole block in memory
+            self._carries[level - 1] = tuple(values[complete:].copy() for values in level_input)
+            if complete == 0:
+                break
+            mins, maxs, means = (values[:complete].reshape((-1, self.factor) + values.shape[1:])
+                                 for values in level_input)
+            level_input = (mins.min(axis=1), maxs.max(axis=1), means.mean(axis=1, dtype=self._mean_dtype))
+            self._pending[level - 1].append(level_input)
+            self._pending_bytes += sum(values.nbytes for values in level_input)
+        if self._pending_bytes >= self.PENDING_BYTES:
+            self._write_pending()
+
+    def _write_pending(self):
+        for level, pending in enumerate(self._pending, 1):
+            if pending:
+                self._write_level(level, [numpy.concatenate(values) for values in zip(*pending)])
+                del pending[:]
+        self._pending_bytes = 0
+
+    def _write_level(self, level, values):
+        for kind, level_data in zip(PYRAMID_KINDS, values):
+            self.storage_manager.append_data(self.level_name(kind, level), level_data, grow_dimension=0,
+                                             close_file=False)
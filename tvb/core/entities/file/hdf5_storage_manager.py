@@ -37,7 +37,10 @@ Persistence of data in HDF5 format.
 
 import os
 import copy
+import time
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import h5py as hdf5
 import numpy as numpy
 import tvb.core.utils as utils
@@ -46,6 +49,10 @@ from tvb.basic.logger.builder import get_logger
 from tvb.basic.profile import TvbProfile
 from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
 from tvb.core.entities.file.exceptions import IncompatibleFileManagerException, MissingDataFileException
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_storage_policy import StoragePolicy
+from tvb.core.entities.file.hdf5_validity_cache import H5_VALIDITY_CACHE
 from tvb.core.entities.transient.structure_entities import GenericMetaData
 
 # Create logger for this module
@@ -53,6 +60,21 @@ LOG = get_logger(__name__)
 
 LOCK_OPEN_FILE = threading.Lock()
 
+_BACKGROUND_WRITER = None
+_BACKGROUND_WRITER_LOCK = threading.Lock()
+
+
+def _background_writer():
+    """
+    Single thread, shared by all storage managers, writing append buffers in background.
+    One thread is enough: h5py serializes all calls into the HDF5 library anyway.
+    """
+    global _BACKGROUND_WRITER
+    with _BACKGROUND_WRITER_LOCK:
+        if _BACKGROUND_WRITER is None:
+            _BACKGROUND_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="h5-append")
+        return _BACKGROUND_WRITER
+
 
 class HDF5StorageManager(object):
     """
@@ -67,12 +89,19 @@ class HDF5StorageManager(object):
     BOOL_VALUE_PREFIX = "bool:"
     DATETIME_VALUE_PREFIX = "datetime:"
     DATE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
-    LOCKS = {}
 
-    def __init__(self, storage_folder, file_name, buffer_size=600000):
+    def __init__(self, storage_folder, file_name, buffer_size=600000, storage_policy=None, swmr_read=False,
+                 flush_interval=None, background_flush=False):
         """
         Creates a new storage manager instance.
         :param buffer_size: the size in Bytes of the amount of data that will be buffered before writing to file.
+        :param flush_interval: when not None, appended data is also written after this many seconds in buffer
+        :param background_flush: write full append buffers from a background thread, so that the caller
+            can keep producing data meanwhile
+        :param storage_policy: StoragePolicy deciding chunking and compression of new datasets.
+            When None, the policy configured in the current TVB profile is used.
+        :param swmr_read: open the file for reading in SWMR mode, so that it can be read while another process
+            is still writing it (see `start_swmr_write`)
         """
         if storage_folder is None:
             raise FileStructureException("Please provide the folder where to store data")
@@ -81,25 +110,45 @@ class HDF5StorageManager(object):
         self.__storage_full_name = os.path.join(storage_folder, file_name)
         self.__buffer_size = buffer_size
         self.__buffer_array = None
+        self.__flush_interval = flush_interval
+        self.__background_flush = background_flush
         self.data_buffers = {}
+        self.storage_policy = storage_policy
+        self.swmr_read = swmr_read
+        self.__swmr_writing = False
+        # attributes waiting to be written at the end of a metadata batch, None when no batch is open
+        self.__pending_metadata = None
+        self.__metadata_batch_depth = 0
+        # lock on the file, held together with the file handle (see hdf5_locks)
+        self.__lock_token = None
 
     def is_valid_hdf5_file(self):
         """
         This method checks if specified file exists and if it has correct HDF5 format
+        The answer is cached until the file changes on disk.
         :returns: True is file exists and has HDF5 format. False otherwise.
         """
-        try:
-            return os.path.exists(self.__storage_full_name) and hdf5.is_hdf5(self.__storage_full_name)
-        except RuntimeError:
-            return False
+        return H5_VALIDITY_CACHE.is_valid_hdf5(self.__storage_full_name)
 
-    def store_data(self, dataset_name, data_list, where=ROOT_NODE_PATH):
+    def _dataset_options(self, role, data, grow_dimension=None):
+        """
+        Chunking and compression arguments for a new dataset, as decided by the storage policy.
+        """
+        if isinstance(data, hdf5.Empty):
+            return {}
+        policy = self.storage_policy
+        if policy is None:
+            policy = StoragePolicy.from_profile()
+        return policy.dataset_options(role, data.shape, data.dtype, grow_dimension)
+
+    def store_data(self, dataset_name, data_list, where=ROOT_NODE_PATH, role=None):
         """
         This method stores provided data list into a data set in the H5 file.
         
         :param dataset_name: Name of the data set where to store data
         :param data_list: Data to be stored
         :param where: represents the path where to store our dataset (e.g. /data/info)
+        :param role: how the dataset is usually read (see hdf5_storage_policy ROLE_*), used for chunking
         """
         if dataset_name is None:
             dataset_name = ''
@@ -115,7 +164,8 @@ class HDF5StorageManager(object):
 
             full_dataset_name = where + dataset_name
             if full_dataset_name not in hdf5_file:
-                hdf5_file.create_dataset(full_dataset_name, data=data_to_store)
+                hdf5_file.create_dataset(full_dataset_name, data=data_to_store,
+                                         **self._dataset_options(role, data_to_store))
 
             elif hdf5_file[full_dataset_name].shape == data_to_store.shape:
                 hdf5_file[full_dataset_name][...] = data_to_store[...]
@@ -128,7 +178,8 @@ class HDF5StorageManager(object):
             # Now close file
             self.close_file()
 
-    def append_data(self, dataset_name, data_list, grow_dimension=-1, close_file=True, where=ROOT_NODE_PATH):
+    def append_data(self, dataset_name, data_list, grow_dimension=-1, close_file=True, where=ROOT_NODE_PATH,
+                    role=None):
         """
         This method appends data to an existing data set. If the data set does not exists, create it first.
         
@@ -138,6 +189,7 @@ class HDF5StorageManager(object):
         :param close_file: Specify if the file should be closed automatically after write operation. If not, 
             you have to close file by calling method close_file()
         :param where: represents the path where to store our dataset (e.g. /data/info)
+        :param role: how the dataset is usually read (see hdf5_storage_policy ROLE_*), used for chunking
         
         """
         if dataset_name is None:
@@ -152,26 +204,71 @@ class HDF5StorageManager(object):
             datapath = where + dataset_name
             if datapath in hdf5_file:
                 dataset = hdf5_file[datapath]
-                self.data_buffers[datapath] = HDF5StorageManager.H5pyStorageBuffer(dataset,
-                                                                                   buffer_size=self.__buffer_size,
-                                                                                   buffered_data=data_to_store,
-                                                                                   grow_dimension=grow_dimension)
+                self.data_buffers[datapath] = self.__new_buffer(dataset, data_to_store, grow_dimension)
             else:
                 data_shape_list = list(data_to_store.shape)
                 data_shape_list[grow_dimension] = None
                 data_shape = tuple(data_shape_list)
                 dataset = hdf5_file.create_dataset(where + dataset_name, data=data_to_store, shape=data_to_store.shape,
-                                                   dtype=data_to_store.dtype, maxshape=data_shape)
-                self.data_buffers[datapath] = HDF5StorageManager.H5pyStorageBuffer(dataset,
-                                                                                   buffer_size=self.__buffer_size,
-                                                                                   buffered_data=None,
-                                                                                   grow_dimension=grow_dimension)
+                                                   dtype=data_to_store.dtype, maxshape=data_shape,
+                                                   **self._dataset_options(role, data_to_store, grow_dimension))
+                self.data_buffers[datapath] = self.__new_buffer(dataset, None, grow_dimension)
         else:
             if not data_buffer.buffer_data(data_to_store):
                 data_buffer.flush_buffered_data()
         if close_file:
             self.close_file()
 
+    def __new_buffer(self, dataset, buffered_data, grow_dimension):
+        executor = _background_writer() if self.__background_flush else None
+        return HDF5StorageManager.H5pyStorageBuffer(dataset, buffer_size=self.__buffer_size,
+                                                    buffered_data=buffered_data, grow_dimension=grow_dimension,
+                                                    flush_interval=self.__flush_interval, executor=executor)
+
+    def __flush_buffer(self, data_path):
+        """
+        Write what is still buffered for an append on `data_path`, before that dataset is read.
+        """
+        data_buffer = self.data_buffers.get(data_path, None)
+        if data_buffer is not None:
+            data_buffer.flush_buffered_data()
+            data_buffer.wait()
+
+    def store_virtual_data(self, dataset_name, shape, dtype, sources, where=ROOT_NODE_PATH, fillvalue=None):
+        """
+        Store a virtual data set, assembled from data sets of other H5 files. The data set is replaced when
+        it already exists. Reading it reads directly from the source files; regions without a source hold
+        `fillvalue`.
+
+        :param dataset_name: Name of the virtual data set
+        :param shape: shape of the virtual data set
+        :param dtype: numpy dtype of the virtual data set
+        :param sources: list of (target_slice, source_path, source_dataset_name, source_shape) tuples, with the
+            region of the virtual data set filled by each source. Relative source paths are resolved from the
+            folder of this file.
+        :param where: represents the path where to store our dataset (e.g. /data/info)
+        """
+        if dataset_name is None:
+            dataset_name = ''
+        if where is None:
+            where = self.ROOT_NODE_PATH
+
+        layout = hdf5.VirtualLayout(shape=tuple(shape), dtype=dtype)
+        for target_slice, source_path, source_name, source_shape in sources:
+            layout[target_slice] = hdf5.VirtualSource(source_path, source_name, shape=tuple(source_shape))
+
+        self.__flush_pending_metadata()
+        try:
+            LOG.debug("Saving virtual data set: %s" % dataset_name)
+            hdf5_file = self._open_h5_file()
+            full_dataset_name = where + dataset_name
+            if full_dataset_name in hdf5_file:
+                del hdf5_file[full_dataset_name]
+                self._attribute_cache(hdf5_file).pop(full_dataset_name, None)
+            hdf5_file.create_virtual_dataset(full_dataset_name, layout, fillvalue=fillvalue)
+        finally:
+            self.close_file()
+
     def remove_data(self, dataset_name, where=ROOT_NODE_PATH):
         """
         Deleting a data set from H5 file.
@@ -185,10 +282,12 @@ class HDF5StorageManager(object):
             dataset_name = ''
         if where is None:
             where = self.ROOT_NODE_PATH
+        self.__flush_pending_metadata()
         try:
             # Open file in append mode ('a') to allow data remove
             hdf5_file = self._open_h5_file()
             del hdf5_file[where + dataset_name]
+            self._attribute_cache(hdf5_file).pop(where + dataset_name, None)
 
         except KeyError:
             LOG.warn("Trying to delete data set: %s but current file does not contain it." % dataset_name)
@@ -196,7 +295,33 @@ class HDF5StorageManager(object):
         finally:
             self.close_file()
 
-    def get_data(self, dataset_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False, close_file=True):
+    def truncate_data(self, dataset_name, length, where=ROOT_NODE_PATH):
+        """
+        Drop the entries of a growing data set after the first `length` ones, along its first dimension.
+
+        :param dataset_name: name of the data set to shrink
+        :param length: the number of entries to keep
+        :param where: represents the path where dataset is stored (e.g. /data/info)
+        """
+        if dataset_name is None:
+            dataset_name = ''
+        if where is None:
+            where = self.ROOT_NODE_PATH
+        data_path = where + dataset_name
+        try:
+            self.__flush_buffer(data_path)
+            self.data_buffers.pop(data_path, None)
+            hdf5_file = self._open_h5_file()
+            if data_path not in hdf5_file:
+                raise MissingDataSetException("Could not locate dataset: %s" % dataset_name)
+            dataset = hdf5_file[data_path]
+            if dataset.shape[0] > length:
+                dataset.resize(length, axis=0)
+        finally:
+            self.close_file()
+
+    def get_data(self, dataset_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False, close_file=True,
+                 memory_map=False):
         """
         This method reads data from the given data set based on the slice specification
         
@@ -205,6 +330,8 @@ class HDF5StorageManager(object):
         :param dataset_name: Name of the data set from where to read data
         :param data_slice: Specify how to retrieve data from array {e.g (slice(1,10,1),slice(1,6,2)) }
         :param where: represents the path where dataset is stored (e.g. /data/info)  
+        :param memory_map: when True, and the dataset is stored contiguous and unfiltered, return a read-only
+            numpy.memmap over the file instead of copying the data through h5py
         :returns: a numpy.ndarray containing filtered data
         
         """
@@ -216,10 +343,14 @@ class HDF5StorageManager(object):
 
         data_path = where + dataset_name
         try:
+            self.__flush_buffer(data_path)
             # Open file to read data
             hdf5_file = self._open_h5_file('r')
             if data_path in hdf5_file:
                 data_array = hdf5_file[data_path]
+                mapped_array = self._memory_map(data_array) if memory_map else None
+                if mapped_array is not None:
+                    return mapped_array if data_slice is None else mapped_array[data_slice]
                 # Now read data
                 if data_slice is None:
                     result = data_array[()]
@@ -238,12 +369,52 @@ class HDF5StorageManager(object):
             if close_file:
                 self.close_file()
 
-    def get_data_shape(self, dataset_name, where=ROOT_NODE_PATH):
+    def _memory_map(self, data_array):
+        """
+        :returns: a read-only numpy.memmap over the bytes of `data_array` in the file, or None when the dataset
+            is not stored as one contiguous block (chunked, compressed, compact, not yet allocated, variable length)
+        """
+        if data_array.ndim == 0 or data_array.size == 0 or data_array.dtype.hasobject:
+            return None
+        if data_array.id.get_create_plist().get_layout() != hdf5.h5d.CONTIGUOUS:
+            return None
+        offset = data_array.id.get_offset()
+        if offset is None:
+            return None
+        if data_array.file.mode != 'r':
+            # make sure what h5py still holds in its cache is on disk
+            data_array.file.flush()
+        return numpy.memmap(self.__storage_full_name, dtype=data_array.dtype, mode='r',
+                            offset=offset, shape=data_array.shape)
+
+    def get_data_dtype(self, dataset_name, where=ROOT_NODE_PATH):
+        """
+        :param dataset_name: Name of the data set
+        :param where: represents the path where dataset is stored (e.g. /data/info)
+        :returns: the numpy dtype of the data set
+        """
+        if dataset_name is None:
+            dataset_name = ''
+        if where is None:
+            where = self.ROOT_NODE_PATH
+
+        try:
+            self.__flush_buffer(where + dataset_name)
+            hdf5_file = self._open_h5_file('r')
+            return hdf5_file[where + dataset_name].dtype
+        except KeyError:
+            LOG.debug("Trying to read data from a missing data set: %s" % dataset_name)
+            raise MissingDataSetException("Could not locate dataset: %s" % dataset_name)
+        finally:
+            self.close_file()
+
+    def get_data_shape(self, dataset_name, where=ROOT_NODE_PATH, close_file=True):
         """
         This method reads data-size from the given data set 
         
         :param dataset_name: Name of the data set from where to read data
         :param where: represents the path where dataset is stored (e.g. /data/info)  
+        :param close_file: Specify if the file should be closed automatically after read operation.
         :returns: a tuple containing data size
         
         """
@@ -254,6 +425,7 @@ class HDF5StorageManager(object):
             where = self.ROOT_NODE_PATH
 
         try:
+            self.__flush_buffer(where + dataset_name)
             # Open file to read data
             hdf5_file = self._open_h5_file('r')
             data_array = hdf5_file[where + dataset_name]
@@ -263,11 +435,13 @@ class HDF5StorageManager(object):
             raise MissingDataSetException("Could not locate dataset: %s" % dataset_name)
 
         finally:
-            self.close_file()
+            if close_file:
+                self.close_file()
 
     def set_metadata(self, meta_dictionary, dataset_name='', tvb_specific_metadata=True, where=ROOT_NODE_PATH):
         """
         Set meta-data information for root node or for a given data set.
+        When a metadata batch is open, the values are only written when the batch is committed.
         
         :param meta_dictionary: dictionary containing meta info to be stored on node
         :param dataset_name: name of the dataset where to assign metadata. If None, metadata is assigned to ROOT node.
@@ -281,26 +455,91 @@ class HDF5StorageManager(object):
         if where is None:
             where = self.ROOT_NODE_PATH
 
+        if self.__pending_metadata is not None:
+            pending_key = (where + dataset_name, tvb_specific_metadata)
+            self.__pending_metadata.setdefault(pending_key, {}).update(meta_dictionary)
+            return
+
         # Open file to read data
         hdf5_file = self._open_h5_file()
         try:
-            node = hdf5_file[where + dataset_name]
+            self.__write_metadata(hdf5_file, where + dataset_name, meta_dictionary, tvb_specific_metadata)
+        finally:
+            self.close_file()
+
+    def __write_metadata(self, hdf5_file, node_path, meta_dictionary, tvb_specific_metadata):
+        """
+        Write attributes on a node of an already open file.
+        """
+        try:
+            node = hdf5_file[node_path]
         except KeyError:
-            LOG.debug("Trying to set metadata on a missing data set: %s" % dataset_name)
-            node = hdf5_file.create_dataset(where + dataset_name, (1,))
+            LOG.debug("Trying to set metadata on a missing data set: %s" % node_path)
+            node = hdf5_file.create_dataset(node_path, (1,))
+        cached_meta = self._attribute_cache(hdf5_file).get(node_path)
+
+        # Now set meta-data
+        for meta_key in meta_dictionary:
+            key_to_store = meta_key
+            if tvb_specific_metadata:
+                key_to_store = self.TVB_ATTRIBUTE_PREFIX + meta_key
 
+            processed_value = self._serialize_value(meta_dictionary[meta_key])
+            node.attrs[key_to_store] = processed_value
+            if cached_meta is not None:
+                # write-through, with the value as h5py gives it back
+                cached_key, cached_value = self._read_attribute(node, key_to_store)
+                cached_meta[cached_key] = cached_value
+
+    def start_metadata_batch(self):
+        """
+        Start collecting the attributes given to `set_metadata`, to write them all with a single file open
+        in `commit_metadata_batch`. Batches can be nested, only the outermost commit writes.
+        While the batch is open, `get_metadata` already returns the pending values.
+        """
+        self.__metadata_batch_depth += 1
+        if self.__pending_metadata is None:
+            self.__pending_metadata = OrderedDict()
+
+    def commit_metadata_batch(self):
+        """
+        Close the batch opened by `start_metadata_batch`, and write the collected attributes.
+        """
+        if self.__metadata_batch_depth == 0:
+            return
+        self.__metadata_batch_depth -= 1
+        if self.__metadata_batch_depth == 0:
+            self.__flush_pending_metadata()
+            self.__pending_metadata = None
+
+    def __flush_pending_metadata(self):
+        """
+        Write the attributes collected so far in the current batch, leaving the batch open.
+        """
+        pending_metadata = self.__pending_metadata
+        if not pending_metadata:
+            return
+        self.__pending_metadata = OrderedDict()
+        hdf5_file = self._open_h5_file()
         try:
-            # Now set meta-data
-            for meta_key in meta_dictionary:
-                key_to_store = meta_key
-                if tvb_specific_metadata:
-                    key_to_store = self.TVB_ATTRIBUTE_PREFIX + meta_key
-
-                processed_value = self._serialize_value(meta_dictionary[meta_key])
-                node.attrs[key_to_store] = processed_value
+            for (node_path, tvb_specific_metadata), meta_dictionary in pending_metadata.items():
+                self.__write_metadata(hdf5_file, node_path, meta_dictionary, tvb_specific_metadata)
         finally:
             self.close_file()
 
+    def __overlay_pending_metadata(self, node_path, all_meta_data):
+        """
+        Add to the metadata read from the file, the values not yet written by the current batch.
+        """
+        for (pending_path, tvb_specific_metadata), meta_dictionary in self.__pending_metadata.items():
+            if pending_path != node_path:
+                continue
+            for meta_key, value in meta_dictionary.items():
+                if not tvb_specific_metadata and meta_key.startswith(self.TVB_ATTRIBUTE_PREFIX):
+                    meta_key = meta_key[len(self.TVB_ATTRIBUTE_PREFIX):]
+                all_meta_data[meta_key] = self._deserialize_value(self._serialize_value(value))
+        return all_meta_data
+
     def _serialize_value(self, value):
         """
         This method takes a value which will be stored as metadata and 
@@ -337,6 +576,7 @@ class HDF5StorageManager(object):
             dataset_name = ''
         if where is None:
             where = self.ROOT_NODE_PATH
+        self.__flush_pending_metadata()
         try:
             # Open file to read data
             hdf5_file = self._open_h5_file()
@@ -347,6 +587,7 @@ class HDF5StorageManager(object):
             if tvb_specific_metadata:
                 key_to_remove = self.TVB_ATTRIBUTE_PREFIX + meta_key
             del node.attrs[key_to_remove]
+            self._attribute_cache(hdf5_file).pop(where + dataset_name, None)
         except KeyError:
             LOG.error("Trying to delete metadata on a missing data set: %s" % dataset_name)
             raise FileStructureException("Could not locate dataset: %s" % dataset_name)
@@ -371,21 +612,36 @@ class HDF5StorageManager(object):
         if where is None:
             where = self.ROOT_NODE_PATH
 
+        if self.__pending_metadata:
+            node_path = where + dataset_name
+            try:
+                all_meta_data = self.__read_metadata(dataset_name, where)
+            except MissingDataSetException:
+                if not any(pending_path == node_path for pending_path, _ in self.__pending_metadata):
+                    raise
+                all_meta_data = {}
+            return self.__overlay_pending_metadata(node_path, all_meta_data)
+        return self.__read_metadata(dataset_name, where)
+
+    def __read_metadata(self, dataset_name, where):
         meta_key = ""
         try:
             # Open file to read data
             hdf5_file = self._open_h5_file('r')
-            node = hdf5_file[where + dataset_name]
-            # Now retrieve metadata values
-            all_meta_data = {}
+            attribute_cache = self._attribute_cache(hdf5_file)
+            all_meta_data = attribute_cache.get(where + dataset_name)
 
-            for meta_key in node.attrs:
-                new_key = meta_key
-                if meta_key.startswith(self.TVB_ATTRIBUTE_PREFIX):
-                    new_key = meta_key[len(self.TVB_ATTRIBUTE_PREFIX):]
-                value = node.attrs[meta_key]
-                all_meta_data[new_key] = self._deserialize_value(value)
-            return all_meta_data
+            if all_meta_data is None:
+                node = hdf5_file[where + dataset_name]
+                # Now retrieve metadata values
+                all_meta_data = {}
+                for meta_key in node.attrs:
+                    new_key, value = self._read_attribute(node, meta_key)
+                    all_meta_data[new_key] = value
+                attribute_cache[where + dataset_name] = all_meta_data
+
+            # callers are free to change the returned dictionary
+            return dict(all_meta_data)
 
         except KeyError:
             msg = "Trying to read data from a missing data set: %s" % (where + dataset_name)
@@ -436,6 +692,25 @@ class HDF5StorageManager(object):
         raise IncompatibleFileManagerException("File %s is not a hdf5 format file. Are you using the correct "
                                                "manager for this file?" % (self.__storage_full_name,))
 
+    def _read_attribute(self, node, meta_key):
+        """
+        :returns: the attribute name without the TVB prefix, and its deserialized value
+        """
+        new_key = meta_key
+        if meta_key.startswith(self.TVB_ATTRIBUTE_PREFIX):
+            new_key = meta_key[len(self.TVB_ATTRIBUTE_PREFIX):]
+        return new_key, self._deserialize_value(node.attrs[meta_key])
+
+    def _attribute_cache(self, hdf5_file):
+        """
+        Deserialized attributes of the currently open file, shared by all managers working on the same file handle.
+        Keys are node paths. When the handle is not pooled, a throw-away dictionary is returned.
+        """
+        attribute_cache = H5_FILE_POOL.attribute_cache(self.__storage_full_name, hdf5_file)
+        if attribute_cache is None:
+            return {}
+        return attribute_cache
+
     def _deserialize_value(self, value):
         """
         This method takes value loaded from H5 file and transform it to TVB data. 
@@ -457,73 +732,100 @@ class HDF5StorageManager(object):
 
         return value
 
-    def __aquire_lock(self):
+    @property
+    def is_swmr_writing(self):
+        return self.__swmr_writing
+
+    def start_swmr_write(self):
         """
-        Aquire a unique lock for each different file path on the system.
+        Switch the file to HDF5 single-writer / multiple-readers mode, so that other processes can read
+        (with `swmr_read`) the data appended so far, while this manager keeps writing.
+
+        All datasets need to be created before this call: in SWMR mode only existing datasets can grow.
+        The file stays open until `end_swmr_write`. Each `close_file` in between only flushes the appended data.
+        Metadata can not be changed in SWMR mode, thus it is collected and written after `end_swmr_write`.
         """
-        lock = self.LOCKS.get(self.__storage_full_name, None)
-        if lock is None:
-            lock = threading.Lock()
-            self.LOCKS[self.__storage_full_name] = lock
-        lock.acquire()
+        if self.__swmr_writing:
+            return
+        hdf5_file = self._open_h5_file()
+        self.__flush_buffers()
+        hdf5_file.swmr_mode = True
+        self.start_metadata_batch()
+        self.__swmr_writing = True
+        if self.__lock_token is not None and self.__lock_token.write:
+            # SWMR readers can open the file while it is written
+            self.__lock_token = H5_FILE_LOCKS.downgrade(self.__lock_token)
 
-    def __release_lock(self):
+    def end_swmr_write(self):
         """
-        Aquire a unique lock for each different file path on the system.
+        Leave SWMR mode (by closing the file) and write the metadata collected meanwhile.
         """
-        lock = self.LOCKS.get(self.__storage_full_name, None)
-        if lock is None:
-            raise Exception("Some lock was deleted without being released beforehand.")
-        lock.release()
+        if not self.__swmr_writing:
+            return
+        self.__swmr_writing = False
+        self.close_file()
+        H5_FILE_POOL.close(self.__storage_full_name)
+        self.commit_metadata_batch()
+        # do not keep the file locked for the readers in other processes
+        H5_FILE_POOL.close(self.__storage_full_name)
 
     def close_file(self):
         """
-        The synchronization of open/close doesn't seem to be needed anymore for h5py in
-        contrast to PyTables for concurrent reads. However since it shouldn't add that
-        much overhead in most situation we'll leave it like this for now since in case
-        of concurrent writes(metadata) this provides extra safety.
+        Flush and release the file handle, together with the lock on the file.
+        The handle itself is kept open in the process-wide pool, so that the next access on the same file
+        does not need to open it again.
         """
-        try:
-            self.__aquire_lock()
-            self.__close_file()
-        finally:
-            self.__release_lock()
+        self.__close_file()
 
     def _open_h5_file(self, mode='a'):
         """
-        The synchronization of open/close doesn't seem to be needed anymore for h5py in
-        contrast to PyTables for concurrent reads. However since it shouldn't add that
-        much overhead in most situation we'll leave it like this for now since in case
-        of concurrent writes(metadata) this provides extra safety.
+        Get a file handle, after locking the file: shared for mode 'r', exclusive otherwise.
+        Both are held until `close_file`.
         """
-        try:
-            self.__aquire_lock()
-            file_obj = self.__open_h5_file(mode)
-        finally:
-            self.__release_lock()
-        return file_obj
+        return self.__open_h5_file(mode)
 
     def __close_file(self):
         """
-        Close file used to store data.
+        Flush buffered data and give the file handle back to the pool, where it stays open for later reuse.
         """
         hdf5_file = self.__hfd5_file
 
+        if hdf5_file is not None and self.__swmr_writing:
+            # keep the file open, only make the data visible for the SWMR readers
+            self.__flush_buffers()
+            for h5py_buffer in self.data_buffers.values():
+                h5py_buffer.h5py_dataset.flush()
+            self.data_buffers = {}
+            return
+
         # Try to close file only if it was opened before
-        if hdf5_file is not None and hdf5_file.id.valid:
-            LOG.debug("Closing file: %s" % self.__storage_full_name)
+        if hdf5_file is not None:
+            LOG.debug("Releasing file: %s" % self.__storage_full_name)
             try:
-                for h5py_buffer in self.data_buffers.values():
-                    h5py_buffer.flush_buffered_data()
-                self.data_buffers = {}
-                hdf5_file.close()
+                if hdf5_file.id.valid:
+                    self.__flush_buffers()
             except Exception as excep:
-                # Do nothing is this situation.
-                # The file is correctly closed, but the list of open files on HDF5 is not updated in a synch manner.
-                # del _open_files[filename] might throw KeyError
                 LOG.exception(excep)
-            if not hdf5_file.id.valid:
-                self.__hfd5_file = None
+            self.data_buffers = {}
+            H5_FILE_POOL.release(self.__storage_full_name, hdf5_file)
+            self.__hfd5_file = None
+            self.__release_lock()
+
+    def __release_lock(self):
+        if self.__lock_token is not None:
+            token, self.__lock_token = self.__lock_token, None
+            if H5_FILE_LOCKS.release(token):
+                # let the other processes open it
+                H5_FILE_POOL.close_writable(self.__storage_full_name)
+
+    def __flush_buffers(self):
+        """
+        Write all append buffers and wait for the background writes to finish.
+        """
+        for h5py_buffer in self.data_buffers.values():
+            h5py_buffer.flush_buffered_data()
+        for h5py_buffer in self.data_buffers.values():
+            h5py_buffer.wait()
 
     # -------------- Private methods  --------------
     def __open_h5_file(self, mode='a'):
@@ -538,22 +840,30 @@ class HDF5StorageManager(object):
         if self.__storage_full_name is None:
             raise FileStructureException("Invalid storage file. Please provide a valid path.")
         try:
-            # Check if file is still open from previous writes.
-            if self.__hfd5_file is None or not self.__hfd5_file.id.valid:
-                file_exists = os.path.exists(self.__storage_full_name)
-
-                # bug in some versions of hdf5 on windows prevent creating file with mode='a'
-                if not file_exists and mode == 'a':
-                    mode = 'w'
-
-                LOG.debug("Opening file: %s in mode: %s" % (self.__storage_full_name, mode))
-                self.__hfd5_file = hdf5.File(self.__storage_full_name, mode, libver='latest')
-
-                # If this is the first time we access file, write data version
-                if not file_exists:
-                    os.chmod(self.__storage_full_name, TvbProfile.current.ACCESS_MODE_TVB_FILES)
-                    attr_name = self.TVB_ATTRIBUTE_PREFIX + TvbProfile.current.version.DATA_VERSION_ATTRIBUTE
-                    self.__hfd5_file['/'].attrs[attr_name] = TvbProfile.current.version.DATA_VERSION
+            # Check if file is still open from previous writes, and it allows the requested access.
+            hdf5_file = self.__hfd5_file
+            if hdf5_file is not None and hdf5_file.id.valid and (mode == 'r' or hdf5_file.mode != 'r'):
+                return hdf5_file
+
+            if hdf5_file is not None:
+                self.__close_file()
+
+            self.__lock_token = H5_FILE_LOCKS.acquire(self.__storage_full_name, write=mode != 'r')
+            file_exists = os.path.exists(self.__storage_full_name)
+            h5_kwargs = dict(libver='latest', **H5_FILE_LOCKS.h5py_options())
+            if mode == 'r' and self.swmr_read:
+                h5_kwargs['swmr'] = True
+            try:
+                self.__hfd5_file = H5_FILE_POOL.acquire(self.__storage_full_name, mode, **h5_kwargs)
+            except BaseException:
+                self.__release_lock()
+                raise
+
+            # If this is the first time we access file, write data version
+            if not file_exists:
+                os.chmod(self.__storage_full_name, TvbProfile.current.ACCESS_MODE_TVB_FILES)
+                attr_name = self.TVB_ATTRIBUTE_PREFIX + TvbProfile.current.version.DATA_VERSION_ATTRIBUTE
+                self.__hfd5_file['/'].attrs[attr_name] = TvbProfile.current.version.DATA_VERSION
         except (IOError, OSError) as err:
             LOG.exception("Could not open storage file.")
             raise FileStructureException("Could not open storage file. %s" % err)
@@ -582,16 +892,55 @@ class HDF5StorageManager(object):
         """
         Helper class in order to buffer data for append operations, to limit the number of actual
         HDD I/O operations.
+
+        Appended data is copied into a preallocated block, which grows geometrically along `grow_dimension`.
+        The buffer asks to be flushed when it holds more than `buffer_size` bytes, or when `flush_interval`
+        seconds passed since the last flush. `flush_buffered_data` can also be called explicitly at any time.
+        With an `executor`, the actual write happens in background and the next appends go into a new block.
         """
 
-        def __init__(self, h5py_dataset, buffer_size=300, buffered_data=None, grow_dimension=-1):
-            self.buffered_data = buffered_data
-            self.buffer_size = buffer_size
+        def __init__(self, h5py_dataset, buffer_size=600000, buffered_data=None, grow_dimension=-1,
+                     flush_interval=None, executor=None):
             if h5py_dataset is None:
                 raise MissingDataSetException("A H5pyStorageBuffer instance must have a h5py dataset for which the"
                                               "buffering is done. Please supply one to the 'h5py_dataset' parameter.")
             self.h5py_dataset = h5py_dataset
-            self.grow_dimension = grow_dimension
+            self.buffer_size = buffer_size
+            self.grow_dimension = grow_dimension % len(h5py_dataset.shape)
+            self.flush_interval = flush_interval
+            self.executor = executor
+            self._block = None
+            self._filled = 0
+            self._last_flush = time.time()
+            self._pending_write = None
+            if buffered_data is not None:
+                self.buffer_data(buffered_data)
+
+        @property
+        def buffered_data(self):
+            """
+            View on the data buffered so far, None when empty.
+            """
+            if not self._filled:
+                return None
+            return self._block[self._filled_slice(0, self._filled)]
+
+        def _filled_slice(self, start, stop):
+            full_index = [slice(None) for _ in self._block.shape]
+            full_index[self.grow_dimension] = slice(start, stop)
+            return tuple(full_index)
+
+        def _ensure_capacity(self, data_list):
+            needed = self._filled + data_list.shape[self.grow_dimension]
+            capacity = 0 if self._block is None else self._block.shape[self.grow_dimension]
+            if needed <= capacity:
+                return
+            block_shape = list(data_list.shape)
+            block_shape[self.grow_dimension] = max(needed, 2 * capacity)
+            new_block = numpy.empty(tuple(block_shape), dtype=self.h5py_dataset.dtype)
+            if self._filled:
+                new_block[self._filled_slice(0, self._filled)] = self.buffered_data
+            self._block = new_block
 
         def buffer_data(self, data_list):
             """
@@ -599,47 +948,141 @@ class HDF5StorageManager(object):
             :returns: True if buffer is still fine, \
                       False if a flush is necessary since the buffer is full
             """
-            if self.buffered_data is None:
-                self.buffered_data = data_list
-            else:
-                self.buffered_data = self.__custom_numpy_append(self.buffered_data, data_list)
-            if self.buffered_data.nbytes > self.buffer_size:
+            self._ensure_capacity(data_list)
+            rows = data_list.shape[self.grow_dimension]
+            self._block[self._filled_slice(self._filled, self._filled + rows)] = data_list
+            self._filled += rows
+            return not self.needs_flush()
+
+        def needs_flush(self):
+            if not self._filled:
                 return False
-            else:
+            if self.buffered_data.nbytes > self.buffer_size:
                 return True
-
-        def __custom_numpy_append(self, array1, array2):
-            array_1_shape = numpy.array(array1.shape)
-            array_2_shape = numpy.array(array2.shape)
-            result_shape = copy.deepcopy(array_1_shape)
-            result_shape[self.grow_dimension] += array_2_shape[self.grow_dimension]
-            result_array = numpy.empty(shape=tuple(result_shape), dtype=array1.dtype)
-            full_slice = slice(None, None, None)
-            full_index = [full_slice for _ in array_1_shape]
-            full_index[self.grow_dimension] = slice(0, array_1_shape[self.grow_dimension], None)
-            result_array[tuple(full_index)] = array1
-            full_index[self.grow_dimension] = slice(array_1_shape[self.grow_dimension],
-                                                    result_shape[self.grow_dimension], None)
-            result_array[tuple(full_index)] = array2
-            return result_array
+            return self.flush_interval is not None and time.time() - self._last_flush >= self.flush_interval
 
         def flush_buffered_data(self):
             """
             Append the data buffered so far to the input dataset using :param grow_dimension: as the dimension that
             will be expanded. 
             """
-            if self.buffered_data is not None:
-                current_shape = self.h5py_dataset.shape
-                new_shape = list(current_shape)
-                new_shape[self.grow_dimension] += self.buffered_data.shape[self.grow_dimension]
-                # Create the required slice to which the new data will be added.
-                # For example if the 3nd dimension of a 4D datashape (74, 1, 100, 1)
-                # we want to get the slice (:, :, 100:200, :) in order to add 100 new entries
-                full_slice = slice(None, None, None)
-                slice_to_add = slice(current_shape[self.grow_dimension], new_shape[self.grow_dimension], None)
-                append2address = [full_slice for _ in new_shape]
-                append2address[self.grow_dimension] = slice_to_add
-                # Do the data reshape and copy the new data
-                self.h5py_dataset.resize(tuple(new_shape))
-                self.h5py_dataset[tuple(append2address)] = self.buffered_data
-                self.buffered_data = None
+            self._last_flush = time.time()
+            if not self._filled:
+                return
+            data = self.buffered_data
+            self._filled = 0
+            if self.executor is None:
+                self._write(data)
+                return
+            # the block belongs to the background write now, new appends go into a new block
+            self._block = None
+            self.wait()
+            self._pending_write = self.executor.submit(self._write, data)
+
+        def wait(self):
+            """
+            Wait for the background write (if any) to finish. Errors of the write are raised here.
+            """
+            pending_write, self._pending_write = self._pending_write, None
+            if pending_write is not None:
+                pending_write.result()
+
+        def _write(self, data):
+            current_shape = self.h5py_dataset.shape
+            new_shape = list(current_shape)
+            new_shape[self.grow_dimension] += data.shape[self.grow_dimension]
+            # Create the required slice to which the new data will be added.
+            # For example if the 3nd dimension of a 4D datashape (74, 1, 100, 1)
+            # we want to get the slice (:, :, 100:200, :) in order to add 100 new entries
+            full_slice = slice(None, None, None)
+            slice_to_add = slice(current_shape[self.grow_dimension], new_shape[self.grow_dimension], None)
+            append2address = [full_slice for _ in new_shape]
+            append2address[self.grow_dimension] = slice_to_add
+            # Do the data reshape and copy the new data
+            self.h5py_dataset.resize(tuple(new_shape))
+            self.h5py_dataset[tuple(append2address)] = data
+
+
+class HDF5GroupStorage(object):
+    """
+    Storage manager for the nodes under one group of a H5 file, behaving as if that group was the root of a file.
+    This lets several H5File formats live in the same physical file, each one in its own group.
+    All calls go through the storage manager of the file, thus they share its open handle and metadata batches.
+    """
+
+    def __init__(self, storage_manager, group_path):
+        """
+        :param storage_manager: HDF5StorageManager of the physical file
+        :param group_path: absolute path of the group (e.g. /configurations/abc)
+        """
+        self.storage_manager = storage_manager
+        self.group_path = group_path.rstrip('/') + '/'
+
+    def __getattr__(self, name):
+        # operations not depending on a node path (close_file, metadata batches, swmr) act on the whole file
+        return getattr(self.storage_manager, name)
+
+    def _where(self, where):
+        if where is None:
+            where = HDF5StorageManager.ROOT_NODE_PATH
+        return self.group_path + where.lstrip('/')
+
+    def exists(self):
+        """
+        :returns: True when the group was already written in the file
+        """
+        if not self.storage_manager.is_valid_hdf5_file():
+            return False
+        try:
+            return self.group_path.rstrip('/') in self.storage_manager._open_h5_file('r')
+        finally:
+            self.storage_manager.close_file()
+
+    def create(self):
+        try:
+            self.storage_manager._open_h5_file().require_group(self.group_path.rstrip('/'))
+        finally:
+            self.storage_manager.close_file()
+
+    def is_valid_hdf5_file(self):
+        return self.exists()
+
+    def store_data(self, dataset_name, data_list, where=HDF5StorageManager.ROOT_NODE_PATH, role=None):
+        self.storage_manager.store_data(dataset_name, data_list, self._where(where), role)
+
+    def append_data(self, dataset_name, data_list, grow_dimension=-1, close_file=True,
+                    where=HDF5StorageManager.ROOT_NODE_PATH, role=None):
+        self.storage_manager.append_data(dataset_name, data_list, grow_dimension, close_file, self._where(where),
+                                         role)
+
+    def store_virtual_data(self, dataset_name, shape, dtype, sources, where=HDF5StorageManager.ROOT_NODE_PATH,
+                           fillvalue=None):
+        self.storage_manager.store_virtual_data(dataset_name, shape, dtype, sources, self._where(where), fillvalue)
+
+    def remove_data(self, dataset_name, where=HDF5StorageManager.ROOT_NODE_PATH):
+        self.storage_manager.remove_data(dataset_name, self._where(where))
+
+    def truncate_data(self, dataset_name, length, where=HDF5StorageManager.ROOT_NODE_PATH):
+        self.storage_manager.truncate_data(dataset_name, length, self._where(where))
+
+    def get_data(self, dataset_name, data_slice=None, where=HDF5StorageManager.ROOT_NODE_PATH, ignore_errors=False,
+                 close_file=True, memory_map=False):
+        return self.storage_manager.get_data(dataset_name, data_slice, self._where(where), ignore_errors,
+                                             close_file, memory_map)
+
+    def get_data_shape(self, dataset_name, where=HDF5StorageManager.ROOT_NODE_PATH, close_file=True):
+        return self.storage_manager.get_data_shape(dataset_name, self._where(where), close_file)
+
+    def get_data_dtype(self, dataset_name, where=HDF5StorageManager.ROOT_NODE_PATH):
+        return self.storage_manager.get_data_dtype(dataset_name, self._where(where))
+
+    def set_metadata(self, meta_dictionary, dataset_name='', tvb_specific_metadata=True,
+                     where=HDF5StorageManager.ROOT_NODE_PATH):
+        self.storage_manager.set_metadata(meta_dictionary, dataset_name, tvb_specific_metadata, self._where(where))
+
+    def remove_metadata(self, meta_key, dataset_name='', tvb_specific_metadata=True,
+                        where=HDF5StorageManager.ROOT_NODE_PATH):
+        self.storage_manager.remove_metadata(meta_key, dataset_name, tvb_specific_metadata, self._where(where))
+
+    def get_metadata(self, dataset_name='', where=HDF5StorageManager.ROOT_NODE_PATH):
+        return self.storage_manager.get_metadata(dataset_name, self._where(where))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Chunking, compression and precision choices for the datasets written in TVB H5 files.
+
+Datasets are tagged with a role, describing how they are usually read. The storage policy picks a chunk shape
+suitable for that access pattern, and applies the configured compression filters.
+
+Simulation and analysis results can be stored as float32 instead of float64, when that precision is enough.
+"""
+
+import math
+import numpy
+from tvb.basic.profile import TvbProfile
+
+# Time-major data (time, state-variables, space, modes), growing in time, often read per channel
+ROLE_TIME_SERIES = "time_series"
+# Copy of a time series for readers loading one node at a time: chunks hold a long history of a single node
+ROLE_NODE_SERIES = "node_series"
+# Vertices, normals, triangles: (N, 3) arrays, read fully by the viewers
+ROLE_SURFACE_GEOMETRY = "surface_geometry"
+# Dense 2D matrices (weights, tract lengths, projections), read in row or column blocks
+ROLE_DENSE_MATRIX = "dense_matrix"
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_LZF = "lzf"
+
+PRECISION_FLOAT32 = "float32"
+PRECISION_FLOAT64 = "float64"
+
+
+def results_dtype(precision=None):
+    """
+    :param precision: PRECISION_FLOAT32 or PRECISION_FLOAT64; None for the HDF5_RESULTS_PRECISION of the profile
+    :returns: the numpy floating point dtype to store results with
+    """
+    if precision is None:
+        precision = getattr(TvbProfile.current, 'HDF5_RESULTS_PRECISION', PRECISION_FLOAT64)
+    if precision not in (PRECISION_FLOAT32, PRECISION_FLOAT64):
+        raise ValueError("Unsupported precision %s" % precision)
+    return numpy.dtype(precision)
+
+
+def cast_to_precision(array, dtype):
+    """
+    :param dtype: a floating point dtype, as returned by `results_dtype`, or None to keep the array as it is
+    :returns: `array` with its real or complex floating point values cast to the precision of `dtype`,
+        other arrays unchanged
+    """
+    array = numpy.asarray(array)
+    if dtype is None:
+        return array
+    if array.dtype.kind == 'c':
+        return array.astype(numpy.result_type(dtype, numpy.complex64), copy=False)
+    if array.dtype.kind == 'f':
+        return array.astype(dtype, copy=False)
+    return array
+
+
+class StoragePolicy(object):
+    """
+    Computes the h5py `create_dataset` options (chunks and filters) for a dataset with a given role.
+
+    Datasets of fixed size are stored contiguous, unless they are compressed. Growing datasets without a role
+    get the automatic chunking of h5py.
+    """
+
+    def __init__(self, compression=None, compression_level=None, shuffle=False, chunk_bytes=2 ** 18,
+                 space_chunk=64):
+        """
+        :param compression: None, 'gzip' or 'lzf'
+        :param compression_level: gzip level (0-9), ignored for lzf
+        :param shuffle: apply the shuffle filter before compression (helps for float data)
+        :param chunk_bytes: target size of one chunk
+        :param space_chunk: number of channels in one chunk of a time series, so that reading a single channel
+            does not read the full width of the data
+        """
+        if compression not in (None, COMPRESSION_GZIP, COMPRESSION_LZF):
+            raise ValueError("Unsupported compression %s" % compression)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shuffle = shuffle
+        self.chunk_bytes = chunk_bytes
+        self.space_chunk = space_chunk
+
+    @classmethod
+    def from_profile(cls):
+        """
+        Build the default policy, from the settings of the current TVB profile.
+        Profiles without HDF5 settings (e.g. the library profile) get the defaults of this class.
+        """
+        profile = TvbProfile.current
+        if not hasattr(profile, 'HDF5_COMPRESSION'):
+            return cls()
+        return cls(compression=profile.HDF5_COMPRESSION, compression_level=profile.HDF5_COMPRESSION_LEVEL,
+                   shuffle=profile.HDF5_SHUFFLE, chunk_bytes=profile.HDF5_CHUNK_BYTES)
+
+    def dataset_options(self, role, shape, dtype, grow_dimension=None):
+        """
+        :param role: one of the ROLE_* constants, or None when unknown
+        :param shape: the shape of the data written when the dataset is created
+        :param dtype: the numpy dtype of the data
+        :param grow_dimension: the dimension on which the dataset will be extended later, None for fixed datasets
+        :returns: dictionary of extra arguments for h5py `create_dataset`
+        """
+        dtype = numpy.dtype(dtype)
+        shape = tuple(shape)
+        if len(shape) == 0 or numpy.prod(shape) == 0:
+            return {}
+
+        options = {}
+        compress = self.compression is not None and dtype.kind in 'biufc'
+        if compress:
+            options['compression'] = self.compression
+            if self.compression == COMPRESSION_GZIP and self.compression_level is not None:
+                options['compression_opts'] = self.compression_level
+            options['shuffle'] = self.shuffle
+
+        if grow_dimension is None and not compress:
+            # fixed size and unfiltered: a contiguous layout is best for any access pattern
+            return options
+
+        chunks = self._chunk_shape(role, shape, dtype.itemsize)
+        if chunks is not None:
+            if grow_dimension is not None:
+                grow_dimension %= len(shape)
+            # only the growing dimension may have chunks larger than the current data
+            options['chunks'] = tuple(chunk if dim == grow_dimension else min(chunk, shape[dim])
+                                      for dim, chunk in enumerate(chunks))
+        elif compress:
+            # filters only work on chunked datasets
+            options['chunks'] = True
+        return options
+
+    def _chunk_shape(self, role, shape, itemsize):
+        budget = max(self.chunk_bytes // itemsize, 1)
+        if role == ROLE_TIME_SERIES:
+            space_dim = 2 if len(shape) > 2 else len(shape) - 1
+            chunks = list(shape)
+            if space_dim > 0:
+                chunks[space_dim] = min(chunks[space_dim], self.space_chunk)
+            other = int(numpy.prod(chunks[1:]))
+            chunks[0] = max(budget // max(other, 1), 1)
+            return tuple(chunks)
+
+        if role == ROLE_NODE_SERIES and len(shape) > 2:
+            chunks = list(shape)
+            chunks[2] = 1
+            # the first block written holds the whole history, when that is shorter than one chunk
+            chunks[0] = min(max(budget // int(numpy.prod(chunks[1:])), 1), shape[0])
+            return tuple(chunks)
+
+        if role == ROLE_SURFACE_GEOMETRY and len(shape) == 2:
+            return max(budget // max(shape[1], 1), 1), shape[1]
+
+        if role == ROLE_DENSE_MATRIX and len(shape) == 2:
+            tile = max(int(math.sqrt(budget)), 1)
+            return tile, tile
+
+        return None
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Process-wide cache of the validity and TVB data version of H5 files.
+
+Every H5File checks whether its file is already a valid HDF5 file, and the files update manager reads the data
+version of files to decide whether they need an upgrade. Both open the file. The answers are remembered per path,
+together with the inode, modification time and size of the file, so that they are only computed again when the file
+changed on disk.
+"""
+
+import threading
+from collections import OrderedDict
+import h5py as hdf5
+from tvb.core.entities.file.hdf5_file_pool import HDF5FilePool
+
+_VALID = "valid"
+_VERSION = "version"
+
+
+class HDF5ValidityCache(object):
+    """
+    A bounded LRU cache of {path: (file signature, {valid, version})}.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, path, key):
+        """
+        :returns: (signature of the file, cached value for `key` or None)
+        """
+        signature = HDF5FilePool._signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return signature, None
+            value = entry[1].get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(path)
+            return signature, value
+
+    def _remember(self, path, signature, key, value):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                entry = (signature, {})
+            entry[1][key] = value
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def is_valid_hdf5(self, path):
+        """
+        :returns: True when the file at `path` exists and has the HDF5 format
+        """
+        signature, valid = self._lookup(path, _VALID)
+        if signature is None:
+            return False
+        if valid is None:
+            try:
+                valid = hdf5.is_hdf5(path)
+            except RuntimeError:
+                valid = False
+            self._remember(path, signature, _VALID, valid)
+        return valid
+
+    def data_version(self, path, read_version):
+        """
+        :param read_version: callable returning the data version of the file, called when it is not cached.
+            Exceptions are propagated, and nothing is remembered.
+        """
+        signature, version = self._lookup(path, _VERSION)
+        if version is None:
+            version = read_version()
+            if signature is not None:
+                self._remember(path, signature, _VERSION, version)
+        return version
+
+    def forget(self, path):
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+H5_VALIDITY_CACHE = HDF5ValidityCache()
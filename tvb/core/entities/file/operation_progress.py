@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Progress of the running operations, published by the adapters and read in bulk by the web process.
+
+Each running operation owns a small JSON file in the PROGRESS folder of the TVB storage, named after its id.
+The adapter updates it at a throttled rate, so reporting from tight loops costs one clock read per call,
+and the web process reads the progress of many operations without touching the database.
+"""
+
+import os
+import json
+import time
+from tvb.basic.logger.builder import get_logger
+from tvb.basic.profile import TvbProfile
+
+LOG = get_logger(__name__)
+
+PROGRESS_FOLDER = "PROGRESS"
+PROGRESS_FILE_EXTENSION = ".json"
+
+
+def progress_folder():
+    return os.path.join(TvbProfile.current.TVB_STORAGE, PROGRESS_FOLDER)
+
+
+def _progress_path(folder, operation_id):
+    return os.path.join(folder, str(operation_id) + PROGRESS_FILE_EXTENSION)
+
+
+class ProgressReporter(object):
+    """
+    Publishes the progress of one operation: the fraction done, the current rate (fraction per second)
+    and the estimated remaining time.
+    """
+
+    # weight of the latest interval in the smoothed rate
+    RATE_SMOOTHING = 0.3
+
+    def __init__(self, operation_id, min_interval=None, folder=None):
+        """
+        :param operation_id: id of the running operation
+        :param min_interval: minimum number of seconds between two writes of the progress file
+        :param folder: where to write the progress file, defaults to the PROGRESS folder of the TVB storage
+        """
+        if min_interval is None:
+            min_interval = getattr(TvbProfile.current, 'OPERATION_PROGRESS_INTERVAL', 2)
+        self.min_interval = min_interval
+        self.folder = folder or progress_folder()
+        self.path = _progress_path(self.folder, operation_id)
+        self.start_time = time.time()
+        self._last_write = None
+        self._last_fraction = 0.0
+        self._rate = None
+
+    def update(self, fraction):
+        """
+        Record that `fraction` (between 0 and 1) of the operation is done.
+        The progress file is only written when `min_interval` seconds passed since the previous write.
+        """
+        now = time.time()
+        if self._last_write is not None and now - self._last_write < self.min_interval:
+            return
+        previous_time = self._last_write if self._last_write is not None else self.start_time
+        if now > previous_time:
+            rate = (fraction - self._last_fraction) / (now - previous_time)
+            if self._rate is None:
+                self._rate = rate
+            else:
+                self._rate += self.RATE_SMOOTHING * (rate - self._rate)
+        self._last_write = now
+        self._last_fraction = fraction
+        self._write(fraction, now)
+
+    def _write(self, fraction, now):
+        remaining = None
+        if self._rate:
+            remaining = max(1.0 - fraction, 0.0) / self._rate
+        progress = {'fraction': fraction, 'rate': self._rate, 'remaining_seconds': remaining,
+                    'elapsed_seconds': now - self.start_time, 'updated': now}
+        tmp_path = self.path + ".tmp"
+        try:
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder, exist_ok=True)
+            with open(tmp_path, 'w') as progress_file:
+                json.dump(progress, progress_file)
+            # readers never see a partially written file
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError):
+            # progress is informative only, it should never fail the operation
+            LOG.warning("Could not write the progress of the operation in %s" % self.path)
+
+    def remove(self):
+        """
+        Called when the operation ends.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_progress(operation_ids, folder=None):
+    """
+    :param operation_ids: ids of the operations of interest
+    :returns: dictionary {operation id: progress dictionary}, for the operations which published any progress
+    """
+    folder = folder or progress_folder()
+    result = {}
+    for operation_id in operation_ids:
+        try:
+            with open(_progress_path(folder, operation_id)) as progress_file:
+                result[operation_id] = json.load(progress_file)
+        except (IOError, OSError, ValueError):
+            # not running, or never reported any progress
+            continue
+    return result
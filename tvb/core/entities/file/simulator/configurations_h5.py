@@ -1,35 +1,75 @@
 import importlib
 import os
 import uuid
+from tvb.core.entities.file.hdf5_storage_manager import HDF5GroupStorage
 from tvb.core.entities.file.simulator.h5_factory import config_h5_factory
 from tvb.core.neotraits.h5 import H5File
 from tvb.core.neocom import h5
 
 
 class SimulatorConfigurationH5(H5File):
+    # Sub-configurations (model, integrator, monitors, ...) are stored in groups of this file.
+    # When False, each one gets its own H5 file next to this one (the layout written by older versions).
+    store_in_groups = True
+    CONFIGURATIONS_GROUP = "/configurations/"
+
     @staticmethod
     def get_full_class_name(class_entity):
         return class_entity.__module__ + '.' + class_entity.__name__
 
+    def _file_storage_manager(self):
+        # nested configurations also go directly under the configurations group of the file
+        if isinstance(self.storage_manager, HDF5GroupStorage):
+            return self.storage_manager.storage_manager
+        return self.storage_manager
+
+    def _group_storage(self, gid):
+        return HDF5GroupStorage(self._file_storage_manager(), self.CONFIGURATIONS_GROUP + gid.hex)
+
+    def _config_h5_in_group(self, config_h5_class, group_storage):
+        config_h5 = config_h5_class(self.path)
+        config_h5.storage_manager = group_storage
+        return config_h5
+
     def store_config_as_reference(self, config):
         gid = uuid.uuid4()
 
         config_h5_class = config_h5_factory(type(config))
-        config_path = h5.path_for(os.path.dirname(self.path), config_h5_class, gid)
+        if self.store_in_groups:
+            group_storage = self._group_storage(gid)
+            group_storage.create()
+            config_h5 = self._config_h5_in_group(config_h5_class, group_storage)
+            config_h5.written_by.store(self.get_full_class_name(config_h5_class))
+        else:
+            config_path = h5.path_for(os.path.dirname(self.path), config_h5_class, gid)
+            config_h5 = config_h5_class(config_path)
 
-        with config_h5_class(config_path) as config_h5:
+        with config_h5:
             config_h5.store(config)
             config_h5.gid.store(gid)
             config_h5.type.store(self.get_full_class_name(type(config)))
 
         return gid
 
-    def load_from_reference(self, gid):
+    def config_h5_for_reference(self, gid):
+        # type: (uuid.UUID) -> H5File
+        """
+        Open the H5File of a configuration stored with `store_config_as_reference`, from its group in this file,
+        or from its own file, for simulators written by older versions.
+        """
+        group_storage = self._group_storage(gid)
+        if group_storage.exists():
+            h5_class_fqn = group_storage.get_metadata()['written_by']
+            package, cls_name = h5_class_fqn.rsplit('.', 1)
+            config_h5_class = getattr(importlib.import_module(package), cls_name)
+            return self._config_h5_in_group(config_h5_class, group_storage)
+
         dir_loader = h5.DirLoader(os.path.dirname(self.path), h5.REGISTRY)
         config_filename = dir_loader.find_file_name(gid)
-        config_path = os.path.join(dir_loader.base_dir, config_filename)
+        return H5File.from_file(os.path.join(dir_loader.base_dir, config_filename))
 
-        config_h5 = H5File.from_file(config_path)
+    def load_from_reference(self, gid):
+        config_h5 = self.config_h5_for_reference(gid)
 
         config_type = config_h5.type.load()
         package, cls_name = config_type.rsplit('.', 1)
@@ -175,6 +175,22 @@ class OperationDAO(RootDAO):
         return result
 
 
+    def count_unfinished_operations_in_group(self, operation_group_id, excluded_operation_id=None):
+        """
+        Count the operations of a group which are still pending or running, except `excluded_operation_id`.
+        """
+        result = 0
+        try:
+            query = self.session.query(Operation).filter_by(fk_operation_group=operation_group_id
+                                                    ).filter(Operation.status.in_([STATUS_PENDING, STATUS_STARTED]))
+            if excluded_operation_id is not None:
+                query = query.filter(Operation.id != excluded_operation_id)
+            result = query.count()
+        except SQLAlchemyError as excep:
+            self.logger.exception(excep)
+        return result
+
+
     def compute_disk_size_for_started_ops(self, user_id):
         """ Get all the disk space that should be reserved for the started operations of this user. """
         try:
@@ -342,7 +342,8 @@ def transactional(func):
         session_maker.start_transaction()
         try:
             result = func(*args, **kwargs)
-        except Exception:
+        except BaseException:
+            # also when interrupted (e.g. a canceled operation), so that partial changes are not committed
             session_maker.rollback_transaction()
             raise
         finally:
@@ -379,6 +380,11 @@ def add_session(func):
             args[0].session.rollback()
             raise
 
+        except BaseException:
+            # interrupted (e.g. a canceled operation), do not commit the partial changes
+            args[0].session.rollback()
+            raise
+
         finally:
             args[0].session.close_session()
 
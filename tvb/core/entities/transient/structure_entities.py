@@ -298,6 +298,8 @@ class DataTypeMetaData(GenericMetaData):
               'FINAL': 'Final'}
     KEY_SUBJECT = "Data_Subject"
     DEFAULT_SUBJECT = "John Doe"
+    # float32 or float64, for the results of an operation
+    KEY_PRECISION = "Storage_Precision"
     KEY_BURST = "Burst_Reference"
     KEY_TAG_1 = "User_Tag_1_Perpetuated"
     KEY_TAG_2 = "User_Tag_2"
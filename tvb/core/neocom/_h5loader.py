@@ -37,6 +37,7 @@ from tvb.core.entities.generic_attributes import GenericAttributes
 from tvb.core.entities.model.model_datatype import DataType
 from tvb.core.entities.storage import dao
 from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.hdf5_path_index import H5_PATH_INDEX
 from tvb.core.neocom._registry import Registry
 
 
@@ -83,10 +84,10 @@ class DirLoader(object):
 
     def _locate(self, gid):
         # type: (uuid.UUID) -> str
-        for fname in os.listdir(self.base_dir):
-            if fname.endswith(gid.hex + '.h5'):
-                return fname
-        raise IOError('could not locate h5 with gid {}'.format(gid))
+        fname = H5_PATH_INDEX.locate(self.base_dir, gid.hex)
+        if fname is None:
+            raise IOError('could not locate h5 with gid {}'.format(gid))
+        return fname
 
     def find_file_name(self, gid):
         # type: (typing.Union[uuid.UUID, str]) -> str
@@ -128,6 +129,7 @@ class DirLoader(object):
 
             if self.recursive:
                 sub_dt_refs = f.gather_references()
+        H5_PATH_INDEX.add(path)
 
         for traited_attr, sub_gid in sub_dt_refs:
             subdt = getattr(datatype, traited_attr.field_name)
@@ -157,8 +159,7 @@ class TVBLoader(object):
     def path_for_stored_index(self, dt_index_instance):
         # type: (DataType) -> str
         """ Given a Datatype(HasTraitsIndex) instance, build where the corresponding H5 should be or is stored"""
-        operation = dao.get_operation_by_id(dt_index_instance.fk_from_operation)
-        operation_folder = self.file_handler.get_project_folder(operation.project, str(operation.id))
+        operation_folder = self.operation_folder(dt_index_instance.fk_from_operation)
 
         gid = uuid.UUID(dt_index_instance.gid)
         h5_file_class = self.registry.get_h5file_for_index(dt_index_instance.__class__)
@@ -166,25 +167,45 @@ class TVBLoader(object):
 
         return os.path.join(operation_folder, fname)
 
+    def operation_folder(self, operation_id):
+        # type: (int) -> str
+        """
+        Folder of an operation, remembered after the first DB query for that operation.
+        """
+        operation_folder = H5_PATH_INDEX.operation_folder(operation_id)
+        if operation_folder is None or not os.path.isdir(operation_folder):
+            operation = dao.get_operation_by_id(operation_id)
+            operation_folder = self.file_handler.get_project_folder(operation.project, str(operation.id))
+            H5_PATH_INDEX.set_operation_folder(operation_id, operation_folder)
+        return operation_folder
+
     def path_for(self, operation_dir, h5_file_class, gid):
         if isinstance(gid, str):
             gid = uuid.UUID(gid)
         fname = '{}_{}.h5'.format(h5_file_class.file_name_base(), gid.hex)
         return os.path.join(operation_dir, fname)
 
-    def load_from_index(self, dt_index, dt_class=None):
-        # type: (DataType, typing.Type[HasTraits]) -> HasTraits
+    def load_from_index(self, dt_index, dt_class=None, lazy=False):
+        # type: (DataType, typing.Type[HasTraits], bool) -> HasTraits
+        """
+        :param lazy: when True, arrays are not read now, but filled with h5 backed proxies (LazyDataSetArray)
+        """
         h5_path = self.path_for_stored_index(dt_index)
         h5_file_class = self.registry.get_h5file_for_index(dt_index.__class__)
         traits_class = dt_class or self.registry.get_datatype_for_index(dt_index.__class__)
         with h5_file_class(h5_path) as f:
+            f.lazy_datasets = lazy
             result_dt = traits_class()
             f.load_into(result_dt)
         return result_dt
 
-    def load_with_references(self, file_path):
-        # type: (str) -> (HasTraits, GenericAttributes)
+    def load_with_references(self, file_path, lazy=False):
+        # type: (str, bool) -> (HasTraits, GenericAttributes)
+        """
+        :param lazy: when True, arrays of the datatype and of its references are filled with h5 backed proxies
+        """
         with H5File.from_file(file_path) as f:
+            f.lazy_datasets = lazy
             datatype_cls = self.registry.get_datatype_for_h5file(type(f))
             datatype = datatype_cls()
             f.load_into(datatype)
@@ -195,7 +216,7 @@ class TVBLoader(object):
             if sub_gid is None:
                 continue
             ref_idx = dao.get_datatype_by_gid(sub_gid.hex, load_lazy=False)
-            ref_ht = self.load_from_index(ref_idx, traited_attr.field_type)
+            ref_ht = self.load_from_index(ref_idx, traited_attr.field_type, lazy)
             setattr(datatype, traited_attr.field_name, ref_ht)
 
         return datatype, ga
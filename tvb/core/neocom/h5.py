@@ -58,10 +58,14 @@ def h5_file_for_index(dt_index_instance):
     return h5_class(h5_path)
 
 
-def load_from_index(dt_index, dt_class=None):
-    # type: (DataType, typing.Type[HasTraits]) -> HasTraits
+def load_from_index(dt_index, dt_class=None, lazy=False):
+    # type: (DataType, typing.Type[HasTraits], bool) -> HasTraits
+    """
+    Load the datatype stored for the given index.
+    :param lazy: do not read the arrays now. They are replaced by proxies which read from the h5 file when sliced.
+    """
     loader = TVBLoader(REGISTRY)
-    return loader.load_from_index(dt_index, dt_class)
+    return loader.load_from_index(dt_index, dt_class, lazy)
 
 
 def load(source_path):
@@ -73,13 +77,14 @@ def load(source_path):
     return loader.load(source_path)
 
 
-def load_with_references(source_path):
-    # type: (str) -> (HasTraits, GenericAttributes)
+def load_with_references(source_path, lazy=False):
+    # type: (str, bool) -> (HasTraits, GenericAttributes)
     """
     Load a datatype stored in the tvb h5 file found at the given path, but also load linked entities through GID
+    :param lazy: do not read the arrays now. They are replaced by proxies which read from the h5 file when sliced.
     """
     loader = TVBLoader(REGISTRY)
-    return loader.load_with_references(source_path)
+    return loader.load_with_references(source_path, lazy)
 
 
 def store_complete(datatype, base_dir):
@@ -29,12 +29,15 @@
 #
 
 import abc
+import copy
 import json
 import uuid
 import numpy
+import numpy.lib.mixins
 import scipy.sparse
 import typing
 from tvb.basic.neotraits.api import HasTraits, Attr, NArray
+from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
 
 
 class Accessor(object, metaclass=abc.ABCMeta):
@@ -123,36 +126,75 @@ class DataSetMetaData(object):
     """
 
     # noinspection PyShadowingBuiltins
-    def __init__(self, min, max, mean):
+    def __init__(self, min, max, mean, variance=None, count=None):
         self.min, self.max, self.mean = min, max, mean
+        self.variance, self.count = variance, count
 
     @classmethod
     def from_array(cls, array):
         try:
-            return cls(min=array.min(), max=array.max(), mean=array.mean())
+            wide = numpy.result_type(array.dtype, numpy.float64)
+            if array.dtype.kind in 'fc' and wide != array.dtype:
+                # statistics of float32 data are accumulated and stored in double precision
+                return cls(min=wide.type(array.min()), max=wide.type(array.max()), mean=array.mean(dtype=wide),
+                           variance=array.var(dtype=wide), count=array.size)
+            return cls(min=array.min(), max=array.max(), mean=array.mean(), variance=array.var(), count=array.size)
         except (TypeError, ValueError):
             # likely a string array
             return cls(min=None, max=None, mean=None)
 
     @classmethod
     def from_dict(cls, dikt):
-        return cls(min=dikt['Minimum'], max=dikt['Maximum'], mean=dikt['Mean'])
+        # Variance and Count are missing from files written by older versions
+        return cls(min=dikt['Minimum'], max=dikt['Maximum'], mean=dikt['Mean'],
+                   variance=dikt.get('Variance'), count=dikt.get('Count'))
 
     def to_dict(self):
-        return {'Minimum': self.min, 'Maximum': self.max, 'Mean': self.mean}
+        result = {'Minimum': self.min, 'Maximum': self.max, 'Mean': self.mean}
+        if self.count is not None:
+            result.update({'Variance': self.variance, 'Count': self.count})
+        return result
 
     def merge(self, other):
+        """
+        Combine with the statistics of another chunk of the same dataset.
+        Mean and variance are merged with the parallel algorithm of Chan et al., weighted by element counts.
+        """
+        if other.min is None:
+            return
+        if self.min is None:
+            self.min, self.max, self.mean = other.min, other.max, other.mean
+            self.variance, self.count = other.variance, other.count
+            return
+
         self.min = min(self.min, other.min)
         self.max = max(self.max, other.max)
-        self.mean = (self.mean + other.mean) / 2
+        if not self.count or not other.count:
+            # no element counts, a correct mean can not be computed
+            self.mean = (self.mean + other.mean) / 2
+            self.variance, self.count = None, None
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        if self.variance is None or other.variance is None:
+            # legacy metadata, stored before variance was tracked
+            self.variance = None
+        else:
+            self.variance = (self.variance * self.count + other.variance * other.count
+                             + delta ** 2 * self.count * other.count / count) / count
+        self.mean = self.mean + delta * other.count / count
+        self.count = count
 
 
 class DataSet(Accessor):
     """
     A dataset in a h5 file that corresponds to a traited NArray.
     """
-    def __init__(self, trait_attribute, h5file, name=None, expand_dimension=-1):
-        # type: (NArray, H5File, str, int) -> None
+    STATISTIC_KEYS = ('Minimum', 'Maximum', 'Mean', 'Variance', 'Count')
+
+    def __init__(self, trait_attribute, h5file, name=None, expand_dimension=-1, storage_role=None):
+        # type: (NArray, H5File, str, int, str) -> None
         """
         :param trait_attribute: A traited attribute
         :param h5file: The parent H5file that contains this Accessor
@@ -161,51 +203,111 @@ class DataSet(Accessor):
                      If the traited attribute is not a member of a HasTraits then
                      it has no name and you have to provide this parameter
         :param expand_dimension: An int designating a dimension of the array that may grow.
+        :param storage_role: How this dataset is usually read (one of hdf5_storage_policy ROLE_*).
+                     The storage policy chooses the chunk shape based on it.
         """
         super(DataSet, self).__init__(trait_attribute, h5file, name)
         self.expand_dimension = expand_dimension
+        self.storage_role = storage_role
+        self._running_meta = None
 
     def append(self, data, close_file=True, grow_dimension=None):
         # type: (numpy.ndarray, bool, int) -> None
         if not grow_dimension:
             grow_dimension = self.expand_dimension
+        if self._running_meta is None:
+            self._running_meta = self._read_stored_metadata()
         self.owner.storage_manager.append_data(
             self.field_name,
             data,
             grow_dimension=grow_dimension,
-            close_file=close_file
+            close_file=close_file,
+            role=self.storage_role
         )
-        # update the cached array min max metadata values
-        new_meta = DataSetMetaData.from_array(numpy.array(data))
-        meta_dict = self.owner.storage_manager.get_metadata(self.field_name)
-        if meta_dict:
-            meta = DataSetMetaData.from_dict(meta_dict)
-            meta.merge(new_meta)
-        else:
-            # this must be a new file, nothing to merge, set the new meta
-            meta = new_meta
-        self.owner.storage_manager.set_metadata(meta.to_dict(), self.field_name)
+        # update the in-memory min max statistics, these are written to the file on flush_metadata
+        self._running_meta.merge(DataSetMetaData.from_array(numpy.array(data)))
 
+    def _read_stored_metadata(self):
+        """
+        Statistics of the data already in the file, as a start for appends.
+        """
+        try:
+            meta = DataSetMetaData.from_dict(self.owner.storage_manager.get_metadata(self.field_name))
+        except (FileStructureException, MissingDataSetException, KeyError):
+            # this must be a new dataset, nothing to merge
+            return DataSetMetaData(min=None, max=None, mean=None)
+        if meta.count is None and meta.min is not None:
+            meta.count = int(numpy.prod(self.owner.storage_manager.get_data_shape(self.field_name)))
+        return meta
+
+    def flush_metadata(self):
+        """
+        Write the statistics accumulated by `append` to the dataset attributes.
+        Called by the owner H5File when it is closed.
+        """
+        if self._running_meta is None:
+            return
+        self.owner.storage_manager.set_metadata(self._running_meta.to_dict(), self.field_name)
+        self._running_meta = None
+
+    def reset_metadata(self, meta=None):
+        """
+        Replace the statistics of the dataset, e.g. after it was truncated.
+        :param meta: DataSetMetaData of the data now in the dataset; when None it is computed from the stored data
+        """
+        self._running_meta = None
+        if meta is None:
+            try:
+                meta = DataSetMetaData.from_array(self.owner.storage_manager.get_data(self.field_name))
+            except MissingDataSetException:
+                return
+        if meta.min is None:
+            # no data left: drop the statistics, so that appends do not merge with them
+            stored_keys = self.owner.storage_manager.get_metadata(self.field_name)
+            for key in self.STATISTIC_KEYS:
+                if key in stored_keys:
+                    self.owner.storage_manager.remove_metadata(key, self.field_name)
+            return
+        self.owner.storage_manager.set_metadata(meta.to_dict(), self.field_name)
 
     def store(self, data):
         # type: (numpy.ndarray) -> None
         # noinspection PyProtectedMember
+        if isinstance(data, LazyDataSetArray):
+            data = data.load()
         data = self.trait_attribute._validate_set(None, data)
         if data is None:
             return
 
-        self.owner.storage_manager.store_data(self.field_name, data)
+        self._running_meta = None
+        self.owner.storage_manager.store_data(self.field_name, data, role=self.storage_role)
         # cache some array information
         self.owner.storage_manager.set_metadata(
             DataSetMetaData.from_array(data).to_dict(),
             self.field_name
         )
 
-    def load(self):
-        # type: () -> numpy.ndarray
+    def load(self, memory_map=False):
+        # type: (bool) -> numpy.ndarray
+        """
+        :param memory_map: return a read-only numpy.memmap when the dataset is stored contiguous and uncompressed
+        """
         if not self.trait_attribute.required:
-            return self.owner.storage_manager.get_data(self.field_name, ignore_errors=True)
-        return self.owner.storage_manager.get_data(self.field_name)
+            return self.owner.storage_manager.get_data(self.field_name, ignore_errors=True, memory_map=memory_map)
+        return self.owner.storage_manager.get_data(self.field_name, memory_map=memory_map)
+
+    def load_lazy(self):
+        # type: () -> typing.Optional[LazyDataSetArray]
+        """
+        Like `load`, but no data is read now. The returned proxy reads from the file when it is sliced.
+        """
+        try:
+            shape = self.shape
+        except MissingDataSetException:
+            if not self.trait_attribute.required:
+                return None
+            raise
+        return LazyDataSetArray(self, shape)
 
     def __getitem__(self, data_slice):
         # type: (typing.Tuple[slice, ...]) -> numpy.ndarray
@@ -216,17 +318,88 @@ class DataSet(Accessor):
         # type: () -> typing.Tuple[int]
         return self.owner.storage_manager.get_data_shape(self.field_name)
 
+    @property
+    def dtype(self):
+        # type: () -> numpy.dtype
+        """
+        The dtype stored in the file, which can differ from the one of the trait (e.g. float32 results)
+        """
+        return self.owner.storage_manager.get_data_dtype(self.field_name)
+
     def get_cached_metadata(self):
         """
         Returns cached properties of this dataset, like min max mean etc.
         This cache is useful for large, expanding datasets,
         when we want to avoid loading the whole dataset just to compute a max.
         """
+        if self._running_meta is not None:
+            # appends not yet flushed to the file
+            return copy.copy(self._running_meta)
         meta = self.owner.storage_manager.get_metadata(self.field_name)
         return DataSetMetaData.from_dict(meta)
 
 
 
+class LazyDataSetArray(numpy.lib.mixins.NDArrayOperatorsMixin):
+    """
+    Read-only proxy for an array stored in a h5 file. It is used instead of the numpy array when
+    datatypes are loaded lazily (see H5File.load_into).
+
+    `shape`, `dtype` and `ndim` are known without reading any data. Slicing reads only the requested part.
+    Numpy functions and arithmetic operators read the full array, as does `load()`.
+    """
+
+    def __init__(self, dataset, shape):
+        # type: (DataSet, typing.Tuple[int]) -> None
+        self.dataset = dataset
+        self.shape = tuple(shape)
+        self.dtype = numpy.dtype(dataset.dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(numpy.prod(self.shape))
+
+    def __len__(self):
+        if not self.shape:
+            raise TypeError("len() of unsized object")
+        return self.shape[0]
+
+    def __getitem__(self, data_slice):
+        try:
+            data = self.dataset[data_slice]
+        except (TypeError, ValueError, IndexError):
+            # h5py supports a subset of numpy indexing only (e.g. no negative steps or unsorted index lists)
+            data = self.load()[data_slice]
+        return numpy.asarray(data).astype(self.dtype, copy=False)
+
+    def load(self):
+        # type: () -> numpy.ndarray
+        return numpy.asarray(self.dataset.load()).astype(self.dtype, copy=False)
+
+    def __array__(self, dtype=None):
+        data = self.load()
+        if dtype is not None:
+            return data.astype(dtype, copy=False)
+        return data
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = tuple(item.load() if isinstance(item, LazyDataSetArray) else item for item in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __getattr__(self, name):
+        # numpy.ndarray methods (mean, reshape, ...) work on the loaded array
+        if name.startswith('__') or name in ('dataset', 'shape', 'dtype'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return '<LazyDataSetArray {} shape={} dtype={}>'.format(self.dataset.field_name, self.shape, self.dtype)
+
+
 class Reference(Uuid):
     """
     A reference to another h5 file
@@ -363,6 +536,41 @@ class SparseMatrix(Accessor):
         mtx.sort_indices()
         return mtx
 
+    def load_rows(self, start, stop):
+        # type: (int, int) -> scipy.sparse.csr_matrix
+        """
+        Read only the rows [start, stop) of the stored matrix, as a csr matrix of shape (stop - start, columns).
+        For a csr matrix this reads just the slices of `indices` and `data` holding those rows,
+        for a csc matrix the full matrix has to be loaded.
+        """
+        meta = self.get_metadata()
+        nr_rows, nr_columns = meta.shape
+        start, stop, _ = slice(start, stop).indices(nr_rows)
+        stop = max(start, stop)
+        if meta.format != 'csr':
+            return self.load().tocsr()[start:stop]
+
+        indptr = self.owner.storage_manager.get_data(
+            'indptr',
+            data_slice=slice(start, stop + 1),
+            where=self.field_name,
+        )
+        data_slice = slice(int(indptr[0]), int(indptr[-1]))
+        data = self.owner.storage_manager.get_data(
+            'data',
+            data_slice=data_slice,
+            where=self.field_name,
+        )
+        indices = self.owner.storage_manager.get_data(
+            'indices',
+            data_slice=data_slice,
+            where=self.field_name,
+        )
+        mtx = scipy.sparse.csr_matrix((data, indices, indptr - indptr[0]), shape=(stop - start, nr_columns),
+                                      dtype=meta.dtype)
+        mtx.sort_indices()
+        return mtx
+
 
 
 class Json(Scalar):
@@ -31,6 +31,7 @@
 import importlib
 import typing
 import os.path
+from contextlib import contextmanager
 from datetime import datetime
 from tvb.core.entities.file.exceptions import MissingDataSetException
 from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
@@ -39,6 +40,10 @@ from tvb.core.entities.generic_attributes import GenericAttributes
 from tvb.core.neotraits._h5accessors import Uuid, Scalar, Accessor, DataSet, Reference, JsonFinal
 from tvb.core.utils import date2string, string2date
 
+# traits of the header scalars, shared by all H5File instances (building new ones on every construction is costly)
+_STR_ATTR = Attr(str)
+_BOOL_ATTR = Attr(bool)
+
 
 class H5File(object):
     """
@@ -47,32 +52,39 @@ class H5File(object):
     A subclass of this defines a new file format.
     """
     is_new_file = False
+    # StoragePolicy for the datasets of this file format. None means the default policy of the TVB profile.
+    storage_policy = None
+    # When True, load_into fills NArray attributes with LazyDataSetArray proxies instead of reading the data
+    lazy_datasets = False
+    # Open for reading in SWMR mode, for file formats which can be read while they are being written
+    swmr_read = False
 
     def __init__(self, path):
         # type: (str) -> None
         self.path = path
         storage_path, file_name = os.path.split(path)
-        self.storage_manager = HDF5StorageManager(storage_path, file_name)
+        self.storage_manager = HDF5StorageManager(storage_path, file_name, storage_policy=self.storage_policy,
+                                                  swmr_read=self.swmr_read)
         # would be nice to have an opened state for the chunked api instead of the close_file=False
 
         # common scalar headers
         self.gid = Uuid(HasTraits.gid, self)
-        self.written_by = Scalar(Attr(str), self, name='written_by')
-        self.create_date = Scalar(Attr(str), self, name='create_date')
+        self.written_by = Scalar(_STR_ATTR, self, name='written_by')
+        self.create_date = Scalar(_STR_ATTR, self, name='create_date')
 
         # Generic attributes descriptors
         self.generic_attributes = GenericAttributes()
-        self.invalid = Scalar(Attr(bool), self, name='invalid')
-        self.is_nan = Scalar(Attr(bool), self, name='is_nan')
-        self.subject = Scalar(Attr(str), self, name='subject')
-        self.state = Scalar(Attr(str), self, name='state')
-        self.type = Scalar(Attr(str), self, name='type')
-        self.user_tag_1 = Scalar(Attr(str), self, name='user_tag_1')
-        self.user_tag_2 = Scalar(Attr(str), self, name='user_tag_2')
-        self.user_tag_3 = Scalar(Attr(str), self, name='user_tag_3')
-        self.user_tag_4 = Scalar(Attr(str), self, name='user_tag_4')
-        self.user_tag_5 = Scalar(Attr(str), self, name='user_tag_5')
-        self.visible = Scalar(Attr(bool), self, name='visible')
+        self.invalid = Scalar(_BOOL_ATTR, self, name='invalid')
+        self.is_nan = Scalar(_BOOL_ATTR, self, name='is_nan')
+        self.subject = Scalar(_STR_ATTR, self, name='subject')
+        self.state = Scalar(_STR_ATTR, self, name='state')
+        self.type = Scalar(_STR_ATTR, self, name='type')
+        self.user_tag_1 = Scalar(_STR_ATTR, self, name='user_tag_1')
+        self.user_tag_2 = Scalar(_STR_ATTR, self, name='user_tag_2')
+        self.user_tag_3 = Scalar(_STR_ATTR, self, name='user_tag_3')
+        self.user_tag_4 = Scalar(_STR_ATTR, self, name='user_tag_4')
+        self.user_tag_5 = Scalar(_STR_ATTR, self, name='user_tag_5')
+        self.visible = Scalar(_BOOL_ATTR, self, name='visible')
 
         if not self.storage_manager.is_valid_hdf5_file():
             self.written_by.store(self.__class__.__module__ + '.' + self.__class__.__name__)
@@ -100,21 +112,55 @@ class H5File(object):
         self.close()
 
     def close(self):
+        for dataset in self.iter_datasets():
+            dataset.flush_metadata()
+        self.storage_manager.end_swmr_write()
         self.storage_manager.close_file()
 
+    def finalize(self):
+        """
+        Called once the datatype is complete, when the operation which produced it has finished.
+        Subclasses can derive secondary data (e.g. other layouts) from what was stored.
+        """
+        pass
+
+    def start_swmr_write(self):
+        """
+        Let readers from other processes see the data appended from now on, while this file is still written.
+        Only datasets which already exist can be appended to afterwards. SWMR mode ends when the file is closed.
+        """
+        self.storage_manager.start_swmr_write()
+
+    @contextmanager
+    def bulk_attributes(self):
+        """
+        Collect the attributes stored inside this block (scalars, json, references and dataset metadata)
+        and write them to the file at the end of the block, with a single file open.
+
+            with ts_h5.bulk_attributes():
+                ts_h5.sample_period.store(period)
+                ts_h5.title.store(title)
+        """
+        self.storage_manager.start_metadata_batch()
+        try:
+            yield self
+        finally:
+            self.storage_manager.commit_metadata_batch()
+
     def store(self, datatype, scalars_only=False, store_references=True):
         # type: (HasTraits, bool, bool) -> None
-        for accessor in self.iter_accessors():
-            f_name = accessor.trait_attribute.field_name
-            if f_name is None:
-                # skipp attribute that does not seem to belong to a traited type
-                # accessor is an independent Accessor
-                continue
-            if scalars_only and not isinstance(accessor, Scalar):
-                continue
-            if not store_references and isinstance(accessor, Reference):
-                continue
-            accessor.store(getattr(datatype, f_name))
+        with self.bulk_attributes():
+            for accessor in self.iter_accessors():
+                f_name = accessor.trait_attribute.field_name
+                if f_name is None:
+                    # skipp attribute that does not seem to belong to a traited type
+                    # accessor is an independent Accessor
+                    continue
+                if scalars_only and not isinstance(accessor, Scalar):
+                    continue
+                if not store_references and isinstance(accessor, Reference):
+                    continue
+                accessor.store(getattr(datatype, f_name))
 
     def load_into(self, datatype):
         # type: (HasTraits) -> None
@@ -127,6 +173,11 @@ class H5File(object):
                 # skipp attribute that does not seem to belong to a traited type
                 continue
 
+            if self.lazy_datasets and isinstance(accessor, DataSet):
+                # bypass the trait validation, which would need the data
+                datatype.__dict__[f_name] = accessor.load_lazy()
+                continue
+
             # handle optional data, that will be missing from the h5 files
             try:
                 value = accessor.load()
@@ -146,20 +197,21 @@ class H5File(object):
     def store_generic_attributes(self, generic_attributes):
         # type: (GenericAttributes) -> None
         # write_metadata  creation time, serializer class name, etc
-        self.create_date.store(date2string(datetime.now()))
-
-        self.generic_attributes.fill_from(generic_attributes)
-        self.invalid.store(self.generic_attributes.invalid)
-        self.is_nan.store(self.generic_attributes.is_nan)
-        self.subject.store(self.generic_attributes.subject)
-        self.state.store(self.generic_attributes.state)
-        self.type.store(self.generic_attributes.type)
-        self.user_tag_1.store(self.generic_attributes.user_tag_1)
-        self.user_tag_2.store(self.generic_attributes.user_tag_2)
-        self.user_tag_3.store(self.generic_attributes.user_tag_3)
-        self.user_tag_4.store(self.generic_attributes.user_tag_4)
-        self.user_tag_5.store(self.generic_attributes.user_tag_5)
-        self.visible.store(self.generic_attributes.visible)
+        with self.bulk_attributes():
+            self.create_date.store(date2string(datetime.now()))
+
+            self.generic_attributes.fill_from(generic_attributes)
+            self.invalid.store(self.generic_attributes.invalid)
+            self.is_nan.store(self.generic_attributes.is_nan)
+            self.subject.store(self.generic_attributes.subject)
+            self.state.store(self.generic_attributes.state)
+            self.type.store(self.generic_attributes.type)
+            self.user_tag_1.store(self.generic_attributes.user_tag_1)
+            self.user_tag_2.store(self.generic_attributes.user_tag_2)
+            self.user_tag_3.store(self.generic_attributes.user_tag_3)
+            self.user_tag_4.store(self.generic_attributes.user_tag_4)
+            self.user_tag_5.store(self.generic_attributes.user_tag_5)
+            self.visible.store(self.generic_attributes.visible)
 
     def load_generic_attributes(self):
         # type: () -> GenericAttributes
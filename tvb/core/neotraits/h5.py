@@ -1,4 +1,4 @@
-from ._h5accessors import DataSet, DataSetMetaData
+from ._h5accessors import DataSet, DataSetMetaData, LazyDataSetArray
 from ._h5accessors import Scalar, Reference, Accessor
 from ._h5accessors import SparseMatrix, SparseMatrixMetaData
 from ._h5accessors import Json, JsonFinal
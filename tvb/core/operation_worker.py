@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Long lived process launching operations one after the other, started by the WorkerPoolClient:
+python -m tvb.core.operation_worker TEST_SQLITE_PROFILE 50 2147483648
+
+Importing TVB and connecting to the database is done once per worker, instead of once per operation.
+Operation ids are read from stdin, one per line. After each operation, a line "<operation id> <result>"
+is written on the original stdout, where result is one of the RESULT_* constants. Anything printed by the
+operations goes to stderr, so it can not break this protocol.
+
+The worker exits after `max_operations` operations, or when its memory grows over `max_memory` bytes,
+with RECYCLE appended to the line of its last operation, and the pool starts a fresh one.
+SIGUSR1 cancels the operation currently running. The cancel may interrupt the operation anywhere, thus the
+worker is always recycled after a canceled operation, and the next operation starts in a fresh process.
+"""
+
+import os
+import sys
+import signal
+import psutil
+from tvb.basic.profile import TvbProfile
+
+if __name__ == '__main__':
+    TvbProfile.set_profile(sys.argv[1], True)
+
+from tvb.basic.logger.builder import get_logger
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_node_major import wait_for_background_builds
+
+LOG = get_logger(__name__)
+
+CANCEL_SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+RESULT_DONE = "done"
+RESULT_CANCELED = "canceled"
+# appended to the result when the worker exits after this operation
+RECYCLE = "recycle"
+
+
+class OperationCanceled(BaseException):
+    """
+    Raised in the worker when its operation is canceled.
+    Not an Exception, so that the error handling of the operation does not catch it and mark it as failed.
+    """
+
+
+class OperationWorker(object):
+
+    def __init__(self, launch, max_operations=None, max_memory=None):
+        """
+        :param launch: callable receiving an operation id and running that operation
+        :param max_operations: number of operations to launch before exiting, None for no limit
+        :param max_memory: resident memory (in bytes) over which the worker exits, None for no limit
+        """
+        self.launch = launch
+        self.max_operations = max_operations
+        self.max_memory = max_memory
+        self.current_operation = None
+        self.nr_operations = 0
+
+    def _on_cancel_signal(self, signum, frame):
+        if self.current_operation is not None:
+            raise OperationCanceled()
+
+    def run_operation(self, operation_id):
+        """
+        :returns: RESULT_DONE or RESULT_CANCELED
+        """
+        self.current_operation = operation_id
+        try:
+            self.launch(operation_id)
+            result = RESULT_DONE
+        except OperationCanceled:
+            LOG.info("Operation %s was canceled" % operation_id)
+            result = RESULT_CANCELED
+        finally:
+            self.current_operation = None
+            self._release_files()
+        self.nr_operations += 1
+        return result
+
+    @staticmethod
+    def _release_files():
+        """
+        Close the files of the operation which just ended, and let the other processes use them.
+        A canceled operation did not close its files itself, thus its locks are dropped here too.
+        """
+        wait_for_background_builds()
+        # handles of the operation files are not needed by the following operations
+        H5_FILE_POOL.close_all()
+        H5_FILE_LOCKS.release_all()
+
+    def should_recycle(self):
+        if self.max_operations is not None and self.nr_operations >= self.max_operations:
+            return True
+        return self.max_memory is not None and psutil.Process().memory_info().rss > self.max_memory
+
+    def serve(self, input_stream, output_stream):
+        """
+        Launch the operations read from `input_stream` until it is closed, or until this worker should be recycled.
+        """
+        if CANCEL_SIGNAL is not None:
+            previous_handler = signal.signal(CANCEL_SIGNAL, self._on_cancel_signal)
+        try:
+            self._serve(input_stream, output_stream)
+        finally:
+            if CANCEL_SIGNAL is not None:
+                signal.signal(CANCEL_SIGNAL, previous_handler)
+
+    def _serve(self, input_stream, output_stream):
+        for line in iter(input_stream.readline, ''):
+            operation_id = line.strip()
+            if not operation_id:
+                continue
+            try:
+                result = self.run_operation(operation_id)
+            except OperationCanceled:
+                # the signal arrived just after the operation finished
+                result = RESULT_CANCELED
+            recycle = result == RESULT_CANCELED or self.should_recycle()
+            output_stream.write("%s %s%s\n" % (operation_id, result, " " + RECYCLE if recycle else ""))
+            output_stream.flush()
+            if recycle:
+                return
+
+
+if __name__ == '__main__':
+    from tvb.core.operation_async_launcher import do_operation_launch
+
+    # keep the original stdout for the protocol, and send everything else printed to stderr
+    PROTOCOL_OUTPUT = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    MAX_OPERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 and int(sys.argv[2]) > 0 else None
+    MAX_MEMORY = int(sys.argv[3]) if len(sys.argv) > 3 and int(sys.argv[3]) > 0 else None
+    OperationWorker(do_operation_launch, MAX_OPERATIONS, MAX_MEMORY).serve(sys.stdin, PROTOCOL_OUTPUT)
@@ -46,6 +46,7 @@ from tvb.core.services.burst_service2 import BurstService2
 from tvb.core.utils import parse_json_parameters
 from tvb.core.entities.model.model_operation import OperationProcessIdentifier, STATUS_ERROR, STATUS_CANCELED
 from tvb.core.entities.storage import dao
+from tvb.core.operation_worker import CANCEL_SIGNAL, RESULT_CANCELED, RECYCLE
 
 
 LOGGER = get_logger(__name__)
@@ -57,6 +58,21 @@ for i in range(TvbProfile.current.MAX_THREADS_NUMBER):
     LOCKS_QUEUE.put(1)
 
 
+def _mark_operation_crashed(operation_id):
+    """
+    Mark as failed an operation whose process ended unexpectedly, together with its burst.
+    """
+    burst_service = BurstService2()
+    operation = dao.get_operation_by_id(operation_id)
+    burst_service.persist_operation_state(operation, STATUS_ERROR,
+                                          "Operation failed unexpectedly! Please check the log files.")
+
+    burst_entity = dao.get_burst_for_operation_id(operation_id)
+    if burst_entity:
+        message = "Error in operation process! Possibly segmentation fault."
+        burst_service.mark_burst_finished(burst_entity, error_message=message)
+
+
 class OperationExecutor(threading.Thread):
     """
     Thread in charge for starting an operation, used both on cluster and with stand-alone installations.
@@ -105,18 +121,9 @@ class OperationExecutor(threading.Thread):
 
             if returned != 0 and not self.stopped():
                 # Process did not end as expected. (e.g. Segmentation fault)
-                burst_service = BurstService2()
-                operation = dao.get_operation_by_id(self.operation_id)
                 LOGGER.error("Operation suffered fatal failure! Exit code: %s Exit message: %s" % (returned,
                                                                                                    subprocess_result))
-
-                burst_service.persist_operation_state(operation, STATUS_ERROR,
-                                                         "Operation failed unexpectedly! Please check the log files.")
-
-                burst_entity = dao.get_burst_for_operation_id(self.operation_id)
-                if burst_entity:
-                    message = "Error in operation process! Possibly segmentation fault."
-                    burst_service.mark_burst_finished(burst_entity, error_message=message)
+                _mark_operation_crashed(self.operation_id)
 
             del launched_process
 
@@ -209,6 +216,197 @@ class StandAloneClient(object):
         return stopped
 
 
+class PoolWorker(threading.Thread):
+    """
+    Thread feeding operations to one long lived worker process (see tvb.core.operation_worker),
+    and starting a new process whenever the previous one exited.
+    """
+
+
+    def __init__(self, pool):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.pool = pool
+        self.process = None
+        self.operation_id = None
+        self.lock = threading.Lock()
+
+
+    def _start_process(self):
+        run_params = [TvbProfile.current.PYTHON_INTERPRETER_PATH, '-m', 'tvb.core.operation_worker',
+                      TvbProfile.CURRENT_PROFILE_NAME, str(self.pool.max_operations or 0),
+                      str(self.pool.max_memory or 0)]
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        self.process = Popen(run_params, stdin=PIPE, stdout=PIPE, env=env, universal_newlines=True)
+        LOGGER.debug("Started operation worker with pid=%s" % self.process.pid)
+
+
+    def _send(self, operation_id):
+        if self.process is None or self.process.poll() is not None:
+            self._start_process()
+        try:
+            self.process.stdin.write("%s\n" % operation_id)
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            # the worker exited just now
+            self._start_process()
+            self.process.stdin.write("%s\n" % operation_id)
+            self.process.stdin.flush()
+
+
+    def run(self):
+        while True:
+            operation_id = self.pool.next_operation()
+            try:
+                self._run_operation(operation_id)
+            except Exception:
+                # keep this worker serving the following operations
+                LOGGER.exception("Could not run operation %s in a worker" % operation_id)
+
+
+    def _run_operation(self, operation_id):
+        with self.lock:
+            self._send(operation_id)
+            self.operation_id = operation_id
+        LOGGER.debug("Storing pid=%s for operation id=%s launched in a worker." % (self.process.pid, operation_id))
+        dao.store_entity(OperationProcessIdentifier(operation_id, pid=self.process.pid))
+
+        reply = self.process.stdout.readline().split()
+        with self.lock:
+            self.operation_id = None
+        canceled = self.pool.forget_canceled(operation_id)
+        LOGGER.info("Finished with launch of operation %s" % operation_id)
+
+        if not reply:
+            returned = self.process.wait()
+            self.process = None
+            if not canceled:
+                LOGGER.error("Operation worker died while running operation %s! Exit code: %s" % (operation_id,
+                                                                                                   returned))
+                _mark_operation_crashed(operation_id)
+        elif RECYCLE in reply[2:]:
+            self.process.wait()
+            self.process = None
+            LOGGER.debug("Operation worker recycled after operation %s" % operation_id)
+
+
+    def cancel(self, operation_id):
+        """
+        Signal the worker to cancel `operation_id`, when it is currently running it.
+        The worker process is killed when the operation does not stop in time.
+        :returns: True when the operation was running in this worker
+        """
+        with self.lock:
+            if self.operation_id != operation_id or self.process is None:
+                return False
+            process = self.process
+            if CANCEL_SIGNAL is None:
+                OperationExecutor.stop_pid(process.pid)
+                return True
+            try:
+                os.kill(process.pid, CANCEL_SIGNAL)
+            except OSError:
+                return True
+        timer = threading.Timer(self.pool.cancel_timeout, self._kill_if_running, [operation_id, process])
+        timer.daemon = True
+        timer.start()
+        return True
+
+
+    def _kill_if_running(self, operation_id, process):
+        # e.g. the operation is blocked in a long numpy call, where the signal handler can not run
+        with self.lock:
+            if self.operation_id == operation_id and self.process is process:
+                LOGGER.warning("Operation %s did not stop when canceled, killing its worker" % operation_id)
+                OperationExecutor.stop_pid(process.pid)
+
+
+class WorkerPoolClient(object):
+    """
+    Launch operations on a pool of long lived local worker processes, which import TVB only once.
+    Selected instead of the StandAloneClient by the OPERATION_WORKER_POOL setting.
+    """
+
+
+    def __init__(self, nr_workers, max_operations=None, max_memory=None, cancel_timeout=10):
+        """
+        :param nr_workers: number of operations running in parallel
+        :param max_operations: a worker is replaced with a fresh process after this many operations
+        :param max_memory: a worker is replaced with a fresh process when its memory grows over this many bytes
+        :param cancel_timeout: seconds to wait for a canceled operation to stop, before killing its worker
+        """
+        self.nr_workers = nr_workers
+        self.max_operations = max_operations
+        self.max_memory = max_memory
+        self.cancel_timeout = cancel_timeout
+        self._queue = queue.Queue()
+        self._canceled = set()
+        self._workers = []
+        self._lock = threading.Lock()
+
+
+    def _ensure_started(self):
+        # workers are started on the first operation, not when the web process imports this module
+        with self._lock:
+            if not self._workers:
+                for _ in range(self.nr_workers):
+                    worker = PoolWorker(self)
+                    worker.start()
+                    self._workers.append(worker)
+
+
+    def next_operation(self):
+        """
+        Called by the workers: block until an operation which was not canceled is waiting.
+        """
+        while True:
+            operation_id = self._queue.get()
+            with self._lock:
+                if operation_id not in self._canceled:
+                    return operation_id
+                self._canceled.discard(operation_id)
+
+
+    def forget_canceled(self, operation_id):
+        """
+        :returns: True when `operation_id` was canceled while running
+        """
+        with self._lock:
+            if operation_id in self._canceled:
+                self._canceled.discard(operation_id)
+                return True
+            return False
+
+
+    def execute(self, operation_id, user_name_label, adapter_instance):
+        """Queue the operation for the next free worker"""
+        self._ensure_started()
+        self._queue.put(int(operation_id))
+
+
+    def stop_operation(self, operation_id):
+        """
+        Stop an operation, either waiting in the queue or running in a worker.
+        """
+        operation_id = int(operation_id)
+        operation = dao.try_get_operation_by_id(operation_id)
+        if not operation or operation.has_finished:
+            LOGGER.warning("Operation already stopped or not found is given to stop job: %s" % operation_id)
+            return True
+
+        LOGGER.debug("Stopping operation: %s" % str(operation_id))
+        with self._lock:
+            self._canceled.add(operation_id)
+        for worker in list(self._workers):
+            if worker.cancel(operation_id):
+                LOGGER.debug("Signaled the worker running operation: %d" % operation_id)
+                break
+
+        BurstService2().persist_operation_state(operation, STATUS_CANCELED)
+        return True
+
+
 class ClusterSchedulerClient(object):
     """
     Simple class, to mimic the same behavior we are expecting from StandAloneClient, but firing behind
@@ -289,6 +487,11 @@ class ClusterSchedulerClient(object):
 if TvbProfile.current.cluster.IS_DEPLOY:
     # Return an entity capable to submit jobs to the cluster.
     BACKEND_CLIENT = ClusterSchedulerClient()
+elif getattr(TvbProfile.current, 'OPERATION_WORKER_POOL', False):
+    # Launch on a pool of long lived local processes.
+    BACKEND_CLIENT = WorkerPoolClient(TvbProfile.current.MAX_THREADS_NUMBER,
+                                      TvbProfile.current.OPERATION_WORKER_MAX_OPERATIONS,
+                                      TvbProfile.current.OPERATION_WORKER_MAX_MEMORY)
 else:
     # Return a thread launcher.
     BACKEND_CLIENT = StandAloneClient()
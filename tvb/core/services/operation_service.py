@@ -57,15 +57,18 @@ from tvb.core.adapters.exceptions import LaunchException
 from tvb.adapters.datatypes.db.time_series import TimeSeriesIndex
 from tvb.core.entities.model.model_burst import PARAM_RANGE_PREFIX, RANGE_PARAMETER_1, RANGE_PARAMETER_2
 from tvb.core.entities.model.model_datatype import DataTypeGroup
-from tvb.core.entities.model.model_operation import STATUS_FINISHED, STATUS_ERROR, OperationGroup, Operation
+from tvb.core.entities.model.model_operation import STATUS_FINISHED, STATUS_ERROR, STATUS_CANCELED, STATUS_PENDING
+from tvb.core.entities.model.model_operation import OperationGroup, Operation
 from tvb.core.entities.model.model_workflow import WorkflowStepView
 from tvb.core.entities.model.simulator.burst_configuration import BurstConfiguration2
 from tvb.core.entities.storage import dao
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData
 from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.operation_progress import read_progress
 from tvb.core.services.burst_service2 import BurstService2
 from tvb.core.services.workflow_service import WorkflowService
 from tvb.core.services.backend_client import BACKEND_CLIENT
+from tvb.core.services.exceptions import OperationException
 
 try:
     from cherrypy._cpreqbody import Part
@@ -559,4 +562,26 @@ class OperationService:
         return BACKEND_CLIENT.stop_operation(int(operation_id))
 
 
+    def relaunch_operation(self, operation_id):
+        """
+        Launch again an operation which failed or was canceled, in the same operation folder.
+        Simulations continue from their last checkpoint, when one was written.
+        """
+        operation = dao.get_operation_by_id(operation_id)
+        if operation.status not in (STATUS_ERROR, STATUS_CANCELED):
+            raise OperationException("Only failed or canceled operations can be relaunched!")
+        operation.status = STATUS_PENDING
+        operation.completion_date = None
+        operation.additional_info = ""
+        dao.store_entity(operation)
+        self.launch_operation(operation.id, send_to_cluster=True)
+
 
+    @staticmethod
+    def get_operations_progress(operation_ids):
+        """
+        :returns: {operation id: progress}, for the operations still running which reported their progress.
+            Each progress is a dictionary with the fraction done, the rate (fraction per second),
+            the estimated remaining and elapsed seconds, and the time of the last update.
+        """
+        return read_progress([int(operation_id) for operation_id in operation_ids])
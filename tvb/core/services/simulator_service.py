@@ -36,7 +36,6 @@ from tvb.datatypes.surfaces import CorticalSurface
 from tvb.simulator.simulator import Simulator
 from tvb.adapters.datatypes.h5.region_mapping_h5 import RegionMappingH5
 from tvb.core.entities.file.files_helper import FilesHelper
-from tvb.core.entities.file.simulator.cortex_h5 import CortexH5
 from tvb.core.entities.file.simulator.simulator_h5 import SimulatorH5
 from tvb.core.entities.model.model_datatype import DataTypeGroup
 from tvb.core.entities.model.model_operation import Operation
@@ -83,6 +82,10 @@ class SimulatorService(object):
             connectivity_gid = simulator_in_h5.connectivity.load()
             stimulus_gid = simulator_in_h5.stimulus.load()
             simulation_state_gid = simulator_in_h5.simulation_state.load()
+            if simulator_in.surface:
+                with simulator_in_h5.config_h5_for_reference(simulator_in.surface.gid) as cortex_h5:
+                    local_conn_gid = cortex_h5.local_connectivity.load()
+                    region_mapping_gid = cortex_h5.region_mapping_data.load()
 
         conn_index = dao.get_datatype_by_gid(connectivity_gid.hex)
         conn = h5.load_from_index(conn_index)
@@ -90,11 +93,6 @@ class SimulatorService(object):
         simulator_in.connectivity = conn
 
         if simulator_in.surface:
-            cortex_path = h5.path_for(storage_path, CortexH5, simulator_in.surface.gid)
-            with CortexH5(cortex_path) as cortex_h5:
-                local_conn_gid = cortex_h5.local_connectivity.load()
-                region_mapping_gid = cortex_h5.region_mapping_data.load()
-
             region_mapping_index = dao.get_datatype_by_gid(region_mapping_gid.hex)
             region_mapping_path = h5.path_for_stored_index(region_mapping_index)
             region_mapping = RegionMapping()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Measure concurrent reads of the same TVB H5 file, as done by several viewers paging through one TimeSeries,
+with readers in separate processes (e.g. web process and operation workers) and in threads of one process.
+Readers share the file lock, so the aggregated throughput of reader processes should grow with their number.
+Threads of one process do not scale the same way, as h5py runs only one call into HDF5 at a time.
+The last row adds a process writing metadata to the same file meanwhile, which the readers wait for.
+
+Usage:  python -m tvb.interfaces.command.benchmark_h5_locks [nr_time_points] [nr_nodes] [pages_per_reader]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+from time import time
+from tvb.basic.profile import TvbProfile
+
+TvbProfile.set_profile(TvbProfile.COMMAND_PROFILE)
+
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_locks import H5_FILE_LOCKS
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+
+FILE_NAME = "bench_locks.h5"
+PAGE_SIZE = 1000
+READERS = (1, 2, 4, 8)
+ROW = "%-36s %9.1f MB/s"
+
+
+def _init_process():
+    H5_FILE_POOL.reset_after_fork()
+    H5_FILE_LOCKS.reset_after_fork()
+
+
+def read_pages(folder, nr_pages, seed):
+    """
+    Read `nr_pages` pages at random positions, as a viewer would.
+    :returns: number of bytes read
+    """
+    manager = HDF5StorageManager(folder, FILE_NAME)
+    nr_time_points = manager.get_data_shape("data")[0]
+    starts = numpy.random.RandomState(seed).randint(0, max(nr_time_points - PAGE_SIZE, 1), nr_pages)
+    read_bytes = 0
+    for start in starts:
+        page = manager.get_data("data", (slice(start, start + PAGE_SIZE), slice(None), slice(None), slice(None)))
+        read_bytes += page.nbytes
+    return read_bytes
+
+
+def write_metadata(folder, nr_writes):
+    manager = HDF5StorageManager(folder, FILE_NAME)
+    for idx in range(nr_writes):
+        manager.set_metadata({"bench_counter": idx})
+    return 0
+
+
+def bench_processes(folder, nr_readers, nr_pages, with_writer=False):
+    """
+    :returns: aggregated read throughput in MB/s
+    """
+    with multiprocessing.Pool(nr_readers + int(with_writer), initializer=_init_process) as pool:
+        start = time()
+        results = [pool.apply_async(read_pages, (folder, nr_pages, seed)) for seed in range(nr_readers)]
+        if with_writer:
+            results.append(pool.apply_async(write_metadata, (folder, nr_pages)))
+        read_bytes = sum(result.get() for result in results)
+        return read_bytes / 2.0 ** 20 / (time() - start)
+
+
+def bench_threads(folder, nr_readers, nr_pages):
+    """
+    :returns: aggregated read throughput in MB/s
+    """
+    with ThreadPoolExecutor(nr_readers) as executor:
+        start = time()
+        read_bytes = sum(executor.map(lambda seed: read_pages(folder, nr_pages, seed), range(nr_readers)))
+        return read_bytes / 2.0 ** 20 / (time() - start)
+
+
+def main(nr_time_points=100000, nr_nodes=192, nr_pages=200):
+    folder = tempfile.mkdtemp()
+    try:
+        data = numpy.random.random((nr_time_points, 1, nr_nodes, 1))
+        manager = HDF5StorageManager(folder, FILE_NAME)
+        manager.store_data("data", data)
+        H5_FILE_POOL.close(os.path.join(folder, FILE_NAME))
+        print("Time series of shape %s, %.1f MB, pages of %d time points" % (str(data.shape),
+                                                                           data.nbytes / 2.0 ** 20, PAGE_SIZE))
+        for nr_readers in READERS:
+            print(ROW % ("%d reader process(es):" % nr_readers, bench_processes(folder, nr_readers, nr_pages)))
+        for nr_readers in READERS:
+            print(ROW % ("%d reader thread(s):" % nr_readers, bench_threads(folder, nr_readers, nr_pages)))
+        print(ROW % ("4 reader processes and a writer:", bench_processes(folder, 4, nr_pages, with_writer=True)))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Measure write and read throughput of TVB H5 storage, for different chunking and compression policies.
+A synthetic region-level time series is written in blocks (like the simulator does), then read back
+in time pages (like the time series viewers) and one channel at a time (like per-node analyzers).
+Then the same data is appended in small slices (like the analyzers do), with synchronous and background flushes.
+
+Usage:  python -m tvb.interfaces.command.benchmark_h5_storage [nr_time_points] [nr_nodes]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy
+from time import time
+from tvb.basic.profile import TvbProfile
+
+TvbProfile.set_profile(TvbProfile.COMMAND_PROFILE)
+
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+from tvb.core.entities.file.hdf5_storage_policy import StoragePolicy, ROLE_TIME_SERIES
+
+POLICIES = [
+    ("h5py default", StoragePolicy(), None),
+    ("time-series chunks", StoragePolicy(), ROLE_TIME_SERIES),
+    ("chunks + lzf", StoragePolicy(compression='lzf', shuffle=True), ROLE_TIME_SERIES),
+    ("chunks + gzip 4", StoragePolicy(compression='gzip', compression_level=4, shuffle=True), ROLE_TIME_SERIES),
+]
+
+HEADER = """
++----------------------+-----------+-----------+-----------+-----------+
+| Policy               | Write     | Page read | Node read | File size |
+|                      |    (MB/s) |    (MB/s) |    (MB/s) |      (MB) |
++======================+===========+===========+===========+==========="""
+LINE = "+----------------------+-----------+-----------+-----------+-----------+"
+ROW = "| %-20s | %9.1f | %9.1f | %9.1f | %9.1f |"
+APPEND_ROW = "Slice appends, %-22s %9.1f MB/s"
+
+
+def _synthetic_data(nr_time_points, nr_nodes):
+    time_axis = numpy.linspace(0, 100, nr_time_points)[:, numpy.newaxis]
+    signal = numpy.sin(time_axis * numpy.linspace(0.5, 3, nr_nodes)[numpy.newaxis, :])
+    return signal.reshape((nr_time_points, 1, nr_nodes, 1))
+
+
+def bench_policy(folder, policy, role, data, block_size=256, page_size=1000):
+    """
+    :returns: tuple with (write MB/s, page read MB/s, node read MB/s, file size in MB)
+    """
+    file_name = "bench.h5"
+    path = os.path.join(folder, file_name)
+    mega_bytes = data.nbytes / 2.0 ** 20
+
+    manager = HDF5StorageManager(folder, file_name, storage_policy=policy)
+    start = time()
+    for idx in range(0, data.shape[0], block_size):
+        manager.append_data("data", data[idx:idx + block_size], grow_dimension=0, close_file=False, role=role)
+    manager.close_file()
+    H5_FILE_POOL.close(path)
+    write_speed = mega_bytes / (time() - start)
+
+    start = time()
+    for idx in range(0, data.shape[0], page_size):
+        manager.get_data("data", (slice(idx, idx + page_size), slice(None), slice(None), slice(None)))
+    page_speed = mega_bytes / (time() - start)
+    H5_FILE_POOL.close(path)
+
+    nr_nodes = data.shape[2]
+    start = time()
+    for node in range(nr_nodes):
+        manager.get_data("data", (slice(None), slice(None), slice(node, node + 1), slice(None)))
+    node_speed = mega_bytes / (time() - start)
+    H5_FILE_POOL.close(path)
+
+    size = os.path.getsize(path) / 2.0 ** 20
+    os.remove(path)
+    return write_speed, page_speed, node_speed, size
+
+
+def bench_appends(folder, data, background_flush, slice_size=4):
+    """
+    :returns: append throughput in MB/s, for slices of `slice_size` time points
+    """
+    file_name = "bench_append.h5"
+    path = os.path.join(folder, file_name)
+    manager = HDF5StorageManager(folder, file_name, background_flush=background_flush)
+    start = time()
+    for idx in range(0, data.shape[0], slice_size):
+        manager.append_data("data", data[idx:idx + slice_size], grow_dimension=0, close_file=False)
+    manager.close_file()
+    H5_FILE_POOL.close(path)
+    speed = data.nbytes / 2.0 ** 20 / (time() - start)
+    os.remove(path)
+    return speed
+
+
+def main(nr_time_points=20000, nr_nodes=192):
+    data = _synthetic_data(nr_time_points, nr_nodes)
+    folder = tempfile.mkdtemp()
+    print("Time series of shape %s, %.1f MB" % (str(data.shape), data.nbytes / 2.0 ** 20))
+    print(HEADER)
+    try:
+        for title, policy, role in POLICIES:
+            print(ROW % ((title,) + bench_policy(folder, policy, role, data)))
+            print(LINE)
+        print("")
+        print(APPEND_ROW % ("synchronous flush:", bench_appends(folder, data, False)))
+        print(APPEND_ROW % ("background flush:", bench_appends(folder, data, True)))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Measure how long it takes to prepare the simulator configurations of a PSE, and to read them back when the
+operations are launched, for the single-file (groups) layout and for the older one-file-per-configuration layout.
+Each grid point gets its own operation folder, as in SimulatorService.async_launch_and_prepare_pse.
+The DB part of the PSE launch is the same for both layouts, thus it is left out.
+
+Usage:  python -m tvb.interfaces.command.benchmark_simulator_storage [grid_size]
+"""
+
+import os
+import sys
+import copy
+import uuid
+import shutil
+import tempfile
+import numpy
+from time import time
+from tvb.basic.profile import TvbProfile
+
+TvbProfile.set_profile(TvbProfile.COMMAND_PROFILE)
+
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator.integrators import HeunStochastic
+from tvb.simulator.monitors import Bold
+from tvb.simulator.noise import Additive
+from tvb.simulator.simulator import Simulator
+from tvb.core.entities.file.simulator.configurations_h5 import SimulatorConfigurationH5
+from tvb.core.entities.file.simulator.simulator_h5 import SimulatorH5
+from tvb.core.services.simulator_service import SimulatorService
+from tvb.core.neocom import h5
+
+LAYOUTS = [
+    ("single file", True),
+    ("file per configuration", False),
+]
+
+HEADER = """
++------------------------+-----------+-----------+-----------+
+| Layout                 | Prepare   | Load      | Files     |
+|                        |       (s) |       (s) |           |
++========================+===========+===========+==========="""
+LINE = "+------------------------+-----------+-----------+-----------+"
+ROW = "| %-22s | %9.2f | %9.2f | %9d |"
+
+
+def bench_layout(folder, simulator, grid_size, store_in_groups):
+    """
+    :returns: tuple with (seconds to serialize all grid points, seconds to deserialize them, number of files)
+    """
+    SimulatorConfigurationH5.store_in_groups = store_in_groups
+    simulators = []
+
+    start = time()
+    for idx, (speed, sigma) in enumerate(numpy.ndindex(grid_size, grid_size)):
+        grid_simulator = copy.deepcopy(simulator)
+        grid_simulator.conduction_speed = 1.0 + speed
+        grid_simulator.integrator.noise.nsig = numpy.array([1e-4 * (1 + sigma)])
+        storage_path = os.path.join(folder, str(idx))
+        os.makedirs(storage_path)
+        simulator_gid = uuid.uuid4().hex
+        SimulatorService.serialize_simulator(grid_simulator, simulator_gid, None, storage_path)
+        simulators.append((storage_path, simulator_gid))
+    prepare_time = time() - start
+
+    start = time()
+    for storage_path, simulator_gid in simulators:
+        with SimulatorH5(h5.path_for(storage_path, SimulatorH5, simulator_gid)) as simulator_h5:
+            simulator_h5.load_into(Simulator())
+    load_time = time() - start
+
+    nr_files = sum(len(files) for _, _, files in os.walk(folder))
+    return prepare_time, load_time, nr_files
+
+
+def main(grid_size=10):
+    simulator = Simulator(connectivity=Connectivity(), integrator=HeunStochastic(noise=Additive()),
+                          monitors=[Bold()])
+    print("PSE of %d x %d simulators" % (grid_size, grid_size))
+    print(HEADER)
+    try:
+        for title, store_in_groups in LAYOUTS:
+            folder = tempfile.mkdtemp()
+            try:
+                print(ROW % ((title,) + bench_layout(folder, simulator, grid_size, store_in_groups)))
+                print(LINE)
+            finally:
+                shutil.rmtree(folder)
+    finally:
+        SimulatorConfigurationH5.store_in_groups = True
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -140,11 +140,25 @@ def ndarray_to_http_binary(func):
         cherrypy.response.headers["X-Array-Shape"] = str(x.shape)
         cherrypy.response.headers["X-Array-Type"] = str(x.dtype)
 
-        return x.tostring()
+        if x.nbytes <= BINARY_TRANSPORT_BLOCK:
+            return x.tobytes()
+        # Send large arrays (e.g. memory mapped from a H5 file) in blocks, instead of one full copy in memory.
+        # Without streaming, CherryPy would join the blocks in memory (collapse_body) before sending them.
+        cherrypy.response.stream = True
+        return _iter_bytes(x)
 
     return deco
 
 
+BINARY_TRANSPORT_BLOCK = 2 ** 20
+
+
+def _iter_bytes(x):
+    raw = memoryview(x).cast('B')
+    for start in range(0, len(raw), BINARY_TRANSPORT_BLOCK):
+        yield raw[start:start + BINARY_TRANSPORT_BLOCK].tobytes()
+
+
 def handle_error(redirect):
     """
     If `redirect` is true(default) all errors will generate redirects.
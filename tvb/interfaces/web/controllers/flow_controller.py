@@ -53,6 +53,7 @@ from tvb.core.services.operation_service import OperationService, RANGE_PARAMETE
 from tvb.core.services.project_service import ProjectService
 from tvb.core.services.burst_service import BurstService
 from tvb.core.neocom import h5
+from tvb.core.neotraits.h5 import DataSet
 from tvb.interfaces.web.controllers import common
 from tvb.interfaces.web.controllers.base_controller import BaseController
 from tvb.interfaces.web.controllers.decorators import expose_page, settings, context_selected, expose_numpy_array
@@ -605,20 +606,20 @@ class FlowController(BaseController):
     def read_from_h5_file(self, entity_gid, method_name, flatten=False, datatype_kwargs='null', **kwargs):
         self.logger.debug("Starting to read HDF5: " + entity_gid + "/" + method_name + "/" + str(kwargs))
         entity = ABCAdapter.load_entity_by_gid(entity_gid)
-        entity_h5 = h5.h5_file_for_index(entity)
 
         datatype_kwargs = json.loads(datatype_kwargs)
         if datatype_kwargs:
             for key, value in six.iteritems(datatype_kwargs):
                 kwargs[key] = ABCAdapter.load_entity_by_gid(value)
 
-        result = getattr(entity_h5, method_name)
-        if kwargs:
-            result = result(**kwargs)
-        else:
-            result = result()
+        # The file handle is released (not closed) on exit, so the next page request reuses the pooled handle
+        with h5.h5_file_for_index(entity) as entity_h5:
+            result = getattr(entity_h5, method_name)
+            if kwargs:
+                result = result(**kwargs)
+            else:
+                result = result()
 
-        entity_h5.close()
         return self._prepare_result(result, flatten)
 
 
@@ -654,6 +655,13 @@ class FlowController(BaseController):
 
     @expose_numpy_array
     def read_binary_datatype_attribute(self, entity_gid, dataset_name, datatype_kwargs='null', **kwargs):
+        if not kwargs and json.loads(datatype_kwargs) is None:
+            # a plain array attribute is served straight from the file, without loading the whole datatype
+            entity = ABCAdapter.load_entity_by_gid(entity_gid)
+            with h5.h5_file_for_index(entity) as entity_h5:
+                accessor = getattr(entity_h5, dataset_name, None)
+                if isinstance(accessor, DataSet):
+                    return accessor.load(memory_map=True)
         return self._read_datatype_attribute(entity_gid, dataset_name, datatype_kwargs, **kwargs)
 
 
@@ -762,6 +770,25 @@ class FlowController(BaseController):
         return result
 
 
+    @expose_json
+    def relaunch_operation(self, operation_id):
+        """
+        Launch again a failed or canceled operation. A simulation continues from its last checkpoint.
+        """
+        OperationService().relaunch_operation(int(operation_id))
+        return True
+
+
+    @expose_json
+    def get_operations_progress(self, operation_ids):
+        """
+        Progress of many running operations in a single call.
+        :param operation_ids: JSON list of operation ids
+        :returns: {operation id: {fraction, rate, remaining_seconds, elapsed_seconds, updated}}
+        """
+        return OperationService.get_operations_progress(json.loads(operation_ids))
+
+
     @expose_json
     def stop_burst_operation(self, operation_id, is_group, remove_after_stop=False):
         """
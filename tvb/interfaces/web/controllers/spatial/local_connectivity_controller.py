@@ -39,6 +39,7 @@ import cherrypy
 from tvb.core.adapters.input_tree import InputTreeManager
 from tvb.datatypes.local_connectivity import LocalConnectivity
 from tvb.core.adapters.abcadapter import ABCAdapter
+from tvb.core.neocom import h5
 from tvb.interfaces.web.controllers import common
 from tvb.interfaces.web.controllers.base_controller import BaseController
 from tvb.interfaces.web.controllers.decorators import check_user, handle_error
@@ -272,18 +273,25 @@ class LocalConnectivityController(SpatioTemporalController):
 
         Returns a json which contains the data needed for drawing a gradient view for the selected vertex.
         """
-        selected_local_conn = ABCAdapter.load_entity_by_gid(local_connectivity_gid)
-        surface = selected_local_conn.surface
+        # Only the picked triangle and one row of the sparse matrix are read, not the full surface and matrix
+        local_conn_index = ABCAdapter.load_entity_by_gid(local_connectivity_gid)
+        surface_index = ABCAdapter.load_entity_by_gid(local_conn_index.surface_gid)
         triangle_index = int(selected_triangle)
-        vertex_index = int(surface.triangles[triangle_index][0])
-        picked_data = list(selected_local_conn.matrix[vertex_index].toarray().squeeze())
+
+        with h5.h5_file_for_index(surface_index) as surface_h5:
+            vertex_index = int(surface_h5.triangles[triangle_index][0])
+            number_of_split_slices = surface_h5.get_number_of_split_slices()
+            slice_boundaries = [surface_h5.get_slice_vertex_boundaries(slice_number)
+                                for slice_number in range(number_of_split_slices)]
+
+        with h5.h5_file_for_index(local_conn_index) as local_conn_h5:
+            picked_data = local_conn_h5.get_vertex_row(vertex_index).tolist()
 
         result = []
-        if surface.number_of_split_slices <= 1:
+        if number_of_split_slices <= 1:
             result.append(picked_data)
         else:
-            for slice_number in range(surface.number_of_split_slices):
-                start_idx, end_idx = surface.get_slice_vertex_boundaries(slice_number)
+            for start_idx, end_idx in slice_boundaries:
                 result.append(picked_data[start_idx:end_idx])
 
         result = {'data': json.dumps(result)}
@@ -634,6 +634,22 @@ function stopBurstOperation(operationId, isGroup) {
 }
 
 
+function relaunchOperation(operationId) {
+    // Launch again a failed or canceled operation, a simulation continues from its last checkpoint.
+    doAjaxCall({
+        type: 'POST',
+        url: "/flow/relaunch_operation/" + operationId,
+        success: function () {
+            displayMessage("The operation was launched again.", "infoMessage");
+            refreshOperations();
+        },
+        error: function () {
+            displayMessage("Some error occurred while relaunching the operation.", 'errorMessage');
+        }
+    });
+}
+
+
 function deleteOperation(operationId, isGroup) {
     // Delete a operation that was not part of a Burst
     _stopOperationsOrBurst(operationId, isGroup, false, true);
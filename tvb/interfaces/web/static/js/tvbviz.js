@@ -85,8 +85,9 @@ tv.util = {
     },
 
     get_array_slice: function (baseURL, slices, callback, channels, currentMode, currentStateVar) {
+        // zoomed out pages show the mean of the time points each one stands for
         var readDataURL = readDataChannelURL(baseURL, slices[0].lo, slices[0].hi,
-            currentStateVar, currentMode, slices[0].di, JSON.stringify(channels));
+            currentStateVar, currentMode, slices[0].di, JSON.stringify(channels), "mean");
         //NOTE: If we need to add slices for the other dimensions pass them as the 'specific_slices' parameter.
         //      Method called is from time_series.py.
         $.getJSON(readDataURL, callback);
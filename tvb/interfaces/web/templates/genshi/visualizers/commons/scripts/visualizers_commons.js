@@ -19,7 +19,10 @@
 
 // ----- Datatype methods mappings start from here
 
-function readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step) {
+/**
+ * @param aggregation optional: "min", "max" or "mean" to summarize each step of time points, instead of sampling them
+ */
+function readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step, aggregation) {
     if (stateVariable === null || stateVariable === undefined) {
         stateVariable = 0;
     }
@@ -29,7 +32,11 @@ function readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, m
     if (step === null || step == undefined) {
         step = 1;
     }
-    return baseDatatypeMethodURL + '/read_data_page/False?from_idx=' + fromIdx + ";to_idx=" + toIdx + ";step=" + step + ";specific_slices=[null," + stateVariable + ",null," + mode + "]";
+    let url = baseDatatypeMethodURL + '/read_data_page/False?from_idx=' + fromIdx + ";to_idx=" + toIdx + ";step=" + step + ";specific_slices=[null," + stateVariable + ",null," + mode + "]";
+    if (aggregation) {
+        url += ";aggregation=" + aggregation;
+    }
+    return url;
 }
 
 function readDataSplitPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step) {
@@ -37,8 +44,8 @@ function readDataSplitPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariab
     return baseURL.replace('read_data_page', 'read_data_page_split');
 }
 
-function readDataChannelURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step, channels) {
-    const baseURL = readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step);
+function readDataChannelURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step, channels, aggregation) {
+    const baseURL = readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step, aggregation);
     return baseURL.replace('read_data_page', 'read_channels_page') + ';channels_list=' + channels;
 }
 
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the buffering of monitor output before it is written to H5 files.
+"""
+
+import sys
+import subprocess
+import numpy
+import pytest
+from tvb.adapters.datatypes.h5.time_series_h5 import TimeSeriesH5
+from tvb.adapters.simulator.monitor_buffer import MonitorOutputBuffer, BackgroundBlockWriter
+from tvb.datatypes.time_series import TimeSeries
+
+
+def _write_samples(path, nr_samples, writer=None, **buffer_kwargs):
+    samples = numpy.random.random((nr_samples, 2, 5, 1))
+    with TimeSeriesH5(path) as ts_h5:
+        ts_h5.store(TimeSeries(sample_period=0.5), scalars_only=True)
+        monitor_buffer = MonitorOutputBuffer(ts_h5, writer=writer, **buffer_kwargs)
+        for i in range(nr_samples):
+            monitor_buffer.add(i * 0.5, samples[i])
+        monitor_buffer.flush()
+        if writer is not None:
+            writer.close()
+    return samples
+
+
+def test_block_in_samples(tmph5factory):
+    path = tmph5factory()
+    samples = _write_samples(path, 23, block_samples=10)
+
+    with TimeSeriesH5(path) as ts_h5:
+        assert ts_h5.read_data_shape() == samples.shape
+        numpy.testing.assert_array_equal(ts_h5.data.load(), samples)
+        numpy.testing.assert_array_equal(ts_h5.time.load(), numpy.arange(23) * 0.5)
+
+
+def test_block_in_bytes(tmph5factory):
+    path = tmph5factory()
+    # one sample has 2 * 5 float64 values, so 3 samples fit in a block
+    samples = _write_samples(path, 7, block_bytes=250)
+
+    with TimeSeriesH5(path) as ts_h5:
+        numpy.testing.assert_array_equal(ts_h5.data.load(), samples)
+
+
+def test_float32_precision(tmph5factory):
+    path = tmph5factory()
+    samples = _write_samples(path, 12, block_samples=5, dtype=numpy.dtype(numpy.float32))
+
+    with TimeSeriesH5(path) as ts_h5:
+        data = ts_h5.data.load()
+        assert data.dtype == numpy.float32
+        numpy.testing.assert_allclose(data, samples, rtol=1e-6)
+        metadata = ts_h5.data.get_cached_metadata()
+        assert isinstance(metadata.mean, float)
+        assert metadata.max == pytest.approx(samples.max(), rel=1e-6)
+        assert metadata.mean == pytest.approx(samples.mean(), rel=1e-6)
+
+
+def test_flush_interval(tmph5factory):
+    path = tmph5factory()
+    with TimeSeriesH5(path) as ts_h5:
+        ts_h5.store(TimeSeries(sample_period=0.5), scalars_only=True)
+        monitor_buffer = MonitorOutputBuffer(ts_h5, block_samples=10, flush_interval=0)
+        for i in range(3):
+            monitor_buffer.add(i * 0.5, numpy.zeros((2, 5, 1)))
+        # the interval passes for every sample, long before the block is full
+        assert ts_h5.read_data_shape()[0] == 3
+
+
+def test_background_writer(tmph5factory):
+    path = tmph5factory()
+    writer = BackgroundBlockWriter(max_pending_blocks=2)
+    samples = _write_samples(path, 50, block_samples=4, writer=writer)
+
+    with TimeSeriesH5(path) as ts_h5:
+        numpy.testing.assert_array_equal(ts_h5.data.load(), samples)
+        numpy.testing.assert_array_equal(ts_h5.time.load(), numpy.arange(50) * 0.5)
+
+
+def test_background_writer_wait(tmph5factory):
+    path = tmph5factory()
+    writer = BackgroundBlockWriter(max_pending_blocks=2)
+    with TimeSeriesH5(path) as ts_h5:
+        ts_h5.store(TimeSeries(sample_period=0.5), scalars_only=True)
+        monitor_buffer = MonitorOutputBuffer(ts_h5, block_samples=4, writer=writer)
+        for i in range(20):
+            monitor_buffer.add(i * 0.5, numpy.zeros((2, 5, 1)))
+        monitor_buffer.flush()
+        writer.wait()
+        # all blocks are in the file, and the writer can still be used
+        assert ts_h5.read_data_shape()[0] == 20
+        monitor_buffer.add(10.0, numpy.zeros((2, 5, 1)))
+        monitor_buffer.flush()
+        writer.close()
+        assert ts_h5.read_data_shape()[0] == 21
+
+
+class _FailingH5(object):
+
+    def write_time_slice(self, partial_result):
+        raise IOError("disk full")
+
+
+def test_background_writer_error_is_raised():
+    writer = BackgroundBlockWriter(max_pending_blocks=1)
+    monitor_buffer = MonitorOutputBuffer(_FailingH5(), block_samples=1, writer=writer)
+    with pytest.raises(IOError):
+        for i in range(10):
+            monitor_buffer.add(i, numpy.zeros((1, 2, 1)))
+        writer.close()
+
+
+_SWMR_READER = "import sys, h5py; f = h5py.File(sys.argv[1], 'r', swmr=True); print(f['data'].shape[0]); f.close()"
+
+
+def test_live_results_readable_while_writing(tmph5factory):
+    path = tmph5factory()
+    samples = numpy.random.random((30, 2, 5, 1))
+    ts_h5 = TimeSeriesH5(path)
+    ts_h5.store(TimeSeries(sample_period=0.5), scalars_only=True)
+    monitor_buffer = MonitorOutputBuffer(ts_h5, block_samples=10, live=True)
+    for i in range(25):
+        monitor_buffer.add(i * 0.5, samples[i])
+    assert ts_h5.storage_manager.is_swmr_writing
+
+    # another process sees the blocks written so far
+    output = subprocess.check_output([sys.executable, '-c', _SWMR_READER, path])
+    assert int(output) == 20
+
+    for i in range(25, 30):
+        monitor_buffer.add(i * 0.5, samples[i])
+    monitor_buffer.flush()
+    ts_h5.close()
+    assert not ts_h5.storage_manager.is_swmr_writing
+
+    with TimeSeriesH5(path) as ts_h5:
+        numpy.testing.assert_array_equal(ts_h5.data.load(), samples)
+        assert ts_h5.data.get_cached_metadata().max == samples.max()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Tests for the periodic checkpoints of long simulations, and for resuming from them.
+"""
+
+import numpy
+from tvb.adapters.datatypes.h5.simulation_state_h5 import SimulationCheckpointH5
+from tvb.adapters.simulator.simulator_adapter import SimulatorAdapter
+from tvb.datatypes import equations, patterns
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator import coupling, integrators, models, monitors, noise
+from tvb.simulator.simulator import Simulator
+
+
+def _build_simulator(with_stimulus=False):
+    connectivity = Connectivity(weights=numpy.ones((4, 4)) - numpy.eye(4), tract_lengths=numpy.ones((4, 4)) * 10,
+                                region_labels=numpy.array(["a", "b", "c", "d"]), centres=numpy.zeros((4, 3)))
+    stochastic = integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.array([0.01]), noise_seed=42))
+    stimulus = None
+    if with_stimulus:
+        # a ramp, so that a stimulus restarting in the middle of the run changes the results
+        stimulus = patterns.StimuliRegion(temporal=equations.Linear(parameters={"a": 0.05, "b": 0.0}),
+                                          connectivity=connectivity, weight=numpy.array([1.0, 0.5, 0.0, 0.0]))
+    simulator = Simulator(connectivity=connectivity, model=models.Generic2dOscillator(), coupling=coupling.Linear(),
+                          integrator=stochastic, monitors=(monitors.TemporalAverage(period=1.0),), stimulus=stimulus)
+    simulator.configure()
+    return simulator
+
+
+def _build_adapter(simulator, storage_path, checkpoint_steps=None):
+    adapter = SimulatorAdapter()
+    adapter.algorithm = simulator
+    adapter.storage_path = storage_path
+    adapter.CHECKPOINT_INTERVAL_STEPS = checkpoint_steps
+    adapter.CHECKPOINT_INTERVAL_SECONDS = None
+    return adapter
+
+
+def _adapter_run(adapter, first_step, end_step, stop_at_step=None):
+    """
+    Run the simulation loop of the adapter, writing checkpoints when due.
+    :returns: the monitor samples, until `stop_at_step` when given (as if the operation was killed there)
+    """
+    samples = []
+    last_checkpoint_step = adapter.algorithm.current_step
+    for step, state, result in adapter._simulation_steps(first_step, end_step):
+        samples.append(result[0])
+        if stop_at_step is not None and step >= stop_at_step:
+            break
+        if step < end_step and adapter._is_checkpoint_due(step - last_checkpoint_step, None):
+            adapter._write_checkpoint(step, state, first_step, end_step, {}, {}, None)
+            last_checkpoint_step = step
+    return samples
+
+
+def _run_steps(simulator, steps):
+    # the same segment length as used by the SimulatorAdapter
+    return [result[0] for result in simulator(simulation_length=(steps - 0.5) * simulator.integrator.dt)
+            if result[0] is not None]
+
+
+def test_continue_from_checkpoint(tmph5factory):
+    full_run = _run_steps(_build_simulator(), 200)
+
+    simulator = _build_simulator()
+    first_part = _run_steps(simulator, 80)
+    assert simulator.current_step == 80
+
+    path = tmph5factory()
+    with SimulationCheckpointH5(path) as checkpoint_h5:
+        checkpoint_h5.store(simulator)
+        checkpoint_h5.store_progress(0, 200, {"TemporalAverage": ["abc", len(first_part)]})
+
+    restored = _build_simulator()
+    with SimulationCheckpointH5(path) as checkpoint_h5:
+        checkpoint_h5.load_into(restored)
+        assert checkpoint_h5.end_step.load() == 200
+        assert checkpoint_h5.monitor_time_series.load() == {"TemporalAverage": ["abc", 8]}
+    assert restored.current_step == 80
+    continued_run = first_part + _run_steps(restored, 120)
+
+    assert len(continued_run) == len(full_run) == 20
+    numpy.testing.assert_array_equal([sample[0] for sample in continued_run], [sample[0] for sample in full_run])
+    # the noise continues from the stored random state, so the results are identical
+    numpy.testing.assert_array_equal([sample[1] for sample in continued_run], [sample[1] for sample in full_run])
+
+
+def test_checkpoints_do_not_change_stimulated_run(tmpdir):
+    plain_run = _run_steps(_build_simulator(with_stimulus=True), 300)
+
+    simulator = _build_simulator(with_stimulus=True)
+    checkpointed_run = _adapter_run(_build_adapter(simulator, str(tmpdir), checkpoint_steps=70), 0, 300)
+    assert simulator.current_step == 300
+    assert len(checkpointed_run) == len(plain_run) == 30
+    numpy.testing.assert_array_equal([sample[1] for sample in checkpointed_run], [sample[1] for sample in plain_run])
+
+
+def test_resume_stimulated_run_from_checkpoint(tmpdir):
+    plain_run = _run_steps(_build_simulator(with_stimulus=True), 300)
+
+    # killed after the checkpoint at step 140, while computing further
+    adapter = _build_adapter(_build_simulator(with_stimulus=True), str(tmpdir), checkpoint_steps=140)
+    interrupted_run = _adapter_run(adapter, 0, 300, stop_at_step=200)
+
+    resumed = _build_adapter(_build_simulator(with_stimulus=True), str(tmpdir), checkpoint_steps=140)
+    first_step, end_step, _ = resumed._load_checkpoint()
+    assert (first_step, end_step, resumed.algorithm.current_step) == (0, 300, 140)
+    resumed_run = interrupted_run[:14] + _adapter_run(resumed, first_step, end_step)
+
+    assert len(resumed_run) == len(plain_run)
+    numpy.testing.assert_array_equal([sample[0] for sample in resumed_run], [sample[0] for sample in plain_run])
+    # the stimulus continues where it was at the checkpoint, instead of restarting
+    numpy.testing.assert_array_equal([sample[1] for sample in resumed_run], [sample[1] for sample in plain_run])
@@ -74,6 +74,7 @@ if "TEST_INITIALIZATION_DONE" not in globals():
 from tvb.adapters.exporters.export_manager import ExportManager
 from tvb.core.services.operation_service import OperationService
 from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.hdf5_path_index import H5_PATH_INDEX
 from tvb.core.entities.storage import dao
 from tvb.core.entities.storage.session_maker import SessionMaker
 from tvb.core.entities.model.model_project import *
@@ -121,6 +122,7 @@ class BaseTestCase(object):
         except Exception as excep:
             LOGGER.warning(excep)
             raise
+        H5_PATH_INDEX.clear()
 
         # Now if the database is clean we can delete also project folders on disk
         if delete_folders:
@@ -234,3 +234,16 @@ def test_store_load_local_connectivity(tmph5factory, surface_factory):
         lc = LocalConnectivity()
         f.load_into(lc)
         assert type(lc.equation) == tvb.datatypes.equations.Gaussian
+
+
+@pytest.mark.parametrize("sparse_format", ["csr", "csc"])
+def test_local_connectivity_row_reads(tmph5factory, sparse_format):
+    matrix = scipy.sparse.random(8, 8, density=0.4, format=sparse_format, random_state=42)
+    dense = matrix.toarray()
+
+    with LocalConnectivityH5(tmph5factory()) as f:
+        f.matrix.store(matrix)
+        for vertex in range(8):
+            numpy.testing.assert_array_equal(f.get_vertex_row(vertex), dense[vertex])
+        numpy.testing.assert_array_equal(f.matrix.load_rows(2, 6).toarray(), dense[2:6])
+        assert f.matrix.load_rows(8, 10).shape == (0, 8)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+import os
+import pytest
+from tvb.simulator.integrators import HeunStochastic
+from tvb.simulator.monitors import Bold
+from tvb.simulator.noise import Multiplicative
+from tvb.core.entities.file.simulator.configurations_h5 import SimulatorConfigurationH5
+
+
+@pytest.mark.parametrize("store_in_groups", [True, False])
+def test_store_load_config_references(tmpdir, monkeypatch, store_in_groups):
+    # nested configurations are written by other SimulatorConfigurationH5 instances
+    monkeypatch.setattr(SimulatorConfigurationH5, "store_in_groups", store_in_groups)
+    path = os.path.join(str(tmpdir), "SimulatorConfiguration.h5")
+    integrator = HeunStochastic(dt=0.05, noise=Multiplicative())
+    monitor = Bold(period=500.0)
+
+    with SimulatorConfigurationH5(path) as f:
+        integrator_gid = f.store_config_as_reference(integrator)
+        monitor_gid = f.store_config_as_reference(monitor)
+
+    # integrator, noise, noise equation, monitor, hrf kernel
+    expected_files = 1 if store_in_groups else 6
+    assert len(os.listdir(str(tmpdir))) == expected_files
+
+    with SimulatorConfigurationH5(path) as f:
+        integrator2 = f.load_from_reference(integrator_gid)
+        monitor2 = f.load_from_reference(monitor_gid)
+
+    assert isinstance(integrator2, HeunStochastic)
+    assert integrator2.dt == 0.05
+    assert isinstance(integrator2.noise, Multiplicative)
+    assert type(integrator2.noise.b) is type(integrator.noise.b)
+    assert isinstance(monitor2, Bold)
+    assert monitor2.period == 500.0
+    assert type(monitor2.hrf_kernel) is type(monitor.hrf_kernel)
@@ -28,8 +28,11 @@
 #
 #
 
+import os
 import numpy
 from tvb.adapters.datatypes.h5.time_series_h5 import TimeSeriesH5
+from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file.hdf5_node_major import NODE_MAJOR_SUFFIX
 from tvb.datatypes.time_series import TimeSeries
 
 
@@ -92,3 +95,229 @@ def test_streaming_reads(tmph5factory):
         expected = numpy.zeros((33, nsv))
         expected[:, 1] = 1.0   # the cos(0) part
         numpy.testing.assert_array_equal(data, expected)
+
+
+def _expected_page(data, from_idx, to_idx, step, reduce):
+    page = data[from_idx:to_idx, 0, :]
+    return numpy.array([reduce(page[idx:idx + step], axis=0) for idx in range(0, len(page), step)])
+
+
+def test_pyramid_pages_of_streamed_data(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 330, 2000))
+
+    # appended in two sessions, so that the partial bins written at the first close have to be rebuilt
+    for start, stop in ((0, 1100), (1100, 2000)):
+        with TimeSeriesH5(path) as f:
+            f.store(t, scalars_only=True)
+            for idx in range(start, stop, 37):
+                f.write_data_slice(data[idx:min(idx + 37, stop)])
+
+    with TimeSeriesH5(path) as f:
+        assert f.storage_manager.get_data_shape(f.data_pyramid.level_name('min', 3)) == (4, nsv, nspace)
+        for step in (8, 64, 512):
+            numpy.testing.assert_allclose(f.read_data_page(0, 2000, step, aggregation='mean'),
+                                          _expected_page(data, 0, 2000, step, numpy.mean))
+            numpy.testing.assert_allclose(f.read_data_page(64, 1600, step, aggregation='min'),
+                                          _expected_page(data, 64, 1600, step, numpy.min))
+            numpy.testing.assert_allclose(f.read_data_page(512, 3000, step, aggregation='max'),
+                                          _expected_page(data, 512, 2000, step, numpy.max))
+        # small steps, and pages without aggregation, still sample the data
+        numpy.testing.assert_array_equal(f.read_data_page(0, 2000, 4, aggregation='mean'), data[0:2000:4, 0, :])
+        numpy.testing.assert_array_equal(f.read_data_page(0, 2000, 64), data[0:2000:64, 0, :])
+
+
+def test_pyramid_built_on_store(tmph5factory):
+    t = make_harmonic_ts()
+    t.data = harmonic_chunk(numpy.linspace(0, 330, 1000))
+    path = tmph5factory()
+
+    with TimeSeriesH5(path) as f:
+        f.store(t)
+
+    with TimeSeriesH5(path) as f:
+        numpy.testing.assert_allclose(f.read_data_page(0, 1000, 16, aggregation='max'),
+                                      _expected_page(t.data, 0, 1000, 16, numpy.max))
+
+
+def test_no_pyramid_for_short_series(tmph5factory):
+    t = make_harmonic_ts()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime))
+    path = tmph5factory()
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        for idx in range(0, ntime, 50):
+            f.write_data_slice(data[idx:idx + 50])
+
+    with TimeSeriesH5(path) as f:
+        assert f.storage_manager.get_data_shape('data') == data.shape
+        assert not f.data_pyramid._exists(f.data_pyramid.level_name('min', 1))
+        numpy.testing.assert_array_equal(f.read_data_page(0, ntime, 16, aggregation='max'), data[::16, 0, :])
+
+    # the levels are built once the series gets long enough
+    with TimeSeriesH5(path) as f:
+        f.write_data_slice(numpy.concatenate([data] * 4))
+    with TimeSeriesH5(path) as f:
+        numpy.testing.assert_allclose(f.read_data_page(0, 5 * ntime, 16, aggregation='max'),
+                                      _expected_page(numpy.concatenate([data] * 5), 0, 5 * ntime, 16, numpy.max))
+
+
+def test_truncate(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 330, 2000))
+    times = numpy.arange(2000) * 0.5
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        f.write_data_slice(data[:1500])
+        f.write_time_slice(times[:1500])
+    with TimeSeriesH5(path) as f:
+        # e.g. the samples written after the last checkpoint of a simulation
+        f.truncate(1000)
+        assert f.read_data_shape()[0] == 1000
+        f.write_data_slice(data[1000:])
+        f.write_time_slice(times[1000:])
+
+    with TimeSeriesH5(path) as f:
+        numpy.testing.assert_array_equal(f.data.load(), data)
+        numpy.testing.assert_array_equal(f.time.load(), times)
+        numpy.testing.assert_allclose(f.read_data_page(0, 2000, 64, aggregation='mean'),
+                                      _expected_page(data, 0, 2000, 64, numpy.mean))
+        # the statistics describe the data kept and the data appended afterwards
+        meta = f.data.get_cached_metadata()
+        assert meta.count == data.size
+        numpy.testing.assert_allclose([meta.min, meta.max, meta.mean], [data.min(), data.max(), data.mean()])
+        numpy.testing.assert_allclose(meta.variance, data.var())
+
+
+def test_node_slices_read_from_node_major_copy(tmph5factory, monkeypatch):
+    t = make_harmonic_ts()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime))[..., numpy.newaxis]
+    path = tmph5factory()
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        f.write_data_slice(data)
+
+    monkeypatch.setattr(TvbProfile.current, 'HDF5_NODE_MAJOR_MIN_BYTES', 0, raising=False)
+    with TimeSeriesH5(path) as f:
+        f.finalize().result()
+    assert os.path.exists(path + NODE_MAJOR_SUFFIX)
+
+    with TimeSeriesH5(path) as f:
+        node_slice = (slice(None), slice(None), slice(2, 3), slice(None))
+        numpy.testing.assert_array_equal(f.read_data_slice(node_slice), data[node_slice])
+        assert f._node_major_ready
+        # not a single node, read from the data
+        f.read_data_slice((slice(None), slice(None), slice(0, 2), slice(None)))
+
+    # the copy is not used anymore once the data is rewritten with the same shape
+    with TimeSeriesH5(path) as f:
+        f.data.store(data * 2)
+    with TimeSeriesH5(path) as f:
+        numpy.testing.assert_array_equal(f.read_data_slice(node_slice), data[node_slice] * 2)
+        assert not f._node_major_ready
+
+    # nor once the data grows
+    with TimeSeriesH5(path) as f:
+        f.finalize().result()
+        f.write_data_slice(data[:10])
+    with TimeSeriesH5(path) as f:
+        assert f.read_data_slice(node_slice).shape[0] == ntime + 10
+        assert not f._node_major_ready
+
+
+def test_regular_time_generated(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime))
+    # e.g. a monitor sampling every period, from the first period on
+    times = 0.5 + numpy.arange(ntime) * 0.5
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        for idx in range(0, ntime, 7):
+            f.write_time_slice(times[idx:idx + 7])
+            f.write_data_slice(data[idx:idx + 7])
+
+    with TimeSeriesH5(path) as f:
+        assert not f.time._stored_explicitly()
+        numpy.testing.assert_allclose(f.time.load(), times)
+        numpy.testing.assert_allclose(f.time[10:20], times[10:20])
+        assert f.time.shape == (ntime,)
+        numpy.testing.assert_allclose(f.read_time_page(1, 10), numpy.arange(5, 10, 0.5))
+
+        loaded = TimeSeries()
+        f.load_into(loaded)
+        numpy.testing.assert_allclose(loaded.time, times)
+
+
+def test_lazy_load_regular_time(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime))
+    times = numpy.arange(ntime) * 0.5
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        f.write_time_slice(times)
+        f.write_data_slice(data)
+
+    loaded = TimeSeries()
+    with TimeSeriesH5(path) as f:
+        f.lazy_datasets = True
+        f.load_into(loaded)
+
+    assert loaded.time.shape == (ntime,)
+    numpy.testing.assert_allclose(loaded.time[10:20], times[10:20])
+    numpy.testing.assert_allclose(numpy.asarray(loaded.time), times)
+    numpy.testing.assert_allclose(loaded.data[:, 0, 1], data[:, 0, 1])
+
+
+def test_lazy_load_keeps_stored_dtype(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime)).astype(numpy.float32)
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        f.write_time_slice(numpy.arange(ntime) * 0.5)
+        f.write_data_slice(data)
+
+    loaded = TimeSeries()
+    with TimeSeriesH5(path) as f:
+        f.lazy_datasets = True
+        f.load_into(loaded)
+
+    assert loaded.data.dtype == numpy.float32
+    assert loaded.data[:10].dtype == numpy.float32
+    assert numpy.asarray(loaded.data).dtype == numpy.float32
+    assert loaded.time.dtype == numpy.float64
+
+
+def test_irregular_time_stored(tmph5factory):
+    t = make_harmonic_ts()
+    path = tmph5factory()
+    data = harmonic_chunk(numpy.linspace(0, 33, ntime))
+    times = numpy.arange(ntime) * 0.5
+    times[100:] += 0.1
+
+    with TimeSeriesH5(path) as f:
+        f.store(t, scalars_only=True)
+        for idx in range(0, ntime, 50):
+            f.write_time_slice(times[idx:idx + 50])
+            f.write_data_slice(data[idx:idx + 50])
+
+    with TimeSeriesH5(path) as f:
+        assert f.time._stored_explicitly()
+        numpy.testing.assert_array_equal(f.time.load(), times)
+
+    t.data = data
+    t.time = times
+    path = tmph5factory()
+    with TimeSeriesH5(path) as f:
+        f.store(t)
+    with TimeSeriesH5(path) as f:
+        numpy.testing.assert_array_equal(f.time.load(), times)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for upgrading H5 files on a process pool.
+"""
+
+import os
+import numpy
+from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file import files_update_manager
+from tvb.core.entities.file.files_update_manager import FilesUpdateManager
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+
+
+class TestFilesUpdateManager(object):
+    """
+    Tests for the parts of the H5 files upgrade which do not need the DB.
+    """
+
+    def setup_method(self):
+        self.manager = FilesUpdateManager()
+        self.manager.CHECKPOINT_FILE = "files_update_checkpoint_test.json"
+
+    def teardown_method(self):
+        if os.path.exists(self.manager._checkpoint_path()):
+            os.remove(self.manager._checkpoint_path())
+
+    @staticmethod
+    def _write_file(path, data_version):
+        folder, file_name = os.path.split(path)
+        HDF5StorageManager(folder, file_name).store_data("data", numpy.arange(10))
+        attr_name = HDF5StorageManager.TVB_ATTRIBUTE_PREFIX + TvbProfile.current.version.DATA_VERSION_ATTRIBUTE
+        HDF5StorageManager(folder, file_name).set_metadata({attr_name: data_version}, tvb_specific_metadata=False)
+
+    def test_checkpoint_only_resumes_same_upgrade(self):
+        version = TvbProfile.current.version
+        checkpoint = dict(from_version=version.DATA_CHECKED_TO_VERSION, to_version=version.DATA_VERSION,
+                          next_index=1500, no_ok=1400, no_error=0, no_ignored=100)
+        self.manager._write_checkpoint(checkpoint)
+        assert self.manager._read_checkpoint() == checkpoint
+
+        checkpoint['to_version'] = version.DATA_VERSION + 1
+        self.manager._write_checkpoint(checkpoint)
+        assert self.manager._read_checkpoint() is None
+
+    def test_outdated_files_checked_in_pool(self, tmph5factory):
+        old_path = tmph5factory("old.h5")
+        self._write_file(old_path, TvbProfile.current.version.DATA_VERSION - 1)
+        current_path = tmph5factory("current.h5")
+        self._write_file(current_path, TvbProfile.current.version.DATA_VERSION)
+        missing_path = tmph5factory("missing.h5")
+
+        with self.manager._new_executor(2) as executor:
+            results = list(executor.map(files_update_manager._check_file_task,
+                                        [old_path, current_path, missing_path]))
+        assert [outdated for outdated, _ in results] == [True, False, False]
+        assert results[0][1] == os.path.getsize(old_path)
+
+    def test_database_scripts_not_run_in_pool(self, tmph5factory):
+        # script 004 stores DataTypes in the DB
+        paths = []
+        for data_version in (3, 4, TvbProfile.current.version.DATA_VERSION):
+            paths.append(tmph5factory("version_%d.h5" % data_version))
+            self._write_file(paths[-1], data_version)
+        assert [self.manager._updates_database(path) for path in paths] == [True, False, False]
+        assert not self.manager._updates_database(tmph5factory("missing.h5"))
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the pool of long-lived HDF5 file handles.
+"""
+
+import os
+import threading
+import numpy
+import pytest
+from tvb.core.entities.file.hdf5_file_pool import HDF5FilePool
+
+
+class TestHDF5FilePool(object):
+    """
+    Tests for the pool of open h5py file handles.
+    """
+
+    def setup_method(self):
+        self.pool = HDF5FilePool(max_size=2, idle_timeout=60)
+
+    def teardown_method(self):
+        self.pool.close_all()
+
+    def test_read_handles_are_shared(self, tmph5factory):
+        path = tmph5factory()
+        h5_file = self.pool.acquire(path, 'a')
+        h5_file.create_dataset('data', data=numpy.arange(10))
+        self.pool.release(path, h5_file)
+
+        first = self.pool.acquire(path, 'r')
+        second = self.pool.acquire(path, 'r')
+        assert first is second is h5_file
+        numpy.testing.assert_array_equal(second['data'][()], numpy.arange(10))
+        self.pool.release(path, first)
+        self.pool.release(path, second)
+
+        stats = self.pool.get_statistics()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 2
+        assert stats['in_use'] == 0
+
+    def test_upgrade_to_write_mode(self, tmph5factory):
+        path = tmph5factory()
+        self.pool.release(path, self.pool.acquire(path, 'a'))
+        self.pool.close(path)
+
+        reader = self.pool.acquire(path, 'r')
+        assert reader.mode == 'r'
+        self.pool.release(path, reader)
+
+        writer = self.pool.acquire(path, 'a')
+        assert writer.mode == 'r+'
+        assert not reader.id.valid
+        writer.attrs['key'] = 'value'
+        self.pool.release(path, writer)
+
+    def test_writer_waits_for_open_reader(self, tmph5factory):
+        path = tmph5factory()
+        h5_file = self.pool.acquire(path, 'a')
+        h5_file.create_dataset('data', data=numpy.arange(10))
+        self.pool.release(path, h5_file)
+        self.pool.close(path)
+
+        reader = self.pool.acquire(path, 'r')
+        written = threading.Event()
+
+        def write():
+            writer = self.pool.acquire(path, 'a')
+            writer.attrs['key'] = 'value'
+            self.pool.release(path, writer)
+            written.set()
+
+        writer_thread = threading.Thread(target=write)
+        writer_thread.start()
+        assert not written.wait(0.5)
+        # The reader keeps a valid handle while the writer waits
+        assert reader.id.valid
+        numpy.testing.assert_array_equal(reader['data'][()], numpy.arange(10))
+        self.pool.release(path, reader)
+
+        writer_thread.join(10)
+        assert written.is_set()
+        h5_file = self.pool.acquire(path, 'r')
+        assert h5_file.attrs['key'] == 'value'
+        self.pool.release(path, h5_file)
+
+    def test_upgrade_while_reading_in_same_thread(self, tmph5factory):
+        path = tmph5factory()
+        self.pool.release(path, self.pool.acquire(path, 'a'))
+        self.pool.close(path)
+
+        reader = self.pool.acquire(path, 'r')
+        with pytest.raises(IOError):
+            self.pool.acquire(path, 'a')
+        assert reader.id.valid
+        self.pool.release(path, reader)
+
+    def test_lru_eviction(self, tmph5factory):
+        paths = [tmph5factory('file_%d.h5' % i) for i in range(3)]
+        for path in paths:
+            self.pool.release(path, self.pool.acquire(path, 'a'))
+
+        stats = self.pool.get_statistics()
+        assert stats['open'] == 2
+        assert stats['evictions'] == 1
+
+    def test_idle_eviction(self, tmph5factory):
+        self.pool.idle_timeout = 0
+        path = tmph5factory()
+        h5_file = self.pool.acquire(path, 'a')
+        self.pool.release(path, h5_file)
+        assert not h5_file.id.valid
+        assert self.pool.get_statistics()['open'] == 0
+
+    def test_changed_file_is_reopened(self, tmph5factory):
+        path = tmph5factory()
+        self.pool.release(path, self.pool.acquire(path, 'a'))
+        self.pool.close_all()
+        reader = self.pool.acquire(path, 'r')
+        self.pool.release(path, reader)
+
+        os.remove(path)
+        writer = self.pool.acquire(path, 'a')
+        assert writer is not reader
+        self.pool.release(path, writer)
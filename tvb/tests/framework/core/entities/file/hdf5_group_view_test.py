@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the virtual dataset view over the time series of an operation group.
+"""
+
+import os
+import json
+import numpy
+from tvb.adapters.datatypes.db.time_series import TimeSeriesIndex
+from tvb.adapters.datatypes.h5.time_series_h5 import TimeSeriesH5
+from tvb.core.entities.file.hdf5_group_view import DataTypeGroupView, refresh_group_view
+from tvb.core.entities.model.model_datatype import DataTypeGroup
+from tvb.core.entities.model.model_operation import Operation, OperationGroup, STATUS_FINISHED, STATUS_STARTED
+from tvb.core.entities.storage import dao
+from tvb.core.neocom import h5
+from tvb.datatypes.time_series import TimeSeries
+from tvb.tests.framework.core.base_testcase import TransactionalTestCase
+
+
+class TestDataTypeGroupView(TransactionalTestCase):
+    """
+    Virtual view stacking the time series of a PSE group.
+    """
+    SPEEDS = [2.0, 1.0]
+    COUPLINGS = [0.1, 0.2, 0.3]
+
+    def _build_group(self, operation_factory):
+        operation = operation_factory()
+        operation_group = dao.store_entity(OperationGroup(operation.fk_launched_in, ranges=["speed", "coupling"]))
+        operations = []
+        for speed in self.SPEEDS:
+            for coupling in self.COUPLINGS:
+                operations.append(Operation(operation.fk_launched_by, operation.fk_launched_in,
+                                            operation.fk_from_algo, "test params", meta=operation.meta_data,
+                                            status=STATUS_FINISHED, op_group_id=operation_group.id,
+                                            range_values=json.dumps({"speed": speed, "coupling": coupling})))
+        operations = dao.store_entities(operations)
+        datatype_group = dao.store_entity(DataTypeGroup(operation_group, operation_id=operations[0].id))
+        return datatype_group, operations
+
+    @staticmethod
+    def _store_time_series(datatype_group, operation, value, length=10):
+        data = numpy.full((length, 1, 3, 1), value)
+        data[:, 0, 1, 0] += numpy.arange(length)
+        time_series = TimeSeries(data=data, sample_period=1.0)
+        ts_index = TimeSeriesIndex()
+        ts_index.fk_from_operation = operation.id
+        ts_index.fk_datatype_group = datatype_group.id
+        ts_index.fill_from_has_traits(time_series)
+        with TimeSeriesH5(h5.path_for_stored_index(ts_index)) as ts_h5:
+            ts_h5.store(time_series)
+        return dao.store_entity(ts_index)
+
+    def test_view_stacks_group_members(self, operation_factory):
+        datatype_group, operations = self._build_group(operation_factory)
+        # speeds are sorted, so the first operations (speed 2.0) go on the second row
+        for idx, operation in enumerate(operations[:-1]):
+            self._store_time_series(datatype_group, operation, idx, length=8 if idx == 0 else 10)
+
+        view = DataTypeGroupView.for_group_id(datatype_group.id)
+        assert view.refresh() == [TimeSeriesIndex.__name__]
+        assert not view.path.endswith(".h5")
+        assert os.path.dirname(view.path) == os.path.dirname(h5.path_for_stored_index(
+            dao.get_datatypes_from_datatype_group(datatype_group.id)[0]))
+
+        assert view.ranges == [("speed", [1.0, 2.0]), ("coupling", self.COUPLINGS)]
+        assert view.get_shape() == (2, 3, 10, 1, 3, 1)
+
+        point = view.read((1, 2))
+        assert point.shape == (10, 1, 3, 1)
+        assert numpy.all(point[:, 0, 0, 0] == 2)
+        # shorter time series and missing members are padded
+        assert numpy.all(view.read((1, 0, slice(0, 8), 0, 0, 0)) == 0)
+        assert numpy.isnan(view.read((1, 0, slice(8, 10)))).all()
+
+        node = view.read((slice(None), slice(None), slice(None), 0, 1, 0))
+        assert node.shape == (2, 3, 10)
+        numpy.testing.assert_array_equal(node[1, 1], 1 + numpy.arange(10))
+        numpy.testing.assert_array_equal(node[0, 1], 4 + numpy.arange(10))
+        assert numpy.isnan(node[0, 2]).all()
+
+    def test_view_refreshed_when_members_finish(self, operation_factory):
+        datatype_group, operations = self._build_group(operation_factory)
+        self._store_time_series(datatype_group, operations[0], 1)
+        view = DataTypeGroupView.for_group_id(datatype_group.id)
+        view.refresh()
+        assert numpy.all(view.read((1, 0, slice(None), 0, 0, 0)) == 1)
+        assert numpy.isnan(view.read((0, 0))).all()
+
+        self._store_time_series(datatype_group, operations[3], 7)
+        view = DataTypeGroupView.for_group_id(datatype_group.id)
+        assert not view.is_up_to_date()
+        assert numpy.all(view.read((0, 0, slice(None), 0, 0, 0)) == 7)
+        assert view.is_up_to_date()
+
+    def test_view_built_when_group_completes(self, operation_factory):
+        datatype_group, operations = self._build_group(operation_factory)
+        for operation in operations:
+            operation.status = STATUS_STARTED
+        operations = dao.store_entities(operations)
+        view = DataTypeGroupView.for_group_id(datatype_group.id)
+
+        self._store_time_series(datatype_group, operations[0], 1)
+        refresh_group_view(datatype_group.id, operations[0].id)
+        assert not os.path.exists(view.path)
+
+        for operation in operations[:-1]:
+            operation.status = STATUS_FINISHED
+        dao.store_entities(operations[:-1])
+        self._store_time_series(datatype_group, operations[-1], 2)
+        # the last operation is still marked as running while its results are stored
+        refresh_group_view(datatype_group.id, operations[-1].id)
+        assert os.path.exists(view.path)
+        assert view.is_up_to_date()
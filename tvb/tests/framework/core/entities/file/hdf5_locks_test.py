@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Tests for the shared-read / exclusive-write locks on H5 files.
+"""
+
+import os
+import sys
+import time
+import threading
+import subprocess
+import numpy
+import pytest
+from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file.files_helper import FilesHelper
+from tvb.core.entities.file.hdf5_locks import HDF5FileLocks, H5_FILE_LOCKS, LOCKS_FOLDER, fcntl
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+
+PATH = "/some/file.h5"
+
+
+def _in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+class TestHDF5FileLocks(object):
+    """
+    Tests for the shared-read / exclusive-write locks on H5 files.
+    """
+
+    def setup_method(self):
+        self.locks = HDF5FileLocks(lock_folder=None)
+        # no lock file: only the threads of this process are synchronized
+        self.locks._process_lock = lambda path: None
+
+    def test_readers_share_the_file(self):
+        token = self.locks.acquire(PATH, write=False)
+        acquired = threading.Event()
+
+        def read():
+            other = self.locks.acquire(PATH, write=False)
+            acquired.set()
+            self.locks.release(other)
+
+        _in_thread(read).join(5)
+        assert acquired.is_set()
+        self.locks.release(token)
+        assert len(self.locks) == 0
+
+    def test_writer_excludes_readers(self):
+        token = self.locks.acquire(PATH, write=True)
+        acquired = threading.Event()
+
+        def read():
+            other = self.locks.acquire(PATH, write=False)
+            acquired.set()
+            self.locks.release(other)
+
+        reader = _in_thread(read)
+        assert not acquired.wait(0.2)
+        self.locks.release(token)
+        reader.join(5)
+        assert acquired.is_set()
+        assert len(self.locks) == 0
+
+    def test_waiting_writer_goes_before_new_readers(self):
+        token = self.locks.acquire(PATH, write=False)
+        order = []
+
+        def write():
+            other = self.locks.acquire(PATH, write=True)
+            order.append("write")
+            self.locks.release(other)
+
+        def read():
+            other = self.locks.acquire(PATH, write=False)
+            order.append("read")
+            self.locks.release(other)
+
+        writer = _in_thread(write)
+        time.sleep(0.1)
+        reader = _in_thread(read)
+        time.sleep(0.1)
+        # the thread already reading is not blocked by the waiting writer
+        self.locks.release(self.locks.acquire(PATH, write=False))
+        assert order == []
+
+        self.locks.release(token)
+        writer.join(5)
+        reader.join(5)
+        assert order == ["write", "read"]
+
+    def test_nested_in_the_same_thread(self):
+        read_token = self.locks.acquire(PATH, write=False)
+        write_token = self.locks.acquire(PATH, write=True)
+        nested_read = self.locks.acquire(PATH, write=False)
+        for token in (nested_read, write_token, read_token):
+            self.locks.release(token)
+        assert len(self.locks) == 0
+
+    def test_concurrent_upgrades_do_not_deadlock(self):
+        reading = threading.Event()
+        written = threading.Event()
+
+        def read_then_write():
+            read_token = self.locks.acquire(PATH, write=False)
+            reading.set()
+            write_token = self.locks.acquire(PATH, write=True)
+            written.set()
+            self.locks.release(write_token)
+            self.locks.release(read_token)
+
+        token = self.locks.acquire(PATH, write=False)
+        upgrader = _in_thread(read_then_write)
+        assert reading.wait(5)
+        # the upgrade waits for this thread to stop reading
+        assert not written.wait(0.2)
+        # while this thread can not upgrade as well
+        with pytest.raises(IOError):
+            self.locks.acquire(PATH, write=True)
+
+        self.locks.release(token)
+        upgrader.join(5)
+        assert written.is_set()
+        assert len(self.locks) == 0
+
+    def test_release_from_another_thread(self):
+        token = self.locks.acquire(PATH, write=True)
+        _in_thread(lambda: self.locks.release(token)).join(5)
+        self.locks.release(self.locks.acquire(PATH, write=True))
+        assert len(self.locks) == 0
+
+
+_OTHER_PROCESS_WRITER = """
+import sys, time
+from tvb.core.entities.file.hdf5_locks import HDF5FileLocks
+locks = HDF5FileLocks(lock_folder=sys.argv[1])
+token = locks.acquire(sys.argv[2], write=True)
+print("locked")
+sys.stdout.flush()
+time.sleep(1)
+locks.release(token)
+"""
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_writer_in_another_process(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir))
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    process = subprocess.Popen([sys.executable, "-c", _OTHER_PROCESS_WRITER, str(tmpdir), PATH],
+                               stdout=subprocess.PIPE, universal_newlines=True, env=env)
+    try:
+        assert process.stdout.readline().strip() == "locked"
+        start = time.time()
+        token = locks.acquire(PATH, write=False)
+        assert time.time() - start > 0.5
+        locks.release(token)
+    finally:
+        process.wait()
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_release_tells_when_writing_stopped(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir))
+    write_token = locks.acquire(PATH, write=True)
+    nested_token = locks.acquire(PATH, write=True)
+    assert not locks.release(nested_token)
+    assert locks.release(write_token)
+    assert not locks.release(locks.acquire(PATH, write=False))
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_each_file_has_its_own_lock_file(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir))
+    other_path = "/some/other_file.h5"
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    process = subprocess.Popen([sys.executable, "-c", _OTHER_PROCESS_WRITER, str(tmpdir), PATH],
+                               stdout=subprocess.PIPE, universal_newlines=True, env=env)
+    try:
+        assert process.stdout.readline().strip() == "locked"
+        start = time.time()
+        token = locks.acquire(other_path, write=True)
+        assert time.time() - start < 0.5
+        locks.release(token)
+    finally:
+        process.wait()
+    assert os.path.exists(os.path.join(str(tmpdir), "some", "file.h5.lock"))
+    assert os.path.exists(os.path.join(str(tmpdir), "some", "other_file.h5.lock"))
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_removing_deletes_the_lock_file(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir.join("LOCKS")))
+    path = str(tmpdir.join("data", "file.h5"))
+    lock_path = os.path.join(str(tmpdir.join("LOCKS")), os.path.realpath(path).lstrip(os.sep)) + ".lock"
+    locks.release(locks.acquire(path, write=True))
+    assert os.path.exists(lock_path)
+
+    # kept when the removal fails
+    with pytest.raises(OSError):
+        with locks.removing(path):
+            os.remove(path)
+    assert os.path.exists(lock_path)
+
+    with locks.removing(path):
+        pass
+    assert not os.path.exists(lock_path)
+    assert len(locks) == 0
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_removing_folder_deletes_its_lock_files(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir.join("LOCKS")))
+    folder = str(tmpdir.join("project"))
+    inside = [os.path.join(folder, "1", "a.h5"), os.path.join(folder, "2", "b.h5")]
+    outside = str(tmpdir.join("other_project", "c.h5"))
+    for path in inside + [outside]:
+        locks.release(locks.acquire(path, write=True))
+
+    with locks.removing_folder(folder):
+        pass
+    mirror = os.path.join(str(tmpdir.join("LOCKS")), os.path.realpath(folder).lstrip(os.sep))
+    assert not os.path.exists(mirror)
+    assert os.path.exists(os.path.join(str(tmpdir.join("LOCKS")), os.path.realpath(outside).lstrip(os.sep)) + ".lock")
+
+
+_OTHER_PROCESS_REMOVER = """
+import sys, time
+from tvb.core.entities.file.hdf5_locks import HDF5FileLocks
+locks = HDF5FileLocks(lock_folder=sys.argv[1])
+with locks.removing(sys.argv[2]):
+    print("locked")
+    sys.stdout.flush()
+    time.sleep(1)
+"""
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+def test_waiter_locks_the_new_file_after_removal(tmpdir):
+    locks = HDF5FileLocks(lock_folder=str(tmpdir))
+    lock_path = os.path.join(str(tmpdir), PATH.lstrip(os.sep)) + ".lock"
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    process = subprocess.Popen([sys.executable, "-c", _OTHER_PROCESS_REMOVER, str(tmpdir), PATH],
+                               stdout=subprocess.PIPE, universal_newlines=True, env=env)
+    try:
+        assert process.stdout.readline().strip() == "locked"
+        token = locks.acquire(PATH, write=True)
+        # the lock was granted on the removed file, and moved to a new one which the other processes see
+        assert os.path.samestat(os.stat(lock_path), os.fstat(token.file_lock.process_lock.lock_fd))
+        locks.release(token)
+    finally:
+        process.wait()
+
+
+def test_files_helper_removes_lock_files(tmpdir):
+    helper = FilesHelper()
+    locks_folder = os.path.join(TvbProfile.current.TVB_STORAGE, LOCKS_FOLDER)
+    project_folder = helper.get_project_folder("lock_files_project")
+    operation_folder = helper.get_operation_folder("lock_files_project", 1)
+    paths = [os.path.join(operation_folder, name) for name in ("a.h5", "b.h5")]
+    for path in paths:
+        HDF5StorageManager(operation_folder, os.path.basename(path)).store_data('data', numpy.arange(3))
+    if H5_FILE_LOCKS._locks_folder() is None:
+        pytest.skip("no lock files on this platform")
+
+    def lock_file(path):
+        return os.path.join(locks_folder, os.path.realpath(path).lstrip(os.sep)) + ".lock"
+
+    assert os.path.exists(lock_file(paths[0]))
+    helper.remove_datatype_file(paths[0])
+    assert not os.path.exists(lock_file(paths[0]))
+    assert os.path.exists(lock_file(paths[1]))
+
+    helper.remove_project_structure("lock_files_project")
+    assert not os.path.exists(os.path.join(locks_folder, os.path.realpath(project_folder).lstrip(os.sep)))
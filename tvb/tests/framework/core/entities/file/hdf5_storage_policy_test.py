@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the role based chunking and compression of HDF5 datasets.
+"""
+
+import os
+import numpy
+import pytest
+import h5py
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+from tvb.core.entities.file.hdf5_storage_policy import StoragePolicy, ROLE_TIME_SERIES, ROLE_DENSE_MATRIX
+from tvb.core.entities.file.hdf5_storage_policy import ROLE_SURFACE_GEOMETRY, results_dtype, cast_to_precision
+
+
+class TestStoragePolicy(object):
+    """
+    Tests for the chunking and compression choices of the storage policy.
+    """
+
+    def test_default_keeps_h5py_defaults(self):
+        policy = StoragePolicy()
+        assert policy.dataset_options(None, (10, 10), numpy.float64) == {}
+        assert policy.dataset_options(ROLE_DENSE_MATRIX, (10, 10), numpy.float64) == {}
+        assert policy.dataset_options(None, (1, 2, 5, 1), numpy.float64, grow_dimension=0) == {}
+
+    def test_time_series_chunks(self):
+        policy = StoragePolicy(chunk_bytes=8 * 64 * 100, space_chunk=64)
+        options = policy.dataset_options(ROLE_TIME_SERIES, (1, 1, 1000, 1), numpy.float64, grow_dimension=0)
+        assert options['chunks'] == (100, 1, 64, 1)
+        options = policy.dataset_options(ROLE_TIME_SERIES, (30, 1, 1000, 1), numpy.float64, grow_dimension=2)
+        assert options['chunks'] == (30, 1, 64, 1)
+
+    def test_compression(self):
+        policy = StoragePolicy(compression='gzip', compression_level=6, shuffle=True, chunk_bytes=8 * 100)
+        options = policy.dataset_options(ROLE_SURFACE_GEOMETRY, (1000, 3), numpy.float64)
+        assert options == {'compression': 'gzip', 'compression_opts': 6, 'shuffle': True, 'chunks': (33, 3)}
+        options = policy.dataset_options(None, (10,), numpy.float64)
+        assert options['chunks'] is True
+        # strings are never compressed
+        assert policy.dataset_options(None, (10,), numpy.dtype('S10')) == {}
+
+    def test_storage_manager_applies_policy(self, tmpdir):
+        policy = StoragePolicy(compression='lzf', chunk_bytes=8 * 100)
+        manager = HDF5StorageManager(str(tmpdir), "policy.h5", storage_policy=policy)
+        data = numpy.random.random((50, 50))
+        manager.store_data("weights", data, role=ROLE_DENSE_MATRIX)
+        numpy.testing.assert_array_equal(manager.get_data("weights"), data)
+        manager.close_file()
+
+        full_path = os.path.join(str(tmpdir), "policy.h5")
+        H5_FILE_POOL.close(full_path)
+        with h5py.File(full_path, 'r') as h5_file:
+            assert h5_file["weights"].compression == 'lzf'
+            assert h5_file["weights"].chunks == (10, 10)
+
+    def test_results_precision(self):
+        assert results_dtype('float32') == numpy.float32
+        with pytest.raises(ValueError):
+            results_dtype('float16')
+
+        single = results_dtype('float32')
+        assert cast_to_precision(numpy.zeros(3), single).dtype == numpy.float32
+        assert cast_to_precision(numpy.zeros(3, dtype=complex), single).dtype == numpy.complex64
+        assert cast_to_precision(numpy.arange(3), single).dtype == numpy.arange(3).dtype
+        assert cast_to_precision(numpy.zeros(3), None).dtype == numpy.float64
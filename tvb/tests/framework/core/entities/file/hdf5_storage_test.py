@@ -34,11 +34,13 @@
 """
 
 import os
+import h5py
 import numpy
 import shutil
 import pytest
 import tvb.core.entities.file.hdf5_storage_manager as hdf5
 from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
 from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
 from tvb.core.entities.file.exceptions import IncompatibleFileManagerException
 
@@ -452,3 +454,81 @@ class TestHDF5Storage(object):
         read_data = self.storage.get_metadata()
         self._assert_arrays_are_equal(TvbProfile.current.version.DATA_VERSION,
                                       read_data[TvbProfile.current.version.DATA_VERSION_ATTRIBUTE])
+
+    def test_metadata_cache_write_through(self):
+        """
+        Attributes are cached per open file, and kept in sync with writes done by any manager on that file.
+        """
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        self.storage.set_metadata(META_DICT, DATASET_NAME_1)
+        assert META_VALUE == self.storage.get_metadata(DATASET_NAME_1)[META_KEY]
+
+        other_storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME)
+        other_storage.set_metadata({META_KEY: "other_value", "new_key": True}, DATASET_NAME_1)
+        read_meta_data = self.storage.get_metadata(DATASET_NAME_1)
+        assert "other_value" == read_meta_data[META_KEY]
+        assert read_meta_data["new_key"] is True
+
+        # changing the returned dictionary does not alter the cache
+        read_meta_data.clear()
+        other_storage.remove_metadata("new_key", DATASET_NAME_1)
+        assert {META_KEY: "other_value"} == self.storage.get_metadata(DATASET_NAME_1)
+
+    def test_metadata_cache_dropped_with_file_handle(self):
+        """
+        The cache lives as long as the pooled file handle, so changes done after closing the file are visible.
+        """
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        self.storage.set_metadata(META_DICT)
+        assert META_VALUE == self.storage.get_metadata()[META_KEY]
+
+        full_path = os.path.join(self.storage_folder, STORAGE_FILE_NAME)
+        H5_FILE_POOL.close(full_path)
+        with h5py.File(full_path, 'a') as h5_file:
+            h5_file['/'].attrs[hdf5.HDF5StorageManager.TVB_ATTRIBUTE_PREFIX + META_KEY] = "external_value"
+        assert "external_value" == self.storage.get_metadata()[META_KEY]
+
+    def test_memory_mapped_read(self):
+        """
+        Contiguous datasets are memory mapped when asked, other datasets are read through h5py.
+        """
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        read_data = self.storage.get_data(DATASET_NAME_1, memory_map=True)
+        assert isinstance(read_data, numpy.memmap)
+        self._assert_arrays_are_equal(self.test_2D_array, read_data)
+        sliced_data = self.storage.get_data(DATASET_NAME_1, (slice(2, 4), slice(None, None, 3)), memory_map=True)
+        self._assert_arrays_are_equal(self.test_2D_array[2:4, ::3], sliced_data)
+
+        self.storage.append_data(DATASET_NAME_2, self.test_2D_array)
+        read_data = self.storage.get_data(DATASET_NAME_2, memory_map=True)
+        assert not isinstance(read_data, numpy.memmap)
+        self._assert_arrays_are_equal(self.test_2D_array, read_data)
+
+    def test_append_buffer_flush_policies(self):
+        """
+        Small appends are kept in memory until the buffer size is reached, reads see all appended rows,
+        and background flushes write the same data.
+        """
+        row_bytes = self.test_2D_array[:1].nbytes
+        for background_flush in (False, True):
+            storage = hdf5.HDF5StorageManager(self.storage_folder, "buffer_%s.h5" % background_flush,
+                                              buffer_size=3 * row_bytes, background_flush=background_flush)
+            for index in range(self.test_2D_array.shape[0]):
+                storage.append_data(DATASET_NAME_1, self.test_2D_array[index:index + 1], grow_dimension=0,
+                                    close_file=False)
+                if index == 2:
+                    # the first row creates the dataset, the next two stay in the buffer
+                    assert storage.data_buffers["/" + DATASET_NAME_1].h5py_dataset.shape == (1, 10)
+                    assert storage.get_data_shape(DATASET_NAME_1) == (3, 10)
+            storage.close_file()
+            self._assert_arrays_are_equal(self.test_2D_array, storage.get_data(DATASET_NAME_1))
+
+    def test_append_buffer_flush_interval(self):
+        """
+        With a flush interval, buffered rows are written even if the buffer is not full.
+        """
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, flush_interval=0)
+        storage.append_data(DATASET_NAME_1, self.test_2D_array[:1], grow_dimension=0, close_file=False)
+        storage.append_data(DATASET_NAME_1, self.test_2D_array[1:2], grow_dimension=0, close_file=False)
+        assert storage.data_buffers["/" + DATASET_NAME_1].h5py_dataset.shape == (2, 10)
+        storage.close_file()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the per path cache of H5 file validity and data version.
+"""
+
+import os
+import h5py
+from tvb.core.entities.file.hdf5_validity_cache import HDF5ValidityCache
+
+
+class TestHDF5ValidityCache(object):
+    """
+    Tests for the cache of the validity and data version of H5 files.
+    """
+
+    def setup_method(self):
+        self.cache = HDF5ValidityCache(max_size=2)
+
+    def test_validity_is_cached_until_the_file_changes(self, tmph5factory):
+        path = tmph5factory()
+        assert not self.cache.is_valid_hdf5(path)
+
+        with h5py.File(path, 'w') as h5_file:
+            h5_file.attrs['key'] = 'value'
+        assert self.cache.is_valid_hdf5(path)
+        assert self.cache.is_valid_hdf5(path)
+        assert self.cache.hits == 1
+
+        os.remove(path)
+        with open(path, 'w') as text_file:
+            text_file.write("not an hdf5 file")
+        assert not self.cache.is_valid_hdf5(path)
+
+    def test_data_version_shared_with_validity(self, tmph5factory):
+        path = tmph5factory()
+        with h5py.File(path, 'w') as h5_file:
+            h5_file.attrs['version'] = 3
+        reads = []
+
+        def read_version():
+            reads.append(path)
+            with h5py.File(path, 'r') as h5_file:
+                return h5_file.attrs['version']
+
+        assert self.cache.is_valid_hdf5(path)
+        assert self.cache.data_version(path, read_version) == 3
+        assert self.cache.data_version(path, read_version) == 3
+        assert len(reads) == 1
+        assert self.cache.is_valid_hdf5(path)
+
+        with h5py.File(path, 'a') as h5_file:
+            h5_file.attrs['version'] = 4
+            h5_file.attrs['padding'] = 'x' * 1024
+        assert self.cache.data_version(path, read_version) == 4
+        assert len(reads) == 2
+
+    def test_lru_bound(self, tmph5factory):
+        paths = [tmph5factory('file_%d.h5' % i) for i in range(3)]
+        for path in paths:
+            with h5py.File(path, 'w'):
+                pass
+            self.cache.is_valid_hdf5(path)
+        assert len(self.cache._entries) == 2
+        assert paths[0] not in self.cache._entries
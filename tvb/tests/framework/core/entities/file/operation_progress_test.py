@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Tests for the throttled progress reporting of running operations.
+"""
+
+import os
+from tvb.core.entities.file import operation_progress
+from tvb.core.entities.file.operation_progress import ProgressReporter, read_progress
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_progress_throttled(tmpdir, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(operation_progress, 'time', clock)
+    folder = str(tmpdir)
+    reporter = ProgressReporter(7, min_interval=2, folder=folder)
+
+    clock.now += 1
+    reporter.update(0.1)
+    assert read_progress([7], folder)[7]['fraction'] == 0.1
+
+    # too soon after the previous write
+    clock.now += 1
+    reporter.update(0.2)
+    assert read_progress([7], folder)[7]['fraction'] == 0.1
+
+    clock.now += 1
+    reporter.update(0.3)
+    progress = read_progress([7], folder)[7]
+    assert progress['fraction'] == 0.3
+    assert progress['elapsed_seconds'] == 3
+    # 0.1 per second, so 7 more seconds
+    assert abs(progress['rate'] - 0.1) < 1e-9
+    assert abs(progress['remaining_seconds'] - 7) < 1e-6
+
+
+def test_read_progress_of_many_operations(tmpdir):
+    folder = str(tmpdir)
+    reporters = [ProgressReporter(op_id, min_interval=0, folder=folder) for op_id in (1, 2)]
+    reporters[0].update(0.5)
+    reporters[1].update(0.25)
+
+    progress = read_progress([1, 2, 3], folder)
+    assert sorted(progress) == [1, 2]
+    assert progress[2]['fraction'] == 0.25
+
+    reporters[0].remove()
+    assert list(read_progress([1, 2, 3], folder)) == [2]
+    assert not [name for name in os.listdir(folder) if name.endswith(".tmp")]
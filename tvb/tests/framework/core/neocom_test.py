@@ -1,6 +1,7 @@
 import os
 import numpy
-from tvb.core.neocom.h5 import load, store, load_from_dir, store_to_dir
+from tvb.core.entities.file.hdf5_path_index import H5_PATH_INDEX, HDF5PathIndex
+from tvb.core.neocom.h5 import load, store, load_from_dir, store_to_dir, path_for, REGISTRY
 
 
 def test_store_load(tmpdir, connectivity_factory):
@@ -18,3 +19,37 @@ def test_store_load_rec(tmpdir, connectivity_factory, region_mapping_factory):
 
     rmap = load_from_dir(str(tmpdir), region_mapping.gid, recursive=True)
     numpy.testing.assert_equal(connectivity.weights, rmap.connectivity.weights)
+
+
+def test_gid_index_follows_folder_changes(tmpdir, connectivity_factory):
+    connectivity = connectivity_factory(2)
+    store_to_dir(str(tmpdir), connectivity)
+    conn_h5_class = REGISTRY.get_h5file_for_datatype(type(connectivity))
+    path = path_for(str(tmpdir), conn_h5_class, connectivity.gid)
+    assert H5_PATH_INDEX.locate(str(tmpdir), connectivity.gid.hex) == os.path.basename(path)
+
+    # a file written without the DirLoader is found too
+    other = connectivity_factory(2)
+    store(other, path_for(str(tmpdir), conn_h5_class, other.gid))
+    numpy.testing.assert_equal(other.weights, load_from_dir(str(tmpdir), other.gid).weights)
+
+    # removed files are not reported from the index
+    os.remove(path)
+    assert H5_PATH_INDEX.locate(str(tmpdir), connectivity.gid.hex) is None
+
+
+def test_gid_index_is_bounded(tmpdir):
+    index = HDF5PathIndex(max_folders=2, max_operations=2)
+    folders = [str(tmpdir.mkdir('folder_%d' % i)) for i in range(3)]
+    index.locate(folders[0], 'a' * 32)
+    index.locate(folders[1], 'a' * 32)
+    # a lookup makes the folder the most recently used one
+    index.locate(folders[0], 'a' * 32)
+    index.locate(folders[2], 'a' * 32)
+    assert list(index._folders) == [folders[0], folders[2]]
+
+    for operation_id in range(3):
+        index.set_operation_folder(operation_id, folders[operation_id])
+    assert index.operation_folder(0) is None
+    assert index.operation_folder(1) == folders[1]
+    assert index.operation_folder(2) == folders[2]
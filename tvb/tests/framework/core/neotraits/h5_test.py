@@ -31,7 +31,8 @@
 import numpy
 from tvb.basic.neotraits.api import Attr, NArray
 from .data import FooDatatype, BarDatatype, BazDataType, PropsDataType
-from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Reference
+from tvb.core.entities.file.hdf5_file_pool import H5_FILE_POOL
+from tvb.core.neotraits.h5 import H5File, DataSet, Scalar, Reference, LazyDataSetArray
 
 
 
@@ -158,6 +159,81 @@ def test_append(tmph5factory):
         assert meta.max == 3
 
 
+def test_append_statistics_written_on_close(tmph5factory):
+    pth = tmph5factory()
+    chunks = [numpy.random.random((3, 2)) * i for i in range(1, 5)]
+
+    with BazFile(pth) as f:
+        for chunk in chunks:
+            f.miu.append(chunk)
+
+    with BazFile(pth) as f:
+        for chunk in chunks:
+            f.miu.append(chunk)
+
+    full = numpy.concatenate(chunks * 2)
+    with BazFile(pth) as f:
+        meta = f.miu.get_cached_metadata()
+        assert meta.count == full.size
+        numpy.testing.assert_allclose(meta.mean, full.mean())
+        numpy.testing.assert_allclose(meta.variance, full.var())
+        assert meta.min == full.min()
+        assert meta.max == full.max()
+
+
+def _file_acquisitions():
+    stats = H5_FILE_POOL.get_statistics()
+    return stats['hits'] + stats['misses']
+
+
+def test_bulk_attributes(tmph5factory):
+    pth = tmph5factory()
+    with Independent(pth) as f:
+        with f.bulk_attributes():
+            f.scalar_int.store(42)
+            f.invalid.store(True)
+            f.subject.store('John')
+            # pending values are visible before the commit
+            assert f.scalar_int.load() == 42
+            assert f.subject.load() == 'John'
+            before_commit = _file_acquisitions()
+        # a single file open writes all the attributes
+        assert _file_acquisitions() == before_commit + 1
+
+    with Independent(pth) as f:
+        assert f.scalar_int.load() == 42
+        assert f.invalid.load() is True
+        assert f.subject.load() == 'John'
+
+
+def test_lazy_load(tmph5factory):
+    data = numpy.arange(20, dtype=float).reshape((4, 5))
+    path = tmph5factory()
+    with BazFile(path) as f:
+        f.store(BazDataType(miu=data, scalar_str='topol'))
+
+    ret = BazDataType()
+    with BazFile(path) as f:
+        f.lazy_datasets = True
+        f.load_into(ret)
+
+    assert isinstance(ret.miu, LazyDataSetArray)
+    assert ret.scalar_str == 'topol'
+    assert ret.miu.shape == (4, 5)
+    assert ret.miu.dtype == data.dtype
+    numpy.testing.assert_array_equal(ret.miu[1:3, ::2], data[1:3, ::2])
+    numpy.testing.assert_array_equal(ret.miu[::-1], data[::-1])
+    numpy.testing.assert_array_equal(ret.miu * 2, data * 2)
+    numpy.testing.assert_array_equal(numpy.asarray(ret.miu), data)
+    assert ret.miu.mean() == data.mean()
+
+    # a lazy datatype can be stored again
+    copy_path = tmph5factory('copy.h5')
+    with BazFile(copy_path) as f:
+        f.store(ret)
+        numpy.testing.assert_array_equal(f.miu.load(), data)
+
+
 def test_props_datatype_file(tmph5factory):
 
     datatype = PropsDataType(n_node=3)
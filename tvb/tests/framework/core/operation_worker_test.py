@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Tests for the long lived worker processes launching operations.
+"""
+
+import io
+import os
+import sys
+import subprocess
+import numpy
+import pytest
+from tvb.basic.profile import TvbProfile
+from tvb.core.entities.file.hdf5_locks import LOCKS_FOLDER
+from tvb.core.entities.file.hdf5_storage_manager import HDF5StorageManager
+from tvb.core.entities.model.model_project import User
+from tvb.core.entities.storage import dao
+from tvb.core.entities.storage.root_dao import RootDAO
+from tvb.core.entities.storage.session_maker import transactional
+from tvb.core.operation_worker import OperationWorker, CANCEL_SIGNAL
+
+
+class _Launcher(object):
+
+    def __init__(self, cancel=()):
+        self.cancel = cancel
+        self.launched = []
+
+    def __call__(self, operation_id):
+        self.launched.append(operation_id)
+        if operation_id in self.cancel:
+            # as sent by the WorkerPoolClient, when the operation is stopped
+            os.kill(os.getpid(), CANCEL_SIGNAL)
+
+
+def _serve(worker, operation_ids):
+    output = io.StringIO()
+    worker.serve(io.StringIO("".join("%s\n" % op_id for op_id in operation_ids)), output)
+    return output.getvalue().splitlines()
+
+
+def test_operations_run_in_order():
+    launcher = _Launcher()
+    assert _serve(OperationWorker(launcher), [3, 1, 2]) == ["3 done", "1 done", "2 done"]
+    assert launcher.launched == ["3", "1", "2"]
+
+
+def test_worker_recycled_after_max_operations():
+    launcher = _Launcher()
+    worker = OperationWorker(launcher, max_operations=2)
+    assert _serve(worker, [1, 2, 3]) == ["1 done", "2 done recycle"]
+    # the operations after the recycle are left for a new worker
+    assert launcher.launched == ["1", "2"]
+
+
+def test_worker_recycled_over_memory_limit():
+    worker = OperationWorker(_Launcher(), max_memory=1)
+    assert _serve(worker, [1, 2]) == ["1 done recycle"]
+
+
+@pytest.mark.skipif(CANCEL_SIGNAL is None, reason="cancel signal not available on this platform")
+def test_cancel_signal_stops_the_operation():
+    launcher = _Launcher(cancel=("2",))
+    worker = OperationWorker(launcher)
+    # the canceled operation may have been interrupted anywhere, the next one starts in a fresh worker
+    assert _serve(worker, [1, 2, 3]) == ["1 done", "2 canceled recycle"]
+    assert launcher.launched == ["1", "2"]
+    # the signal is ignored between operations
+    worker._on_cancel_signal(CANCEL_SIGNAL, None)
+
+
+class _CancelingDAO(RootDAO):
+
+    def add_then_cancel(self, entity):
+        self.session.add(entity)
+        # as sent by the WorkerPoolClient, while the DAO call is running
+        os.kill(os.getpid(), CANCEL_SIGNAL)
+
+
+@transactional
+def _store_users_then_cancel():
+    dao.store_entity(User("stored_before_cancel", "pass", "mail@tvb.org", True, "test"))
+    _CancelingDAO().add_then_cancel(User("added_when_canceled", "pass", "mail@tvb.org", True, "test"))
+
+
+@pytest.mark.skipif(CANCEL_SIGNAL is None, reason="cancel signal not available on this platform")
+def test_cancel_during_dao_write_commits_nothing():
+    worker = OperationWorker(lambda operation_id: _store_users_then_cancel())
+    assert _serve(worker, [1]) == ["1 canceled recycle"]
+    assert dao.get_user_by_name("stored_before_cancel") is None
+    assert dao.get_user_by_name("added_when_canceled") is None
+
+    # outside of a transaction too
+    worker = OperationWorker(lambda operation_id: _CancelingDAO().add_then_cancel(
+        User("added_when_canceled", "pass", "mail@tvb.org", True, "test")))
+    assert _serve(worker, [2]) == ["2 canceled recycle"]
+    assert dao.get_user_by_name("added_when_canceled") is None
+
+
+_OTHER_PROCESS_WRITER = """
+import sys, h5py
+from tvb.core.entities.file.hdf5_locks import HDF5FileLocks
+locks = HDF5FileLocks(lock_folder=sys.argv[1])
+token = locks.acquire(sys.argv[2], write=True)
+with h5py.File(sys.argv[2], 'a', **locks.h5py_options()) as h5_file:
+    h5_file.attrs['writer'] = 'other process'
+locks.release(token)
+print("written")
+"""
+
+
+@pytest.mark.skipif(CANCEL_SIGNAL is None, reason="cancel signal not available on this platform")
+def test_canceled_operation_releases_its_files(tmph5factory):
+    path = tmph5factory()
+
+    def write_then_cancel(operation_id):
+        manager = HDF5StorageManager(os.path.dirname(path), os.path.basename(path))
+        # the file stays open for writing, and locked, when the operation is canceled
+        manager.append_data('data', numpy.arange(10), close_file=False)
+        os.kill(os.getpid(), CANCEL_SIGNAL)
+
+    assert _serve(OperationWorker(write_then_cancel), [1]) == ["1 canceled recycle"]
+
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    lock_folder = os.path.join(TvbProfile.current.TVB_STORAGE, LOCKS_FOLDER)
+    output = subprocess.check_output([sys.executable, "-c", _OTHER_PROCESS_WRITER, lock_folder, path],
+                                     universal_newlines=True, env=env, timeout=60)
+    assert output.strip() == "written"
+    manager = HDF5StorageManager(os.path.dirname(path), os.path.basename(path))
+    assert manager.get_metadata()['writer'] == 'other process'
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Tests for the decorators of the web controllers.
+"""
+
+import types
+import numpy
+import cherrypy
+from cherrypy._cprequest import Response
+from tvb.interfaces.web.controllers.decorators import ndarray_to_http_binary, BINARY_TRANSPORT_BLOCK
+
+
+class TestNdarrayToHttpBinary(object):
+    """
+    Tests for the binary transport of numpy arrays.
+    """
+
+    def setup_method(self):
+        self.response = Response()
+        self.previous_response = cherrypy.serving.response
+        cherrypy.serving.response = self.response
+
+    def teardown_method(self):
+        cherrypy.serving.response = self.previous_response
+
+    def test_small_array_sent_at_once(self):
+        data = numpy.arange(12, dtype=numpy.float64).reshape((3, 4))
+        body = ndarray_to_http_binary(lambda: data)()
+
+        assert body == data.tobytes()
+        assert not self.response.stream
+        assert self.response.headers["X-Array-Shape"] == "(3, 4)"
+
+    def test_large_array_streamed(self):
+        data = numpy.arange(3 * BINARY_TRANSPORT_BLOCK // 8 + 5, dtype=numpy.float64)
+        self.response.body = ndarray_to_http_binary(lambda: data)()
+        self.response.finalize()
+
+        assert self.response.stream
+        assert self.response.headers["Content-Length"] == data.nbytes
+        # the body was not collapsed into a single bytes object
+        assert isinstance(self.response.body, types.GeneratorType)
+        blocks = list(self.response.body)
+        assert len(blocks) == 4
+        assert b''.join(blocks) == data.tobytes()